@@ -0,0 +1,50 @@
+"""Compare binary block decoding of vna_api with pyvisa's query_binary_values() parser.
+
+Run from repository root with src/ on PYTHONPATH: python benchmarks/bench_block_decoding.py
+"""
+from typing import Any, Dict, List
+import numpy as np
+from pyvisa import util as visa_util
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.vna_types import DataFormat
+from common import bench
+
+SUITE = "block_decoding"
+POINTS = (201, 1001, 4001, 10001)
+QUICK_POINTS = (201, 10001)
+FORMATS = ((DataFormat.REAL32, "<f4"), (DataFormat.REAL64, "<f8"))
+
+def make_block(points: int, dtype: str) -> bytes:
+    values = np.random.rand(2*points).astype(dtype)
+    return visa_util.to_ieee_block(values.tolist(), datatype=np.dtype(dtype).char) + b"\n"
+
+def pyvisa_decode(block: bytes, datatype: str) -> np.ndarray:
+    return vna_api.convert_data_to_complex(visa_util.from_ieee_block(block, datatype=datatype))
+
+def vna_api_decode(block: bytes, format: str) -> np.ndarray:
+    return vna_api.convert_block_to_complex(vna_api.parse_binary_blocks(block)[0], vna_api.DATA_FORMAT_DTYPES[format])
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    min_time = 0.05 if quick else 0.2
+    results = []
+    for format, dtype in FORMATS:
+        for points in QUICK_POINTS if quick else POINTS:
+            block = make_block(points, dtype)
+            datatype = np.dtype(dtype).char
+            assert (pyvisa_decode(block, datatype) == vna_api_decode(block, format)).all()
+            results += [
+                bench(SUITE, "pyvisa.from_ieee_block", lambda: pyvisa_decode(block, datatype), min_time, format=format, points=points),
+                bench(SUITE, "vna_api.parse_binary_blocks", lambda: vna_api_decode(block, format), min_time, format=format, points=points),
+            ]
+    return results
+
+def main():
+    results = run()
+    print(f"{'format':<10}{'points':>8}{'pyvisa (us)':>14}{'vna_api (us)':>14}{'speedup':>9}")
+    for pyvisa_result, vna_api_result in zip(results[::2], results[1::2]):
+        params = pyvisa_result["params"]
+        t_pyvisa, t_vna_api = pyvisa_result["seconds"], vna_api_result["seconds"]
+        print(f"{params['format']:<10}{params['points']:>8d}{t_pyvisa*1E6:>14.1f}{t_vna_api*1E6:>14.1f}{t_pyvisa/t_vna_api:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Throughput of rotary table request encoding and response parsing"""
+from typing import Any, Dict, List
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api import rotary_table_codec
+from common import bench
+
+SUITE = "codec"
+FRAMES_NUM = 1000
+
+def motor_status_frame(address: int, angle: float) -> bytes:
+    data = rt_msg.PREAMBLE + bytes([address << rt_msg.ADDRESS_LENGTH | 0xF, rt_msg.IS_MOTOR_OK_MASK | rt_msg.IS_ENABLED_MASK])
+    data += rt_msg.angle_to_bytes(angle) + rt_msg.angle_to_bytes(angle) + rt_msg.rpm_to_bytes(0)
+    return data + rt_msg.calc_crc8(data).to_bytes(1, byteorder="big")
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    min_time = 0.05 if quick else 0.2
+    status = rt_msg.RequestGetStatus(1)
+    frame = motor_status_frame(1, 123.5)
+    stream = b"".join(motor_status_frame(i % 14, i % 360) for i in range(FRAMES_NUM))
+    results = [
+        bench(SUITE, "RequestGetStatus.to_bytes", status.to_bytes, min_time),
+        bench(SUITE, "RequestRotate.to_bytes", lambda: rt_msg.RequestRotate(1, 123.5, 10).to_bytes(), min_time),
+        bench(SUITE, "parse_response", lambda: rt_msg.parse_response(frame), min_time),
+        bench(SUITE, "parse_response.current_angle", lambda: rt_msg.parse_response(frame).current_angle, min_time),
+    ]
+    record = bench(SUITE, "codec.parse_responses", lambda: rotary_table_codec.parse_responses(stream), min_time, frames=FRAMES_NUM)
+    record["seconds_per_frame"] = record["seconds"] / FRAMES_NUM
+    results.append(record)
+    return results
@@ -0,0 +1,31 @@
+"""Conversion of ASCII trace data to complex values and of traces to S2P networks"""
+from typing import Any, Dict, List
+import numpy as np
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.vna_types import DataFormat
+from common import bench
+
+SUITE = "conversion"
+POINTS = (201, 1001, 4001, 10001)
+QUICK_POINTS = (201, 10001)
+
+def ascii_block(values: np.ndarray) -> str:
+    payload = ",".join(f"{value:.6E}" for value in values)
+    length = str(len(payload))
+    return f"#{len(length):d}{length}{payload}"
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    min_time = 0.05 if quick else 0.2
+    rng = np.random.default_rng(0)
+    results = []
+    for points in QUICK_POINTS if quick else POINTS:
+        block = ascii_block(rng.standard_normal(2*points))
+        values = vna_api.convert_from_trace_data(block, DataFormat.ASCII)
+        freq = np.linspace(1E9, 18E9, points)
+        traces = {sparam: rng.standard_normal(points) + 1j*rng.standard_normal(points) for sparam in vna_api.S2P_INDICES}
+        results += [
+            bench(SUITE, "convert_from_trace_data.ascii", lambda: vna_api.convert_from_trace_data(block, DataFormat.ASCII), min_time, points=points),
+            bench(SUITE, "convert_data_to_complex", lambda: vna_api.convert_data_to_complex(values), min_time, points=points),
+            bench(SUITE, "convert_traces_data_to_s2p", lambda: vna_api.convert_traces_data_to_s2p(traces, freq), min_time, points=points),
+        ]
+    return results
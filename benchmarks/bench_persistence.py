@@ -0,0 +1,55 @@
+"""Saving and loading a pattern as per-angle Touchstone files versus a single pattern store file"""
+from typing import Any, Dict, List
+import os
+import tempfile
+import time
+import numpy as np
+import skrf as rf
+from antenna_meas_cli.cli import filename_from_angle_n_s2pname
+from antenna_meas_cli.pattern_store import PatternStore, PatternStoreWriter
+from antenna_meas_cli.s2p_import import list_s2p_files
+from common import result
+
+SUITE = "persistence"
+POINTS = (201, 1001, 4001)
+QUICK_POINTS = (201,)
+ANGLE_STEP = 5
+
+def make_networks(points: int, angles: np.ndarray) -> List[rf.Network]:
+    rng = np.random.default_rng(0)
+    freq = np.linspace(1E9, 18E9, points)
+    return [rf.Network(f=freq/1E9, s=rng.standard_normal((points, 2, 2)) + 1j*rng.standard_normal((points, 2, 2)), f_unit="GHz")
+        for _ in angles]
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    angles = np.arange(0, 360, ANGLE_STEP)
+    results = []
+    for points in QUICK_POINTS if quick else POINTS:
+        networks = make_networks(points, angles)
+        with tempfile.TemporaryDirectory() as directory:
+            def write_touchstone():
+                for angle, network in zip(angles, networks):
+                    network.comments = f"angle={angle:f}deg"
+                    network.write_touchstone(filename_from_angle_n_s2pname("bench", angle, ANGLE_STEP), directory, skrf_comment=False)
+            def read_touchstone():
+                return [rf.Network(path) for path in list_s2p_files(directory, "bench")]
+            store_path = os.path.join(directory, "bench.rhp")
+            def write_store():
+                with PatternStoreWriter.from_network(store_path, networks[0]) as writer:
+                    for angle, network in zip(angles, networks):
+                        writer.append_network(angle, network)
+            def read_store():
+                return PatternStore(store_path).s.copy()
+            params = {"points": points, "angles": len(angles)}
+            results.append(result(SUITE, "touchstone.write", timed(write_touchstone), **params))
+            results.append(result(SUITE, "touchstone.read", timed(read_touchstone), **params))
+            results.append(result(SUITE, "pattern_store.write", timed(write_store), **params))
+            results.append(result(SUITE, "pattern_store.read", timed(read_store), **params))
+            results[-4]["bytes"] = sum(os.path.getsize(path) for path in list_s2p_files(directory, "bench"))
+            results[-2]["bytes"] = os.path.getsize(store_path)
+    return results
@@ -0,0 +1,61 @@
+"""Full scans with simulated rotary head and VNA, time per angle broken down by pipeline stage"""
+from typing import Any, Dict, List
+import os
+import tempfile
+import numpy as np
+from antenna_meas_cli.pattern_store import PatternStoreWriter
+from antenna_meas_cli.pipeline import MeasurementPipeline, STAGES
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.simulator import RotaryTableSimulator
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.simulator import SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME
+from common import result
+
+SUITE = "scan"
+ANGLE_STEPS = (30, 15, 10)
+QUICK_ANGLE_STEPS = (30,)
+RT_ID = 1
+RPM = 30
+ACCELERATION = 300
+POINTS = 201
+SWEEP_TIME = 0.05
+
+def scan(angle_step: float, store_path: str) -> MeasurementPipeline:
+    with RotaryTableSimulator([RT_ID], acceleration=ACCELERATION) as rt_sim:
+        device = SimulatedVNA(points_num=POINTS, sweep_time=SWEEP_TIME, angle_source=lambda: rt_sim.head(RT_ID).angle)
+        vna = vna_api.VNA(SimulatedResourceManager(device), SIMULATED_RESOURCE_NAME)
+        vna.set_traces_as_s2p()
+        vna.set_is_sweep_continuous(False)
+        rt = rt_api.RotaryTable(rt_sim.port_name)
+        writer = None
+        def move(angle):
+            rt.send_request(rt_msg.RequestRotate(RT_ID, angle, RPM))
+            rt.wait_until_stopped(RT_ID, RPM)
+        def persist(angle, s2p):
+            nonlocal writer
+            if writer is None:
+                writer = PatternStoreWriter.from_network(store_path, s2p)
+            writer.append_network(angle, s2p)
+        pipeline = MeasurementPipeline(move, vna.start_single_sweep_await, vna.get_traces_data_as_s2p)
+        try:
+            pipeline.run(np.arange(0, 360, angle_step), persist)
+        finally:
+            rt.close()
+            if writer is not None:
+                writer.close()
+    return pipeline
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    results = []
+    for angle_step in QUICK_ANGLE_STEPS if quick else ANGLE_STEPS:
+        with tempfile.TemporaryDirectory() as directory:
+            pipeline = scan(angle_step, os.path.join(directory, "scan.rhp"))
+        angles_num = pipeline.stats[STAGES[0]].items
+        record = result(SUITE, "pipeline", pipeline.wall_time / angles_num, angle_step=angle_step, points=POINTS,
+            sweep_time=SWEEP_TIME, rpm=RPM)
+        record["wall_time"] = pipeline.wall_time
+        record["phases"] = {name: stats.busy_time / max(stats.items, 1) for name, stats in pipeline.stats.items()}
+        record["bottleneck"] = pipeline.bottleneck()
+        results.append(record)
+    return results
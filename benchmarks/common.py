@@ -0,0 +1,60 @@
+"""Timing helpers and result records shared by benchmark suites"""
+from typing import Any, Callable, Dict, Tuple
+import datetime
+import platform
+import subprocess
+import time
+import numpy as np
+
+MIN_TIME = 0.2
+REPEAT = 5
+
+def time_call(func: Callable[[], Any], min_time: float = MIN_TIME, repeat: int = REPEAT) -> Tuple[float, int]:
+    """Return best time of a single call in seconds and number of calls per repetition.
+
+    Number of calls is chosen so that one repetition takes at least min_time.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1E6:
+            break
+        number = max(2*number, int(number*min_time/max(elapsed, 1E-9)))
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / number, number
+
+def result(suite: str, name: str, seconds: float, **params) -> Dict[str, Any]:
+    return {"suite": suite, "name": name, "params": params, "seconds": seconds}
+
+def bench(suite: str, name: str, func: Callable[[], Any], min_time: float = MIN_TIME, **params) -> Dict[str, Any]:
+    seconds, number = time_call(func, min_time)
+    record = result(suite, name, seconds, **params)
+    record["number"] = number
+    return record
+
+def result_key(record: Dict[str, Any]) -> Tuple[str, str, Tuple]:
+    return record["suite"], record["name"], tuple(sorted(record["params"].items()))
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict[str, Any]:
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
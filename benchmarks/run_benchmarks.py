@@ -0,0 +1,63 @@
+"""Run benchmark suites and store results as JSON, optionally comparing them with results of another version.
+
+Run from repository root with src/ on PYTHONPATH: python benchmarks/run_benchmarks.py --output results.json
+"""
+from typing import Any, Dict, List
+import json
+import sys
+import click
+from common import environment, result_key
+import bench_block_decoding
+import bench_codec
+import bench_conversion
+import bench_persistence
+import bench_scan
+
+SUITES = {
+    bench_codec.SUITE: bench_codec,
+    bench_conversion.SUITE: bench_conversion,
+    bench_block_decoding.SUITE: bench_block_decoding,
+    bench_persistence.SUITE: bench_persistence,
+    bench_scan.SUITE: bench_scan,
+}
+
+def format_record(record: Dict[str, Any]) -> str:
+    params = ", ".join(f"{key}={value}" for key, value in record["params"].items())
+    return f"{record['suite']:<16}{record['name']:<34}{params:<48}{record['seconds']*1E6:>14.1f} us"
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Return descriptions of results slower than matching baseline results by more than threshold ratio"""
+    baseline_seconds = {result_key(record): record["seconds"] for record in baseline}
+    regressions = []
+    for record in results:
+        reference = baseline_seconds.get(result_key(record))
+        if reference is not None and reference > 0 and record["seconds"] / reference > threshold:
+            regressions.append(f"{format_record(record)}  {record['seconds']/reference:.2f}x slower")
+    return regressions
+
+@click.command()
+@click.option("--suite", "suites", type=click.Choice(list(SUITES)), multiple=True, help="Suites to run, all by default")
+@click.option("--output", type=click.Path(dir_okay=False), help="JSON file to write results to")
+@click.option("--quick", is_flag=True, help="Run fewer sizes and shorter timings")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="JSON results of another version to compare with")
+@click.option("--threshold", type=float, default=1.2, show_default=True, help="Slowdown ratio reported as regression")
+def main(suites, output, quick, baseline, threshold):
+    results = []
+    for name in suites or SUITES:
+        click.echo(f"Running {name} suite", err=True)
+        for record in SUITES[name].run(quick):
+            click.echo(format_record(record))
+            results.append(record)
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump({"environment": environment(), "quick": quick, "results": results}, file, indent=1)
+    if baseline is not None:
+        with open(baseline) as file:
+            regressions = compare(results, json.load(file)["results"], threshold)
+        for line in regressions:
+            click.echo(f"REGRESSION {line}")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
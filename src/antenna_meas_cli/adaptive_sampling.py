@@ -0,0 +1,74 @@
+from typing import Dict, Tuple
+import numpy as np
+from antenna_meas_cli.pattern_analysis import normalize_pattern, pattern_db
+
+DEFAULT_TOLERANCE_DB = 0.5
+DEFAULT_MIN_STEP = 0.5
+DEFAULT_FLOOR_DB = -50.0
+
+def circular_intervals(angles: np.ndarray) -> np.ndarray:
+    """Widths of intervals between sorted angles, last interval wraps through 360deg"""
+    return np.diff(np.append(angles, angles[0] + 360))
+
+def interpolation_error(angles: np.ndarray, pattern: np.ndarray) -> np.ndarray:
+    """Estimate error of linear interpolation inside every interval of circular angle x frequency pattern.
+
+    Second divided difference at every angle approximates pattern curvature, error in the middle of interval h
+    is |curvature|*h^2/8 taken for the more curved end of the interval. Return the maximum over frequencies.
+    """
+    h = circular_intervals(angles)[:, None]
+    h_left = np.roll(h, 1, axis=0)
+    slope_right = (np.roll(pattern, -1, axis=0) - pattern) / h
+    slope_left = np.roll(slope_right, 1, axis=0)
+    curvature = np.abs(2*(slope_right - slope_left) / (h_left + h))
+    interval_curvature = np.maximum(curvature, np.roll(curvature, -1, axis=0))
+    return (interval_curvature * h**2 / 8).max(axis=1)
+
+class AdaptiveSampler:
+    """Angular sampling plan refined where the measured pattern changes fastest.
+
+    Coarse pass measures a uniform grid, then every refinement pass bisects intervals with estimated linear
+    interpolation error of normalised S21 in dB above tolerance, largest errors first, until there is no such
+    interval or the total budget of measured angles is spent. Levels below floor_db relative to the peak are
+    clipped, so noise in deep nulls doesn't take the budget. Intervals narrower than 2*min_step aren't split.
+    """
+    def __init__(self, coarse_step: float, budget: int, tolerance: float = DEFAULT_TOLERANCE_DB,
+            min_step: float = DEFAULT_MIN_STEP, floor_db: float = DEFAULT_FLOOR_DB):
+        self.coarse_step = coarse_step
+        self.budget = budget
+        self.tolerance = tolerance
+        self.min_step = min_step
+        self.floor_db = floor_db
+        self.values: Dict[float, np.ndarray] = {}
+        if budget < len(self.initial_angles()):
+            raise ValueError(f"Budget of {budget:d} angles is lower than number of angles of coarse pass.")
+
+    def initial_angles(self) -> np.ndarray:
+        return np.arange(0, 360, self.coarse_step)
+
+    def add(self, angle: float, s21: np.ndarray) -> None:
+        self.values[float(angle) % 360] = np.asarray(s21)
+
+    @property
+    def measured_count(self) -> int:
+        return len(self.values)
+
+    def pattern(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return sorted measured angles and normalised angle x frequency pattern in dB clipped at floor_db"""
+        angles = np.array(sorted(self.values))
+        pattern = normalize_pattern(pattern_db(np.stack([self.values[angle] for angle in angles])))
+        return angles, np.maximum(pattern, self.floor_db)
+
+    def next_angles(self) -> np.ndarray:
+        """Return sorted angles of the next refinement pass, empty array when sampling is finished"""
+        remaining = self.budget - self.measured_count
+        if remaining <= 0 or self.measured_count < 3:
+            return np.array([])
+        angles, pattern = self.pattern()
+        error = interpolation_error(angles, pattern)
+        widths = circular_intervals(angles)
+        candidates = np.flatnonzero((error > self.tolerance) & (widths >= 2*self.min_step))
+        # Spending at most half of the remaining budget per pass lets the next pass use refreshed error estimates
+        batch = max(1, (remaining + 1) // 2)
+        candidates = candidates[np.argsort(-error[candidates], kind="stable")][:batch]
+        return np.sort((angles[candidates] + widths[candidates]/2) % 360)
@@ -0,0 +1,162 @@
+from typing import Any, Callable, Dict, List
+from collections import deque
+import skrf as rf
+import numpy as np
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.vna_types import FrequencySettings
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from antenna_meas_cli.pipeline import MeasurementPipeline
+from antenna_meas_cli.pattern_store import PatternStore, PatternStoreWriter
+from antenna_meas_cli.profiling import optional_span
+from antenna_meas_cli.adaptive_sampling import AdaptiveSampler
+from antenna_meas_cli.settling import SettleDetector
+from antenna_meas_cli.scan_journal import ScanJournal
+from antenna_meas_cli.averaging import SweepAverager, STD_FIELD, SWEEPS_FIELD, averaging_fields
+from antenna_meas_cli.scan_planner import ORDER_AUTO, ScanPlan, plan_scan, leg_delta, move_along, start_position
+
+def filename_from_angle_n_s2pname(filename: str, angle: float, angle_step:float = None) -> str:
+    precision = None
+    if angle_step is None or angle_step != round(angle_step, 0):
+        precision = 3
+    angle_str = str(round(angle, precision)).replace(".", "#")
+    return f"{filename}_{angle_str}deg"
+
+class AngularScan:
+    """Step scan of a rotary table, every angle is measured by MeasurementPipeline and persisted before it's journaled.
+
+    Scan state is the table position the next move starts from, angle readbacks of moves whose data wasn't persisted
+    yet, the pattern store writer and sweeps averaged in the sweep stage waiting for the transfer stage. Passes are
+    repeated while the adaptive sampler refines angles. Table halt and error reporting are left to the caller.
+    """
+    def __init__(self, rt: rt_api.RotaryTable, rt_id: int, vna: vna_api.VNA, journal: ScanJournal, settle: SettleDetector,
+            speed: float, scan_order: str = ORDER_AUTO, allow_wrap: bool = False, store: str = None, s2p_name: str = None,
+            s2p_dir: str = None, metadata: Dict[str, Any] = None, sampler: AdaptiveSampler = None,
+            averager: SweepAverager = None, live_plot = None, tracer = None):
+        self.rt = rt
+        self.rt_id = rt_id
+        self.vna = vna
+        self.journal = journal
+        self.settle = settle
+        self.speed = speed
+        self.scan_order = scan_order
+        self.allow_wrap = allow_wrap
+        self.store = store
+        self.s2p_name = s2p_name
+        self.s2p_dir = s2p_dir
+        self.metadata = dict(metadata or {})
+        self.sampler = sampler
+        self.averager = averager
+        self.live_plot = live_plot
+        self.tracer = tracer
+        # Angle step in metadata is None for adaptive scans, then S2P names keep fractional part of angles
+        self.name_angle_step = self.metadata.get("angle_step")
+        self.store_writer: PatternStoreWriter = None
+        self.position = start_position(rt.send_request(rt_msg.RequestGetStatus(rt_id)).current_angle)
+        self.table_angles: Dict[float, float] = {}
+        self.averaged_sweeps = deque()
+        self.passes_stats: List[str] = []
+        transfer = vna.get_traces_data_as_s2p if averager is None else self.averaged_sweeps.popleft
+        self.pipeline = MeasurementPipeline(self._move, self._sweep, transfer, tracer=tracer,
+            halt=lambda: rt.send_request(rt_msg.RequestHalt(rt_id)))
+
+    def pending_angles(self, angles: np.ndarray) -> np.ndarray:
+        """Drop angles already in the journal and continue the pattern store of interrupted scan"""
+        completed = np.asarray(self.journal.completed_angles, dtype=float)
+        if len(completed) == 0:
+            return angles
+        angles = angles[~np.isclose(angles[:, None], completed[None, :]).any(axis=1)]
+        if self.store is not None:
+            # Records persisted after the last journaled angle are dropped and measured again
+            self.store_writer = PatternStoreWriter.reopen(self.store, count=len(completed))
+            if self.sampler is not None:
+                pattern = PatternStore(self.store)
+                for angle, s in zip(pattern.angles, pattern.s):
+                    self.sampler.add(angle, s[:, 1, 0])
+        if self.sampler is not None and len(angles) == 0:
+            angles = self.sampler.next_angles()
+        return angles
+
+    def plan(self, angles: np.ndarray) -> ScanPlan:
+        return plan_scan(angles, self.speed, self.scan_order, self.position, self.allow_wrap)
+
+    def run(self, plan: ScanPlan, on_persisted: Callable[[], None] = None) -> None:
+        """Measure planned angles and then angles refined by the adaptive sampler, pass after pass"""
+        while len(plan.angles) > 0:
+            self.pipeline.run(plan.angles, lambda angle, data: self._persist(angle, data, on_persisted))
+            self.passes_stats.append(self.pipeline.format_stats())
+            plan = self.plan(self.sampler.next_angles() if self.sampler is not None else [])
+
+    def finish(self) -> None:
+        """Return table home and mark the scan complete in the journal"""
+        move_along(self.rt, self.rt_id, self.position, 0, self.speed, self.allow_wrap)
+        self.position = 0
+        self.journal.complete()
+
+    def format_stats(self) -> str:
+        lines = []
+        for i, stats in enumerate(self.passes_stats):
+            if len(self.passes_stats) > 1:
+                lines.append(f"Pass {i+1:d}")
+            lines.append(stats)
+        lines.append(self.settle.format_stats())
+        if self.averager is not None:
+            lines.append(self.averager.format_stats())
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        if self.store_writer is not None:
+            self.store_writer.close()
+
+    def _move(self, angle: float) -> None:
+        status = move_along(self.rt, self.rt_id, self.position, angle, self.speed, self.allow_wrap, stop=self.pipeline.stop)
+        with optional_span(self.tracer, "settle", "motion", angle=float(angle)):
+            self.settle.wait(leg_delta(self.position, angle, self.allow_wrap), self.speed, self.pipeline.stop)
+        self.position = angle
+        self.table_angles[angle] = status.current_angle
+
+    def _single_measure(self) -> rf.Network:
+        self.vna.start_single_sweep_await()
+        return self.vna.get_traces_data_as_s2p()
+
+    def _sweep(self) -> None:
+        # VNA is free only in the sweep stage, so signal settling is checked there
+        if self.settle.vna_probe is not None:
+            with optional_span(self.tracer, "settle_signal", "vna"):
+                self.settle.wait_signal()
+        if self.averager is None:
+            self.vna.start_single_sweep_await()
+            return
+        # Table must stay at the angle for all sweeps, so they are read out in the sweep stage
+        with optional_span(self.tracer, "averaging", "vna") as span:
+            self.averaged_sweeps.append(self.averager.measure(self._single_measure, self.pipeline.stop))
+            if span is not None:
+                span["sweeps"] = self.averager.counts[-1]
+
+    def _persist(self, angle: float, data, on_persisted: Callable[[], None] = None) -> None:
+        s2p, extra, extra_fields = data, {}, ()
+        if self.averager is not None:
+            s2p, accumulator = data
+            extra = {STD_FIELD: accumulator.std, SWEEPS_FIELD: accumulator.count}
+            extra_fields = averaging_fields(len(s2p.f))
+        if self.store is not None:
+            if self.store_writer is None:
+                self.metadata["freq_settings"] = FrequencySettings(s2p.f[0], s2p.f[-1], len(s2p.f))._asdict()
+                self.store_writer = PatternStoreWriter.from_network(self.store, s2p, self.metadata, extra_fields)
+            with optional_span(self.tracer, "store.append", "disk"):
+                self.store_writer.append_network(angle, s2p, **extra)
+        if self.s2p_name is not None:
+            s2p.comments = f"angle={angle:f}deg"
+            if self.averager is not None:
+                s2p.comments += f" sweeps={extra[SWEEPS_FIELD]:d}"
+            filename = filename_from_angle_n_s2pname(self.s2p_name, angle, self.name_angle_step)
+            with optional_span(self.tracer, "touchstone.write", "disk"):
+                s2p.write_touchstone(filename, self.s2p_dir, skrf_comment=False)
+        # Angle is journaled only after its data is on disk
+        self.journal.record_angle(angle, self.table_angles.pop(angle, None))
+        if self.live_plot is not None:
+            self.live_plot.update(angle, s2p)
+        if self.sampler is not None:
+            self.sampler.add(angle, s2p.s[:, 1, 0])
+        if on_persisted is not None:
+            on_persisted()
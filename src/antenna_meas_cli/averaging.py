@@ -0,0 +1,98 @@
+"""Averaging of repeated sweeps at a single angle with running mean and variance.
+
+Sweeps are accumulated one by one with Welford's update, so memory doesn't depend on the number of sweeps.
+Averaging stops early when the confidence interval of mean S21 gets narrower than the target, so repeated
+sweeps are spent only on angles with low signal to noise ratio.
+"""
+from statistics import NormalDist
+from typing import Callable, List, Tuple
+import threading
+import numpy as np
+import skrf as rf
+
+DEFAULT_CONFIDENCE = 0.95
+# Normal quantile underestimates confidence interval from fewer sweeps, so early stopping waits for this many
+DEFAULT_MIN_SWEEPS = 4
+STD_FIELD = "s_std"
+SWEEPS_FIELD = "sweeps"
+
+def averaging_fields(points_num: int) -> List[Tuple]:
+    """Pattern store fields with standard deviation of single sweep S-parameters and number of averaged sweeps"""
+    return [(STD_FIELD, "<f8", (points_num, 2, 2)), (SWEEPS_FIELD, "<i4")]
+
+class ComplexWelford:
+    """Running mean and variance E|x - mean|^2 of complex arrays"""
+    def __init__(self):
+        self.count = 0
+        self.mean: np.ndarray = None
+        self.m2: np.ndarray = None
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.complex128)
+        if self.mean is None:
+            self.mean = np.zeros_like(values)
+            self.m2 = np.zeros(values.shape)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += (delta * np.conj(values - self.mean)).real
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.zeros_like(self.m2)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    @property
+    def standard_error(self) -> np.ndarray:
+        return self.std / np.sqrt(self.count)
+
+def s21_ci_db(accumulator: ComplexWelford, confidence: float = DEFAULT_CONFIDENCE) -> float:
+    """Half-width of confidence interval of mean |S21| in dB, the widest one over frequencies"""
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    s21 = np.abs(accumulator.mean[:, 1, 0])
+    relative = z * accumulator.standard_error[:, 1, 0] / np.maximum(s21, np.finfo(float).tiny)
+    return float(np.max(20*np.log10(1 + relative)))
+
+class SweepAverager:
+    """Repeat sweeps at an angle up to max_sweeps times, or until S21 confidence interval is below ci_target_db"""
+    def __init__(self, max_sweeps: int, ci_target_db: float = None, confidence: float = DEFAULT_CONFIDENCE,
+            min_sweeps: int = DEFAULT_MIN_SWEEPS):
+        if max_sweeps < 1:
+            raise ValueError("Number of sweeps per angle must be at least 1.")
+        self.max_sweeps = max_sweeps
+        self.ci_target_db = ci_target_db
+        self.confidence = confidence
+        self.min_sweeps = min(max(min_sweeps, 2), max_sweeps)
+        self.counts: List[int] = []
+
+    def is_done(self, accumulator: ComplexWelford) -> bool:
+        if accumulator.count >= self.max_sweeps:
+            return True
+        if self.ci_target_db is None or accumulator.count < self.min_sweeps:
+            return False
+        return s21_ci_db(accumulator, self.confidence) <= self.ci_target_db
+
+    def measure(self, sweep: Callable[[], rf.Network], stop: threading.Event = None) -> Tuple[rf.Network, ComplexWelford]:
+        """Return network with mean S-parameters of repeated sweeps and their accumulator, fewer sweeps when stop is set"""
+        accumulator = ComplexWelford()
+        while True:
+            network = sweep()
+            accumulator.add(network.s)
+            if self.is_done(accumulator) or (stop is not None and stop.is_set()):
+                break
+        self.counts.append(accumulator.count)
+        averaged = network.copy()
+        averaged.s = accumulator.mean
+        return averaged, accumulator
+
+    def format_stats(self) -> str:
+        if len(self.counts) == 0:
+            return "No angles averaged"
+        counts = np.asarray(self.counts)
+        return (f"sweeps per angle mean {counts.mean():.1f}, max {counts.max():d}, "
+            f"{np.count_nonzero(counts < self.max_sweeps):d} of {len(counts):d} angles stopped early")
@@ -1,22 +1,43 @@
+from typing import Tuple
 import pyvisa
 import click
+import csv
+import os
 import time
 from vna_anritsu_MS20xxC_api import vna_api
 from rotary_table_api import rotary_table_api as rt_api
 from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.bus_scheduler import BusScheduler
+from antenna_meas_cli import continuous_meas
+from antenna_meas_cli import discovery
+from antenna_meas_cli.pipeline import MeasurementPipeline
+from antenna_meas_cli.angular_scan import AngularScan, filename_from_angle_n_s2pname
+from antenna_meas_cli.pattern_store import PatternStore, PatternStoreWriter
+from antenna_meas_cli import s2p_import
+from antenna_meas_cli.live_plot import LivePlot, frequency_indices
+from antenna_meas_cli import pattern_analysis
+from antenna_meas_cli import time_gating
+from antenna_meas_cli.profiling import Tracer, trace_vna
+from antenna_meas_cli.adaptive_sampling import AdaptiveSampler, DEFAULT_TOLERANCE_DB
+from antenna_meas_cli.settling import SettleDetector, DEFAULT_MAX_SETTLE_TIME, make_vna_s21_probe
+from antenna_meas_cli.scan_journal import ScanJournal, journal_path_for
+from antenna_meas_cli.averaging import SweepAverager
+from antenna_meas_cli.scan_planner import ORDER_AUTO, SCAN_ORDERS, leg_delta
+from antenna_meas_cli.sphere_scan import (SPHERE_FIELDS, SpherePoint, TRAJECTORY_GRID, TRAJECTORY_SPIRAL, plan_sphere_scan,
+    move_heads, is_sphere_store, sphere_coordinates)
+from vna_anritsu_MS20xxC_api.vna_types import FrequencySettings, SParam
 import skrf as rf
-import matplotlib
 from matplotlib import pyplot as plt
 import numpy as np
 
 @click.command()
 def list_devices():
+    """Probe VISA instruments and rotary table controllers, results are cached for meas commands"""
     rm = pyvisa.ResourceManager()
+    devices = discovery.cached_discover_devices(rm, refresh=True)
     click.secho("# Note that not all ports may be listed")
     click.secho("# VISA instruments", bold=True)
-    instruments = vna_api.list_visa_instruments(rm)
-    for inst_name in instruments:
-        idn = vna_api.get_instrument_idn(rm, inst_name)
+    for inst_name, idn in devices.instruments.items():
         click.echo(inst_name + "\t", nl=False)
         if vna_api.is_instrument_supported(idn):
             click.secho(idn, fg="green")
@@ -24,34 +45,35 @@ def list_devices():
             click.echo(idn)
 
     click.secho("# Rotary tables", bold=True)
-    for port_name, port_info in rt_api.list_com_ports().items():
-        if rt_api.is_com_port_valid(port_info):
-            click.secho(port_name, fg="green")
+    ports_info = {port_info.device: port_info for port_info in rt_api.list_com_ports().values()}
+    for port, voltage in devices.controllers.items():
+        if voltage is not None:
+            click.secho(f"{port}\tcontroller voltage = {voltage:2.2f} V", fg="green")
+        elif rt_api.is_com_port_valid(ports_info.get(port)):
+            click.secho(port, fg="green")
         else:
-            click.echo(port_name)
+            click.echo(port)
 
-def filename_from_angle_n_s2pname(filename: str, angle: float, angle_step:float = None) -> str:
-    precision = None
-    if angle_step is None or angle_step != round(angle_step, 0):
-        precision = 3
-    angle_str = str(round(angle, precision)).replace(".", "#")
-    return f"{filename}_{angle_str}deg"
-
-@click.command()
-@click.option("--rt-port", required=True, help="Rotary table controller COM port")
-@click.option("--rt-id", required=True, type=int, help="Rotary table ID")
-@click.option("--vna-name", required=True, help="VNA VISA resource name")
-@click.option("--s2p-name", required=True, type=click.Path(exists=False), help="S2P output filename, extension and angle suffix will be automatically added")
-@click.option("--s2p-dir", required=False, type=click.Path(exists=False), help="S2P output directory")
-@click.option("--speed", default=5, show_default=True, type=float, help="Rotational speed in RPM")
-@click.option("--angle-step", default=5, show_default=True, type=float, help="Rotary table will be rotated by angle step between measures. Rotary table rotates 360deg, but don't made measurement after returning home position.")
-@click.option("--f-show", multiple=True, type=float, help="Show live plot for given frequencies, GUI may be blocked and works unstable")
-@click.option("--rs-converter", is_flag=True)
-def meas(rt_port, rt_id, vna_name, s2p_name, s2p_dir, speed, angle_step, f_show, rs_converter):
-    rt = rt_api.RotaryTable(rt_port, rs_converter)
-    visa_rm = pyvisa.ResourceManager()
-    vna = vna_api.VNA(visa_rm, vna_name)
+def resolve_devices(rt_port: str, vna_name: str) -> Tuple[str, str]:
+    """Fill rotary table port and VNA name which weren't given from cached discovery"""
+    if rt_port is not None and vna_name is not None:
+        return rt_port, vna_name
+    devices = discovery.cached_discover_devices(pyvisa.ResourceManager())
+    source = "cached discovery, run list-devices to refresh it" if devices.is_cached else "discovery"
+    if vna_name is None:
+        vna_name = discovery.find_vna(devices)
+        if vna_name is None:
+            raise click.UsageError("No supported VNA found, give --vna-name.")
+        click.echo(f"Using VNA {vna_name} from {source}")
+    if rt_port is None:
+        rt_port = discovery.find_controller(devices)
+        if rt_port is None:
+            raise click.UsageError("No rotary table controller answered, give --rt-port.")
+        click.echo(f"Using rotary table controller on {rt_port} from {source}")
+    return rt_port, vna_name
 
+def prepare_rotary_table(rt: rt_api.RotaryTable, rt_id: int, rs_converter: bool) -> bool:
+    """Check controller supply and set home position of rotary table, return False when measurement can't be started"""
     if not rs_converter:
         resp = rt.send_request(rt_msg.RequestGetConverterStatus(rt_api.CONTROLLER_ADDRESS))      
         click.echo("Controller voltage = ", nl=False)
@@ -59,67 +81,446 @@ def meas(rt_port, rt_id, vna_name, s2p_name, s2p_dir, speed, angle_step, f_show,
         click.secho(f"{resp.voltage:2.2f} V", fg=volt_fg)
         if not resp.is_voltage_OK:
             click.secho("Inncorrect supply voltage! Connect USB power source that support USB Quick Charge 2.0 with 12V output voltage.", fg="red")
-            return
+            return False
     rt.send_request(rt_msg.RequestDisable(rt_id))
     click.pause("Rotate antenna to home position by hands and press any key to continue...")
     rt.send_request(rt_msg.RequestHalt(rt_id))
     
     time.sleep(0.1)
     rt.send_request(rt_msg.RequestSetHome(rt_id))
+    return True
+
+def halt_rotary_table(rt: rt_api.RotaryTable, rt_id: int):
+    rt.send_request(rt_msg.RequestHalt(rt_id))
+    click.secho("Halting rotary table...")
+    time.sleep(1)
+    rt.send_request(rt_msg.RequestDisable(rt_id))
+    click.secho("Disabling rotary table and exit")
+
+# Largest difference between table angle readback and its last journaled value, when home is trusted on resume
+RESUME_ANGLE_TOLERANCE = 1.0
+
+def restore_rotary_table_home(rt: rt_api.RotaryTable, rt_id: int, rs_converter: bool, last_table_angle: float) -> bool:
+    """Keep home position of interrupted scan when table stayed where it was left, otherwise set it again by hands"""
+    status = rt.send_request(rt_msg.RequestGetStatus(rt_id))
+    if last_table_angle is not None and abs(continuous_meas.wrap_angle_delta(last_table_angle, status.current_angle)) <= RESUME_ANGLE_TOLERANCE:
+        click.echo(f"Rotary table is at {status.current_angle:.2f}deg as left by interrupted scan, home position is kept")
+        rt.send_request(rt_msg.RequestHalt(rt_id))
+        return True
+    click.secho(f"Rotary table is at {status.current_angle:.2f}deg, but interrupted scan left it at {last_table_angle}deg.", fg="yellow")
+    if click.confirm("Is home position of the table still valid?", default=False):
+        rt.send_request(rt_msg.RequestHalt(rt_id))
+        return True
+    click.echo("Home position must be set at the same place as for interrupted scan")
+    return prepare_rotary_table(rt, rt_id, rs_converter)
+
+def get_instrument_settings(vna: vna_api.VNA) -> dict:
+    sweep_settings = vna.get_sweep_settings()
+    return {
+        "vna_idn": vna.get_identification().strip(),
+        "freq_settings": vna.get_freq_settings()._asdict(),
+        "ifbw": sweep_settings.ifbw,
+        "averaging": sweep_settings.averaging,
+    }
+
+def compare_instrument_settings(journaled: dict, current: dict) -> str:
+    """Return description of the first difference between instrument settings, None when they match"""
+    for key in ("vna_idn", "ifbw", "averaging"):
+        if journaled.get(key) != current[key]:
+            return f"{key} was {journaled.get(key)}, but now it is {current[key]}"
+    journaled_freq, current_freq = journaled.get("freq_settings", {}), current["freq_settings"]
+    for key, value in current_freq.items():
+        if journaled_freq.get(key) is None or not np.isclose(journaled_freq[key], value, rtol=1E-9):
+            return f"frequency {key} was {journaled_freq.get(key)}, but now it is {value}"
+    return None
+
+@click.command()
+@click.option("--rt-port", required=False, help="Rotary table controller COM port, discovered when not given")
+@click.option("--rt-id", required=True, type=int, help="Rotary table ID")
+@click.option("--vna-name", required=False, help="VNA VISA resource name, discovered when not given")
+@click.option("--store", required=False, type=click.Path(exists=False), help="Pattern store output file, all angles are saved in a single binary file")
+@click.option("--s2p-name", required=False, type=click.Path(exists=False), help="S2P output filename, extension and angle suffix will be automatically added")
+@click.option("--s2p-dir", required=False, type=click.Path(exists=False), help="S2P output directory")
+@click.option("--speed", default=5, show_default=True, type=float, help="Rotational speed in RPM")
+@click.option("--angle-step", default=5, show_default=True, type=float, help="Rotary table will be rotated by angle step between measures. Rotary table rotates 360deg, but don't made measurement after returning home position.")
+@click.option("--f-show", multiple=True, type=float, help="Show live plot for given frequencies, plot is drawn in a separate process")
+@click.option("--polar", is_flag=True, help="Show live plot in polar coordinates")
+@click.option("--rs-converter", is_flag=True)
+@click.option("--adaptive-budget", required=False, type=int, help="Measure coarse grid with angle step and then refine it where pattern changes fastest, until given total number of angles is measured")
+@click.option("--adaptive-tol", default=DEFAULT_TOLERANCE_DB, show_default=True, type=float, help="Estimated interpolation error of normalised S21 in dB above which adaptive sampling refines an interval")
+@click.option("--settle-max", default=DEFAULT_MAX_SETTLE_TIME, show_default=True, type=float, help="Maximum time in seconds of waiting after move until angle readbacks are stable")
+@click.option("--settle-vna-threshold", required=False, type=float, help="After angle readbacks are stable, repeat S21 sweeps until their relative variance drops below given threshold")
+@click.option("--profile", required=False, type=click.Path(dir_okay=False), help="Write timeline of all stages and I/O calls to given Chrome trace JSON file and print summary")
+@click.option("--scan-order", default=ORDER_AUTO, show_default=True, type=click.Choice([ORDER_AUTO, *SCAN_ORDERS]), help="Order of measured angles, auto picks the one with the shortest estimated motion time")
+@click.option("--allow-wrap", is_flag=True, help="Table may rotate through 0/360deg, e.g. when there's no cable to wind, otherwise it stays within one turn and unwinds when returning home")
+@click.option("--sweeps-per-angle", default=1, show_default=True, type=click.IntRange(min=1), help="Average up to given number of sweeps at every angle, standard deviation is saved to pattern store")
+@click.option("--ci-target", required=False, type=float, help="Stop averaging when confidence interval of S21 magnitude is narrower than given dB")
+@click.option("--journal", required=False, type=click.Path(dir_okay=False), help="Scan journal file, by default next to the pattern store or S2P files")
+@click.option("--resume", is_flag=True, help="Resume interrupted scan from its journal, only missing angles are measured")
+def meas(rt_port, rt_id, vna_name, store, s2p_name, s2p_dir, speed, angle_step, f_show, polar, rs_converter, adaptive_budget,
+        adaptive_tol, settle_max, settle_vna_threshold, profile, scan_order, allow_wrap, sweeps_per_angle, ci_target, journal, resume):
+    if store is None and s2p_name is None:
+        raise click.UsageError("At least one of --store and --s2p-name options must be given.")
+    sampler = None
+    if adaptive_budget is not None:
+        try:
+            sampler = AdaptiveSampler(angle_step, adaptive_budget, adaptive_tol)
+        except ValueError as err:
+            raise click.BadParameter(str(err), param_hint="--adaptive-budget")
+    averager = None
+    if sweeps_per_angle > 1:
+        averager = SweepAverager(sweeps_per_angle, ci_target)
+    elif ci_target is not None:
+        raise click.UsageError("--ci-target requires --sweeps-per-angle higher than 1.")
+    journal_path = journal or journal_path_for(store, s2p_name, s2p_dir)
+    settings = {
+        "rt_id": rt_id,
+        "angle_step": angle_step,
+        "adaptive_budget": adaptive_budget,
+        "adaptive_tol": adaptive_tol if sampler is not None else None,
+        "store": store,
+        "s2p_name": s2p_name,
+        "s2p_dir": s2p_dir,
+        "sweeps_per_angle": sweeps_per_angle,
+        "speed": speed,
+        "scan_order": scan_order,
+        "allow_wrap": allow_wrap,
+    }
+    scan_journal = None
+    if resume:
+        if not os.path.exists(journal_path):
+            raise click.UsageError(f"There is no scan journal {journal_path} to resume.")
+        scan_journal = ScanJournal.load(journal_path)
+        if scan_journal.is_complete:
+            scan_journal.close()
+            click.echo("Scan is already complete")
+            return
+        for key, value in settings.items():
+            if scan_journal.settings.get(key) != value:
+                scan_journal.close()
+                raise click.UsageError(f"Setting {key} = {value} differs from interrupted scan, where it was {scan_journal.settings.get(key)}.")
+        if sampler is not None and store is None:
+            scan_journal.close()
+            raise click.UsageError("Resuming adaptive scan requires --store.")
+        if store is not None and len(scan_journal.completed_angles) > 0 and not os.path.exists(store):
+            scan_journal.close()
+            raise click.UsageError(f"Pattern store {store} of interrupted scan doesn't exist, remove the journal to start a new scan.")
+    elif os.path.exists(journal_path):
+        previous_journal = ScanJournal.load(journal_path, writable=False)
+        if not previous_journal.is_complete:
+            raise click.UsageError(f"There is a journal of unfinished scan {journal_path}, continue it with --resume or remove the journal.")
+    try:
+        rt_port, vna_name = resolve_devices(rt_port, vna_name)
+        rt = rt_api.RotaryTable(rt_port, rs_converter)
+        visa_rm = pyvisa.ResourceManager()
+        vna = vna_api.VNA(visa_rm, vna_name)
+        tracer = None
+        if profile is not None:
+            tracer = Tracer()
+            rt.tracer = tracer
+            trace_vna(vna, tracer)
+
+        vna.set_traces_as_s2p()
+        vna.set_is_sweep_continuous(False)
+        instrument = get_instrument_settings(vna)
+        if scan_journal is None:
+            if not prepare_rotary_table(rt, rt_id, rs_converter):
+                return
+            home = {"rt_id": rt_id, "rt_port": rt_port, "time": time.time()}
+            scan_journal = ScanJournal.create(journal_path, settings, home, instrument)
+        else:
+            difference = compare_instrument_settings(scan_journal.instrument, instrument)
+            if difference is not None:
+                raise click.ClickException(f"VNA settings differ from interrupted scan: {difference}.")
+            if not restore_rotary_table_home(rt, rt_id, rs_converter, scan_journal.last_table_angle):
+                return
+
+        live_plot = None
+        if len(f_show) > 0:
+            live_plot = LivePlot(f_show, polar)
+            live_plot.start()
+        vna_probe = make_vna_s21_probe(vna) if settle_vna_threshold is not None else None
+        settle = SettleDetector(rt, rt_id, settle_max, vna_probe=vna_probe, variance_threshold=settle_vna_threshold or 0)
+        metadata = {
+            "rt_id": rt_id,
+            "vna_name": vna_name,
+            "vna_idn": instrument["vna_idn"],
+            "speed_rpm": speed,
+            # Refined angles aren't multiples of angle step, so they are saved with fractional part
+            "angle_step": angle_step if sampler is None else None,
+            "coarse_angle_step": angle_step,
+            "adaptive_budget": adaptive_budget,
+            "adaptive_tol": adaptive_tol if sampler is not None else None,
+            "start_time": scan_journal.start["time"],
+            "sweeps_per_angle": sweeps_per_angle,
+            "ci_target_db": ci_target,
+        }
+        scan = AngularScan(rt, rt_id, vna, scan_journal, settle, speed, scan_order, allow_wrap, store, s2p_name, s2p_dir,
+            metadata, sampler, averager, live_plot, tracer)
+        try:
+            completed = len(scan_journal.angles)
+            angle_points = scan.pending_angles(np.arange(0, 360, angle_step))
+            if completed > 0:
+                click.echo(f"Resuming scan with {completed:d} angles already measured")
+            plan = scan.plan(angle_points)
+            click.echo(f"Scan order {plan.order}, estimated motion time {plan.motion_time:.1f} s")
+            with click.progressbar(length=adaptive_budget or len(angle_points) + completed, label="Measuring in progress",
+                show_eta=True, show_pos=True) as bar:
+                bar.update(completed)
+                scan.run(plan, lambda: bar.update(1))
+            click.echo(scan.format_stats())
+            scan.finish()
+        except (KeyboardInterrupt, IOError, pyvisa.VisaIOError) as err:
+            if not isinstance(err, KeyboardInterrupt):
+                click.secho(f"Measurement failed: {err}", fg="red")
+            try:
+                halt_rotary_table(rt, rt_id)
+                scan_journal.record_position(rt.send_request(rt_msg.RequestGetStatus(rt_id)).current_angle)
+            except (IOError, pyvisa.VisaIOError):
+                click.secho("Unable to halt rotary table!", fg="red")
+            click.echo(f"{len(scan_journal.angles):d} angles saved, continue the scan with --resume")
+            if live_plot is not None:
+                live_plot.close(wait=False)
+            return
+        finally:
+            scan.close()
+            scan_journal.close()
+            if tracer is not None:
+                tracer.write_chrome_trace(profile)
+                click.echo(tracer.format_summary())
+        if live_plot is not None:
+            click.echo("Close the plot window to exit")
+            live_plot.close()
+    finally:
+        if scan_journal is not None:
+            scan_journal.close()
+
+@click.command()
+@click.argument("store", type=click.Path(exists=True, dir_okay=False))
+@click.option("--s2p-name", required=True, type=click.Path(exists=False), help="S2P output filename, extension and angle suffix will be automatically added")
+@click.option("--s2p-dir", required=False, type=click.Path(exists=False), help="S2P output directory")
+def export_s2p(store, s2p_name, s2p_dir):
+    """Export pattern store to one S2P file per angle"""
+    pattern = PatternStore(store)
+    if is_sphere_store(pattern):
+        # Records of a sphere scan share phi across elevations, so theta goes to the filename as well
+        thetas, phis = sphere_coordinates(pattern)
+        theta_step, phi_step = pattern.metadata.get("theta_step"), pattern.metadata.get("phi_step")
+        filenames = [filename_from_angle_n_s2pname(filename_from_angle_n_s2pname(f"{s2p_name}_theta", theta, theta_step) + "_phi",
+            phi, phi_step) for theta, phi in zip(thetas, phis)]
+    else:
+        angle_step = pattern.metadata.get("angle_step")
+        filenames = [filename_from_angle_n_s2pname(s2p_name, angle, angle_step) for angle in pattern.angles]
+    for filename, (_, s2p) in zip(filenames, pattern.networks()):
+        s2p.write_touchstone(filename, s2p_dir, skrf_comment=False)
+    click.echo(f"{len(pattern):d} files exported")
+
+@click.command()
+@click.option("--rt-port", required=False, help="Rotary table controller COM port, discovered when not given")
+@click.option("--rt-id", required=True, type=int, help="Rotary table ID")
+@click.option("--vna-name", required=False, help="VNA VISA resource name, discovered when not given")
+@click.option("--s2p-name", required=True, type=click.Path(exists=False), help="S2P output filename, extension and angle suffix will be automatically added")
+@click.option("--s2p-dir", required=False, type=click.Path(exists=False), help="S2P output directory")
+@click.option("--speed", default=1, show_default=True, type=float, help="Rotational speed in RPM, lower speed gives lower angular smear per sweep")
+@click.option("--rs-converter", is_flag=True)
+def meas_continuous(rt_port, rt_id, vna_name, s2p_name, s2p_dir, speed, rs_converter):
+    """Measure while rotary table rotates 360deg without stopping, every sweep is tagged with interpolated angle and angular smear"""
+    rt_port, vna_name = resolve_devices(rt_port, vna_name)
+    rt = rt_api.RotaryTable(rt_port, rs_converter)
+    visa_rm = pyvisa.ResourceManager()
+    vna = vna_api.VNA(visa_rm, vna_name)
+
+    if not prepare_rotary_table(rt, rt_id, rs_converter):
+        return
+    vna.set_traces_as_s2p()
+    vna.set_is_sweep_continuous(False)
+
+    summary_path = os.path.join(s2p_dir or "", f"{s2p_name}_sweeps.csv")
+    try:
+        with open(summary_path, "w", newline="") as summary_file:
+            summary = csv.writer(summary_file)
+            summary.writerow(("index", "angle_deg", "smear_deg", "angle_start_deg", "angle_stop_deg", "time_start", "time_stop"))
+            for i, sweep in enumerate(continuous_meas.continuous_measure(rt, vna, rt_id, speed)):
+                sweep.s2p.comments = continuous_meas.sweep_comment(sweep)
+                filename = filename_from_angle_n_s2pname(s2p_name, sweep.angle)
+                sweep.s2p.write_touchstone(filename, s2p_dir, skrf_comment=False)
+                summary.writerow((i, sweep.angle, sweep.smear, sweep.angle_start, sweep.angle_stop, sweep.time_start, sweep.time_stop))
+                click.echo(f"angle={sweep.angle:7.3f}deg smear={sweep.smear:6.3f}deg")
+    except (KeyboardInterrupt, IOError, pyvisa.VisaIOError) as err:
+        # Table turns while VNA sweeps, so it must be halted on any failure, not only on interruption
+        if not isinstance(err, KeyboardInterrupt):
+            click.secho(f"Measurement failed: {err}", fg="red")
+        try:
+            halt_rotary_table(rt, rt_id)
+        except (IOError, pyvisa.VisaIOError):
+            click.secho("Unable to halt rotary table!", fg="red")
+        return
+
+@click.command()
+@click.option("--rt-port", required=False, help="Rotary table controller COM port, discovered when not given")
+@click.option("--az-id", required=True, type=int, help="ID of rotary table turning antenna in azimuth (phi)")
+@click.option("--el-id", required=True, type=int, help="ID of rotary table turning antenna in elevation (theta)")
+@click.option("--vna-name", required=False, help="VNA VISA resource name, discovered when not given")
+@click.option("--store", required=True, type=click.Path(exists=False, dir_okay=False), help="Pattern store output file, theta and phi are saved in every record")
+@click.option("--az-speed", default=5, show_default=True, type=float, help="Rotational speed of azimuth table in RPM")
+@click.option("--el-speed", default=5, show_default=True, type=float, help="Rotational speed of elevation table in RPM")
+@click.option("--theta-step", default=10, show_default=True, type=float, help="Elevation step in degrees")
+@click.option("--phi-step", default=10, show_default=True, type=float, help="Azimuth step in degrees, for spiral it's the spacing at the equator")
+@click.option("--theta-max", default=180, show_default=True, type=click.FloatRange(0, 180), help="Highest elevation angle, 90 for a hemisphere")
+@click.option("--trajectory", default=TRAJECTORY_GRID, show_default=True, type=click.Choice([TRAJECTORY_GRID, TRAJECTORY_SPIRAL]), help="Grid of all theta x phi points or spiral with points thinned towards poles")
+@click.option("--settle-max", default=DEFAULT_MAX_SETTLE_TIME, show_default=True, type=float, help="Maximum time in seconds of waiting after move until angle readbacks are stable")
+@click.option("--poll-rate", default=20, show_default=True, type=float, help="Requests per second sent on the bus")
+@click.option("--rs-converter", is_flag=True)
+def meas_sphere(rt_port, az_id, el_id, vna_name, store, az_speed, el_speed, theta_step, phi_step, theta_max, trajectory,
+        settle_max, poll_rate, rs_converter):
+    """Measure 3D pattern with azimuth and elevation tables moving in parallel"""
+    if az_id == el_id:
+        raise click.BadParameter("Azimuth and elevation tables must have different IDs.", param_hint="--el-id")
+    plan = plan_sphere_scan(theta_step, phi_step, az_speed, el_speed, theta_max, trajectory)
+    rt_port, vna_name = resolve_devices(rt_port, vna_name)
+    rt = rt_api.RotaryTable(rt_port, rs_converter)
+    visa_rm = pyvisa.ResourceManager()
+    vna = vna_api.VNA(visa_rm, vna_name)
+    scheduler = BusScheduler(rt, (az_id, el_id), poll_rate=poll_rate, use_broadcast=False)
+
+    for rt_id in (az_id, el_id):
+        if not prepare_rotary_table(rt, rt_id, rs_converter):
+            return
     vna.set_traces_as_s2p()
     vna.set_is_sweep_continuous(False)
+    slow_axis = f", slow axis {plan.slow_axis}" if plan.slow_axis is not None else ""
+    click.echo(f"{len(plan.points):d} points on {plan.trajectory}{slow_axis}, estimated motion time {plan.motion_time:.0f} s")
 
-    matplotlib.rcParams['toolbar'] = 'None' 
-    fig, ax = plt.subplots()
-    plots = []
-    plots_data = []
-    if len(f_show) > 0:
-        ax.set_ylim(-100, 0)
-        ax.set_xlim(0, 360)        
-        ax.set_ylabel("S_21 (dB)")
-        ax.set_xlabel("Angle (degrees)")
-        for f in f_show:
-            line = ax.plot([],[])[0]
-            line.set_label(f"f={f:e}")
-            plots.append(line)
-            plots_data.append([])
-        ax.legend()
-        fig.canvas.draw()
-        plt.show(block=False)
-    angle_points = np.arange(0, 360, angle_step)
+    settles = {rt_id: SettleDetector(rt, rt_id, settle_max) for rt_id in (az_id, el_id)}
+    rpms = {az_id: az_speed, el_id: el_speed}
+    position = {az_id: 0.0, el_id: 0.0}
+    def move_to(point, stop=None):
+        targets = {az_id: point.phi, el_id: point.theta}
+        move_heads(scheduler, {rt_id: (position[rt_id], targets[rt_id]) for rt_id in targets}, rpms, stop)
+        for rt_id, target in targets.items():
+            if target != position[rt_id]:
+                settles[rt_id].wait(leg_delta(position[rt_id], target), rpms[rt_id], stop)
+            position[rt_id] = target
+    def halt():
+        for rt_id in (az_id, el_id):
+            rt.send_request(rt_msg.RequestHalt(rt_id))
+    # Pipeline items are indices of plan points, so stage spans and stats keep numeric keys
+    pipeline = MeasurementPipeline(lambda index: move_to(plan.points[index], pipeline.stop), vna.start_single_sweep_await,
+        vna.get_traces_data_as_s2p, halt=halt)
+    metadata = {
+        "scan": "sphere",
+        "az_id": az_id,
+        "el_id": el_id,
+        "vna_name": vna_name,
+        "vna_idn": vna.get_identification().strip(),
+        "az_speed_rpm": az_speed,
+        "el_speed_rpm": el_speed,
+        "theta_step": theta_step,
+        "phi_step": phi_step,
+        "theta_max": theta_max,
+        "trajectory": plan.trajectory,
+        "slow_axis": plan.slow_axis,
+        "start_time": time.time(),
+    }
+    store_writer = None
     try:
-        with click.progressbar(angle_points, label="Measuring in progress",
-            show_eta=True, show_pos=True) as bar:
-            for angle in bar:
-                rt.send_request(rt_msg.RequestRotate(rt_id, angle, speed))
-                while(rt.send_request(rt_msg.RequestGetStatus(rt_id)).is_rotating):
-                    time.sleep(0.2)
-                time.sleep(0.5)
-                s2p = vna_single_measure(vna)
-                s2p.comments = f"angle={angle:f}deg"
-                filename = filename_from_angle_n_s2pname(s2p_name, angle, angle_step)                
-                s2p.write_touchstone(filename, s2p_dir, skrf_comment=False)
-                if len(f_show) > 0:
-                    for i in range(len(f_show)):
-                        s21db = 20*np.log10(np.abs(s2p.s[np.abs(s2p.f - f_show[i]).argmin()][1,0]))                        
-                        plots_data[i].append(s21db)
-                        plots[i].set_data(angle_points[0:len(plots_data[i])], plots_data[i])
-                    fig.canvas.draw()
-                    fig.canvas.flush_events()
-
-        rt.send_request(rt_msg.RequestRotate(rt_id, 0, speed))
-        while(rt.send_request(rt_msg.RequestGetStatus(rt_id)).is_rotating):
-            time.sleep(0.2)
+        with click.progressbar(length=len(plan.points), label="Measuring in progress", show_eta=True, show_pos=True) as bar:
+            def persist(index, s2p):
+                nonlocal store_writer
+                if store_writer is None:
+                    metadata["freq_settings"] = FrequencySettings(s2p.f[0], s2p.f[-1], len(s2p.f))._asdict()
+                    store_writer = PatternStoreWriter.from_network(store, s2p, metadata, SPHERE_FIELDS)
+                point = plan.points[index]
+                store_writer.append_network(point.phi, s2p, theta=point.theta, phi=point.phi)
+                bar.update(1)
+            pipeline.run(range(len(plan.points)), persist)
+        click.echo(pipeline.format_stats())
+        move_to(SpherePoint(0.0, 0.0))
+    except (KeyboardInterrupt, IOError, pyvisa.VisaIOError) as err:
+        if not isinstance(err, KeyboardInterrupt):
+            click.secho(f"Measurement failed: {err}", fg="red")
+        for rt_id in (az_id, el_id):
+            halt_rotary_table(rt, rt_id)
+        return
+    finally:
+        if store_writer is not None:
+            store_writer.close()
+
+@click.command()
+@click.option("--rt-port", required=True, help="Rotary table controller COM port")
+@click.option("--rt-id", required=True, type=int, multiple=True, help="Rotary table ID, may be given many times")
+@click.option("--poll-rate", default=20, show_default=True, type=float, help="Status requests per second sent on the bus")
+@click.option("--watch", is_flag=True, help="Refresh status table until interrupted")
+@click.option("--rs-converter", is_flag=True)
+def rt_status(rt_port, rt_id, poll_rate, watch, rs_converter):
+    """Show status of many rotary tables connected to one controller"""
+    rt = rt_api.RotaryTable(rt_port, rs_converter)
+    scheduler = BusScheduler(rt, rt_id, poll_rate=poll_rate, use_broadcast=False)
+    try:
+        while True:
+            scheduler.refresh()
+            if watch:
+                click.clear()
+            click.echo(scheduler.format_status_table())
+            if not watch:
+                return
     except KeyboardInterrupt as err:
-        resp = rt.send_request(rt_msg.RequestHalt(rt_id))
-        click.secho("Halting rotary table...")
-        time.sleep(1)
-        resp = rt.send_request(rt_msg.RequestDisable(rt_id))
-        click.secho("Disabling rotary table and exit")
         return
-    if len(f_show) > 0:
-        plt.draw()
-        click.pause()
+
+@click.command()
+@click.argument("s2p-dir", type=click.Path(exists=True, file_okay=False))
+@click.argument("store", type=click.Path(exists=False, dir_okay=False))
+@click.option("--s2p-name", required=False, help="Import only files with given S2P filename, required when directory contains many measurements")
+@click.option("--workers", type=int, help="Number of parsing processes, defaults to number of CPUs")
+def import_s2p(s2p_dir, store, s2p_name, workers):
+    """Import S2P files created by meas command into a pattern store"""
+    count = s2p_import.import_s2p_directory(s2p_dir, store, s2p_name, workers)
+    click.echo(f"{count:d} angles imported")
+
+@click.command()
+@click.argument("store", type=click.Path(exists=True, dir_okay=False))
+@click.option("--csv-file", type=click.Path(exists=False, dir_okay=False), help="Write figures for all frequencies to CSV file")
+@click.option("--f-show", multiple=True, type=float, help="Print figures for frequencies nearest to given ones")
+def analyze(store, csv_file, f_show):
+    """Compute peak direction, HPBW, F/B ratio and null depth from S21 of a pattern store for all frequencies"""
+    pattern = PatternStore(store)
+    if is_sphere_store(pattern):
+        raise click.UsageError(f"{store} holds a sphere scan, analyze works on single-axis scans only.")
+    figures = pattern_analysis.analyze_pattern(pattern.angles, pattern.freq, pattern.sparam(1, 0))
+    table = pattern_analysis.figures_to_table(figures)
+    header = ("freq_hz", "peak_angle_deg", "peak_db", "hpbw_deg", "front_to_back_db", "null_depth_db", "null_angle_deg")
+    if csv_file is not None:
+        np.savetxt(csv_file, table, fmt="%.9g", delimiter=",", header=",".join(header), comments="")
+    if len(f_show) == 0:
+        f_show = (pattern.freq[0], pattern.freq[len(pattern.freq)//2], pattern.freq[-1])
+    click.echo("".join(f"{name:>17}" for name in header))
+    for i in frequency_indices(pattern.freq, f_show):
+        click.echo("".join(f"{value:>17.6g}" for value in table[i]))
+
+@click.command()
+@click.argument("store", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output", type=click.Path(exists=False, dir_okay=False))
+@click.option("--center", required=True, type=float, help="Gate center in ns")
+@click.option("--span", required=True, type=float, help="Gate span in ns")
+@click.option("--window", default="kaiser6", show_default=True, help="Frequency window: rect, hann, hamming, blackman or kaiser<beta>")
+@click.option("--gate-window", default="kaiser6", show_default=True, help="Gate shape, same names as for --window")
+@click.option("--mode", default=time_gating.GateMode.BANDPASS, show_default=True, type=click.Choice([time_gating.GateMode.BANDPASS, time_gating.GateMode.BANDSTOP]))
+@click.option("--sparam", multiple=True, default=[SParam.S21], show_default=True, type=click.Choice([SParam.S11, SParam.S12, SParam.S21, SParam.S22]), help="Gated S-parameters, other ones are copied")
+def gate(store, output, center, span, window, gate_window, mode, sparam):
+    """Apply time-domain gate to all angles of a pattern store and save result as a new pattern store"""
+    pattern = PatternStore(store)
+    s = np.array(pattern.s)
+    for name in sparam:
+        row, col = vna_api.S2P_INDICES[name]
+        s[:, :, row, col] = time_gating.time_gate(s[:, :, row, col], pattern.freq, center*1E-9, span*1E-9, window, gate_window, mode)
+    metadata = dict(pattern.metadata)
+    metadata["time_gate"] = {"source": os.path.abspath(store), "center_ns": center, "span_ns": span,
+        "window": window, "gate_window": gate_window, "mode": mode, "sparams": list(sparam)}
+    # Extra fields like theta and phi of sphere scans or averaging statistics are copied unchanged
+    extra_fields = pattern.extra_fields
+    with PatternStoreWriter(output, pattern.freq, metadata, extra_fields) as writer:
+        writer.append_many(pattern.angles, s, pattern.timestamps, **{name: pattern.records[name] for name, *_ in extra_fields})
+    click.echo(f"{len(pattern):d} angles gated")
 
 @click.command()
 @click.option("--vna-name", required=True, help="VNA VISA resource name")
@@ -150,6 +551,13 @@ def cli():
     pass
 cli.add_command(list_devices)
 cli.add_command(meas)
+cli.add_command(meas_continuous)
+cli.add_command(meas_sphere)
+cli.add_command(rt_status)
+cli.add_command(export_s2p)
+cli.add_command(import_s2p)
+cli.add_command(analyze)
+cli.add_command(gate)
 cli.add_command(vna_meas)
 if __name__ == "__main__":
     cli()
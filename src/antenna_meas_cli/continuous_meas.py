@@ -0,0 +1,74 @@
+from collections import namedtuple
+from typing import Iterator
+import time
+from vna_anritsu_MS20xxC_api import vna_api
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+
+ContinuousSweep = namedtuple("ContinuousSweep", ("angle", "smear", "angle_start", "angle_stop", "time_start", "time_stop", "s2p"))
+
+WAYPOINT_STEP = 90
+
+def wrap_angle_delta(angle_from: float, angle_to: float) -> float:
+    """Return shortest signed angle from angle_from to angle_to in range (-180, 180]"""
+    delta = (angle_to - angle_from) % 360
+    if delta > 180:
+        delta -= 360
+    return delta
+
+def interpolate_angle(t: float, t0: float, angle0: float, t1: float, angle1: float) -> float:
+    if t1 == t0:
+        return angle0
+    return angle0 + (angle1 - angle0)*(t - t0)/(t1 - t0)
+
+def continuous_measure(rt: rt_api.RotaryTable, vna: vna_api.VNA, rt_id: int, rpm: float,
+        total_angle: float = 360) -> Iterator[ContinuousSweep]:
+    """Rotate table by total_angle without stopping and sweep VNA back to back.
+
+    Each sweep is tagged with angle interpolated in time between status samples taken before and after
+    the sweep. Travelled angle is unwrapped from consecutive samples, so the table must rotate less
+    than 180deg during a single sweep and readout.
+    """
+    status = rt.send_request(rt_msg.RequestGetStatus(rt_id))
+    sample_time = time.time()
+    start_angle = status.current_angle
+    raw_angle = start_angle
+    travelled = 0
+    waypoint = min(WAYPOINT_STEP, total_angle)
+    rt.send_request(rt_msg.RequestRotate(rt_id, start_angle + waypoint, rpm))
+    while True:
+        sweep_start = time.time()
+        vna.start_single_sweep_await()
+        sweep_stop = time.time()
+        s2p = vna.get_traces_data_as_s2p()
+        status = rt.send_request(rt_msg.RequestGetStatus(rt_id))
+        new_sample_time = time.time()
+        new_travelled = travelled + wrap_angle_delta(raw_angle, status.current_angle)
+
+        angle_start = interpolate_angle(sweep_start, sample_time, travelled, new_sample_time, new_travelled)
+        angle_stop = interpolate_angle(sweep_stop, sample_time, travelled, new_sample_time, new_travelled)
+        yield ContinuousSweep(
+            angle=(start_angle + (angle_start + angle_stop)/2) % 360,
+            smear=angle_stop - angle_start,
+            angle_start=(start_angle + angle_start) % 360,
+            angle_stop=(start_angle + angle_stop) % 360,
+            time_start=sweep_start,
+            time_stop=sweep_stop,
+            s2p=s2p)
+
+        sample_time = new_sample_time
+        raw_angle = status.current_angle
+        travelled = new_travelled
+        if travelled >= total_angle - rt_msg.ANGLE_PRECISION:
+            return
+        if waypoint < total_angle and waypoint - travelled < WAYPOINT_STEP/2:
+            # Rotate request carries angle modulo 360 and firmware takes the shorter path, so the last waypoint of
+            # a full turn equals start angle. Table still keeps direction, because a waypoint is sent when less than
+            # 1.5*WAYPOINT_STEP < 180deg remain to it.
+            waypoint = min(waypoint + WAYPOINT_STEP, total_angle)
+            rt.send_request(rt_msg.RequestRotate(rt_id, start_angle + waypoint, rpm))
+        elif waypoint >= total_angle and not status.is_rotating:
+            return
+
+def sweep_comment(sweep: ContinuousSweep) -> str:
+    return f"angle={sweep.angle:f}deg smear={sweep.smear:f}deg"
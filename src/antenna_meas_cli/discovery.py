@@ -0,0 +1,89 @@
+"""Discovery of VNAs and rotary table controllers, results are cached on disk.
+
+VISA instruments and serial ports are probed concurrently with short timeouts. Cached results are reused
+until they are older than TTL or the list of VISA resources or COM ports changes, so repeated measurements
+don't probe devices again.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import json
+import os
+import time
+import pyvisa
+from vna_anritsu_MS20xxC_api import vna_api
+from rotary_table_api import rotary_table_api as rt_api
+
+# Instrument identifications and controller voltages by port, None for devices which didn't answer
+DiscoveredDevices = namedtuple("DiscoveredDevices", ("instruments", "controllers", "time", "is_cached"))
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "antenna_meas_cli", "devices.json")
+DEFAULT_CACHE_TTL = 600
+
+def list_ports() -> List[str]:
+    return [port_info.device for port_info in rt_api.list_com_ports().values()]
+
+def discover_devices(rm: pyvisa.ResourceManager, instruments: List[str] = None, ports: List[str] = None,
+        visa_timeout: float = vna_api.PROBE_TIMEOUT, serial_timeout: float = rt_api.PROBE_TIMEOUT) -> DiscoveredDevices:
+    """Probe VISA instruments and ping controllers on serial ports at the same time"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        idns = executor.submit(vna_api.probe_visa_instruments, rm, instruments, visa_timeout)
+        statuses = executor.submit(rt_api.probe_com_ports, ports, serial_timeout)
+        controllers = {port: status.voltage if status is not None else None for port, status in statuses.result().items()}
+        return DiscoveredDevices(idns.result(), controllers, time.time(), False)
+
+def load_cache(path: str, ttl: float, instruments: List[str], ports: List[str]) -> Optional[DiscoveredDevices]:
+    """Return cached discovery of the same instruments and ports which isn't older than ttl, None otherwise"""
+    try:
+        with open(path) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if cache.get("version") != CACHE_VERSION or time.time() - cache["time"] > ttl:
+        return None
+    if sorted(cache["instruments"]) != sorted(instruments) or sorted(cache["controllers"]) != sorted(ports):
+        return None
+    return DiscoveredDevices(cache["instruments"], cache["controllers"], cache["time"], True)
+
+def save_cache(path: str, devices: DiscoveredDevices) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    cache = {
+        "version": CACHE_VERSION,
+        "time": devices.time,
+        "instruments": devices.instruments,
+        "controllers": devices.controllers,
+    }
+    # Replacing the file at once keeps the cache valid when many programs discover devices at the same time
+    temp_path = f"{path}.{os.getpid():d}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(cache, file)
+    os.replace(temp_path, path)
+
+def cached_discover_devices(rm: pyvisa.ResourceManager, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_CACHE_TTL,
+        refresh: bool = False) -> DiscoveredDevices:
+    """Return cached discovery when it's still valid, otherwise probe devices and update the cache"""
+    instruments = list(vna_api.list_visa_instruments(rm))
+    ports = list_ports()
+    if not refresh:
+        devices = load_cache(path, ttl, instruments, ports)
+        if devices is not None:
+            return devices
+    devices = discover_devices(rm, instruments, ports)
+    try:
+        save_cache(path, devices)
+    except OSError:
+        pass
+    return devices
+
+def find_vna(devices: DiscoveredDevices) -> Optional[str]:
+    for inst_name, idn in devices.instruments.items():
+        if vna_api.is_instrument_supported(idn):
+            return inst_name
+    return None
+
+def find_controller(devices: DiscoveredDevices) -> Optional[str]:
+    for port, voltage in devices.controllers.items():
+        if voltage is not None:
+            return port
+    return None
@@ -0,0 +1,134 @@
+from typing import Sequence
+import multiprocessing
+import queue
+import time
+import numpy as np
+import skrf as rf
+
+S21_DB_LIMITS = (-100, 0)
+REFRESH_INTERVAL = 0.05
+
+def frequency_indices(freq: np.ndarray, f_show: Sequence[float]) -> np.ndarray:
+    """Return indices of frequency points nearest to every frequency in f_show"""
+    return np.abs(np.asarray(freq)[None, :] - np.asarray(f_show)[:, None]).argmin(axis=1)
+
+class LivePlot:
+    """Live S21 plot of chosen frequencies versus angle, drawn in a separate process.
+
+    Measurement loop only computes a few values and puts them to the queue without blocking,
+    when plotting process doesn't keep up the oldest values are dropped.
+    """
+    def __init__(self, f_show: Sequence[float], polar: bool = False, queue_size: int = 1000):
+        self.f_show = list(f_show)
+        self.polar = polar
+        self.indices = None
+        self.dropped = 0
+        self.queue = multiprocessing.Queue(maxsize=queue_size)
+        self.process = multiprocessing.Process(target=_plot_process, args=(self.queue, self.f_show, polar), daemon=True)
+
+    def start(self) -> None:
+        self.process.start()
+
+    def update(self, angle: float, s2p: rf.Network) -> None:
+        if self.indices is None:
+            self.indices = frequency_indices(s2p.f, self.f_show)
+        s21db = 20*np.log10(np.abs(s2p.s[self.indices, 1, 0]))
+        self.put((angle, s21db))
+
+    def _put_dropping_oldest(self, item) -> bool:
+        """Put item to the queue without blocking, when it's full the oldest item is dropped to make room"""
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        # Items put just now may still be on their way to the pipe, then the oldest one can't be taken yet
+        try:
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.queue.put_nowait(item)
+            return True
+        except (queue.Empty, queue.Full):
+            return False
+
+    def put(self, item) -> None:
+        """Put item to the queue, it never blocks, so item is dropped when there's no room for it"""
+        if not self._put_dropping_oldest(item):
+            self.dropped += 1
+
+    def close(self, wait: bool = True) -> None:
+        """Finish live updates, when wait is True block until user closes the plot window"""
+        # End of data must not be dropped, items on their way to the pipe can be taken after a moment
+        while not self._put_dropping_oldest(None):
+            time.sleep(REFRESH_INTERVAL)
+        if self.process.is_alive():
+            if wait:
+                self.process.join()
+            else:
+                self.process.terminate()
+
+def _plot_process(data_queue: multiprocessing.Queue, f_show: Sequence[float], polar: bool) -> None:
+    import matplotlib
+    from matplotlib import pyplot as plt
+    matplotlib.rcParams['toolbar'] = 'None'
+    if polar:
+        fig, ax = plt.subplots(subplot_kw={"projection": "polar"})
+    else:
+        fig, ax = plt.subplots()
+        ax.set_xlim(0, 360)
+        ax.set_xlabel("Angle (degrees)")
+    ax.set_ylim(*S21_DB_LIMITS)
+    ax.set_ylabel("S_21 (dB)")
+    lines = []
+    for f in f_show:
+        line = ax.plot([], [], animated=True)[0]
+        line.set_label(f"f={f:e}")
+        lines.append(line)
+    ax.legend()
+    angles = []
+    values = [[] for _ in f_show]
+    state = {"background": None}
+
+    def draw_lines():
+        if state["background"] is None:
+            return
+        fig.canvas.restore_region(state["background"])
+        for line in lines:
+            ax.draw_artist(line)
+        fig.canvas.blit(fig.bbox)
+    def on_draw(event):
+        state["background"] = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_lines()
+    fig.canvas.mpl_connect("draw_event", on_draw)
+    plt.show(block=False)
+    plt.pause(REFRESH_INTERVAL)
+
+    while plt.fignum_exists(fig.number):
+        finished = False
+        updated = False
+        try:
+            while True:
+                item = data_queue.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                angle, s21db = item
+                angles.append(np.deg2rad(angle) if polar else angle)
+                for i, value in enumerate(s21db):
+                    values[i].append(value)
+                updated = True
+        except queue.Empty:
+            pass
+        if updated:
+            # Angles may come unordered, e.g. from refinement passes of adaptive sampling
+            order = np.argsort(angles, kind="stable")
+            for line, line_values in zip(lines, values):
+                line.set_data(np.asarray(angles)[order], np.asarray(line_values)[order])
+            draw_lines()
+        if finished:
+            for line in lines:
+                line.set_animated(False)
+            plt.show()
+            return
+        fig.canvas.flush_events()
+        fig.canvas.start_event_loop(REFRESH_INTERVAL)
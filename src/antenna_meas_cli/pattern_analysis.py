@@ -0,0 +1,69 @@
+from collections import namedtuple
+from typing import Tuple
+import numpy as np
+
+HALF_POWER_DB = -3.0
+
+PatternFigures = namedtuple("PatternFigures", ("freq", "peak_angle", "peak_db", "hpbw", "front_to_back", "null_depth", "null_angle"))
+
+def sort_by_angle(angles: np.ndarray, s21: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    angles = np.asarray(angles, dtype=float) % 360
+    order = np.argsort(angles, kind="stable")
+    return angles[order], np.asarray(s21)[order]
+
+def pattern_db(s21: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return 20*np.log10(np.abs(s21))
+
+def normalize_pattern(pattern: np.ndarray) -> np.ndarray:
+    """Normalise angle x frequency pattern in dB to its maximum at every frequency"""
+    return pattern - pattern.max(axis=0, keepdims=True)
+
+def _half_power_crossing(normalized: np.ndarray, angles: np.ndarray, peak_idx: np.ndarray, direction: int) -> np.ndarray:
+    """Angular distance from peak to the first half-power crossing in given direction, NaN when there isn't any within 180deg"""
+    angles_num, freq_num = normalized.shape
+    steps = np.arange(angles_num // 2 + 1)
+    idx = (peak_idx[None, :] + direction*steps[:, None]) % angles_num
+    columns = np.arange(freq_num)[None, :]
+    values = normalized[idx, columns]
+    distance = (direction*(angles[idx] - angles[peak_idx][None, :])) % 360
+    below = values < HALF_POWER_DB
+    found = below.any(axis=0)
+    first = np.where(found, below.argmax(axis=0), 1)
+    cols = np.arange(freq_num)
+    v_in, v_out = values[first - 1, cols], values[first, cols]
+    d_in, d_out = distance[first - 1, cols], distance[first, cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = d_in + (d_out - d_in)*(v_in - HALF_POWER_DB)/(v_in - v_out)
+    return np.where(found & (d_out <= 180), crossing, np.nan)
+
+def analyze_pattern(angles: np.ndarray, freq: np.ndarray, s21: np.ndarray) -> PatternFigures:
+    """Compute pattern figures for every frequency at once from angle x frequency S21 data.
+
+    Half-power beamwidth is interpolated linearly between measured angles, front-to-back ratio is taken at
+    the angle nearest to the peak direction + 180deg and null depth is the lowest level relative to the peak.
+    """
+    angles, s21 = sort_by_angle(angles, s21)
+    pattern = pattern_db(s21)
+    normalized = normalize_pattern(pattern)
+    columns = np.arange(pattern.shape[1])
+
+    peak_idx = pattern.argmax(axis=0)
+    peak_angle = angles[peak_idx]
+    peak_db = pattern[peak_idx, columns]
+
+    hpbw = _half_power_crossing(normalized, angles, peak_idx, 1) + _half_power_crossing(normalized, angles, peak_idx, -1)
+
+    # Angular distance from every measured angle to the direction opposite to the peak
+    back_distance = np.abs((angles[:, None] - peak_angle[None, :]) % 360 - 180)
+    back_idx = back_distance.argmin(axis=0)
+    front_to_back = -normalized[back_idx, columns]
+
+    null_idx = normalized.argmin(axis=0)
+    null_depth = normalized[null_idx, columns]
+    null_angle = angles[null_idx]
+    return PatternFigures(np.asarray(freq, dtype=float), peak_angle, peak_db, hpbw, front_to_back, null_depth, null_angle)
+
+def figures_to_table(figures: PatternFigures) -> np.ndarray:
+    """Return frequency x figures array with columns in PatternFigures order"""
+    return np.column_stack(figures)
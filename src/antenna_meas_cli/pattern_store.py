@@ -0,0 +1,178 @@
+"""Single-file binary store of antenna pattern measurements.
+
+File starts with MAGIC, header length (uint32, little endian) and JSON header padded to HEADER_ALIGNMENT bytes.
+Header holds frequency points, record dtype and metadata. Header is followed by fixed-size records, one per
+measured angle, so the file may be appended incrementally and memory-mapped by readers as angle x frequency x 2 x 2 cube.
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+import json
+import os
+import time
+import numpy as np
+import skrf as rf
+
+MAGIC = b"RHPATT01"
+BASE_FIELDS = ("angle", "timestamp", "s")
+HEADER_ALIGNMENT = 64
+FORMAT_VERSION = 1
+
+def make_record_dtype(points_num: int, extra_fields: List[Tuple[str, str]] = ()) -> np.dtype:
+    fields = [("angle", "<f8"), ("timestamp", "<f8"), ("s", "<c16", (points_num, 2, 2))]
+    return np.dtype(fields + [tuple(field) for field in extra_fields])
+
+def _dtype_to_json(dtype: np.dtype) -> list:
+    return [[name, dtype.fields[name][0].base.str, list(dtype.fields[name][0].shape)] for name in dtype.names]
+
+def _dtype_from_json(fields: list) -> np.dtype:
+    return np.dtype([(name, base, tuple(shape)) for name, base, shape in fields])
+
+def read_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """Return header of pattern store file and offset of its first record"""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} isn't a pattern store file.")
+        header_length = int.from_bytes(file.read(4), byteorder="little")
+        header = json.loads(file.read(header_length))
+    if header["version"] > FORMAT_VERSION:
+        raise ValueError(f"Pattern store version {header['version']:d} isn't supported.")
+    return header, len(MAGIC) + 4 + header_length
+
+class PatternStoreWriter:
+    """Appends measured angles to a pattern store file, each record is flushed to disk after append"""
+    def __init__(self, path: str, freq: np.ndarray, metadata: Dict[str, Any] = None,
+            extra_fields: List[Tuple[str, str]] = ()):
+        self.path = path
+        self.freq = np.asarray(freq, dtype=float)
+        self.dtype = make_record_dtype(len(self.freq), extra_fields)
+        self.metadata = metadata or {}
+        header = {
+            "version": FORMAT_VERSION,
+            "freq": self.freq.tolist(),
+            "dtype": _dtype_to_json(self.dtype),
+            "metadata": self.metadata,
+        }
+        header_data = json.dumps(header).encode()
+        prefix_length = len(MAGIC) + 4
+        padding = -(prefix_length + len(header_data)) % HEADER_ALIGNMENT
+        header_data += b" " * padding
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + len(header_data).to_bytes(4, byteorder="little") + header_data)
+        self.file.flush()
+        self.count = 0
+
+    @classmethod
+    def from_network(cls, path: str, network: rf.Network, metadata: Dict[str, Any] = None,
+            extra_fields: List[Tuple[str, str]] = ()) -> "PatternStoreWriter":
+        return cls(path, network.f, metadata, extra_fields)
+
+    @classmethod
+    def reopen(cls, path: str, count: int = None) -> "PatternStoreWriter":
+        """Open existing pattern store for appending, e.g. to resume interrupted scan.
+
+        Incomplete record left at the end of the file is dropped, when count is given records after the first
+        count records are dropped as well.
+        """
+        header, offset = read_header(path)
+        writer = cls.__new__(cls)
+        writer.path = path
+        writer.freq = np.asarray(header["freq"], dtype=float)
+        writer.dtype = _dtype_from_json(header["dtype"])
+        writer.metadata = header["metadata"]
+        writer.count = (os.path.getsize(path) - offset) // writer.dtype.itemsize
+        if count is not None:
+            writer.count = min(writer.count, count)
+        writer.file = open(path, "r+b")
+        writer.file.truncate(offset + writer.count*writer.dtype.itemsize)
+        writer.file.seek(0, os.SEEK_END)
+        return writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, angle: float, s: np.ndarray, timestamp: float = None, **extra) -> None:
+        record = np.zeros(1, dtype=self.dtype)
+        record["angle"] = angle
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["s"] = s
+        for name, value in extra.items():
+            record[name] = value
+        self.file.write(record.tobytes())
+        self.file.flush()
+        self.count += 1
+
+    def append_many(self, angles: np.ndarray, s: np.ndarray, timestamps: np.ndarray = None, **extra) -> None:
+        """Append many records at once, s is angle x frequency x 2 x 2 array"""
+        records = np.zeros(len(angles), dtype=self.dtype)
+        records["angle"] = angles
+        records["timestamp"] = time.time() if timestamps is None else timestamps
+        records["s"] = s
+        for name, value in extra.items():
+            records[name] = value
+        self.file.write(records.tobytes())
+        self.file.flush()
+        self.count += len(records)
+
+    def append_network(self, angle: float, network: rf.Network, timestamp: float = None, **extra) -> None:
+        if len(network.f) != len(self.freq):
+            raise ValueError("Network frequency points number differs from pattern store.")
+        self.append(angle, network.s, timestamp, **extra)
+
+    def close(self) -> None:
+        if not self.file.closed:
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+class PatternStore:
+    """Read-only memory-mapped view of a pattern store file"""
+    def __init__(self, path: str):
+        self.path = path
+        header, self.offset = read_header(path)
+        self.freq = np.asarray(header["freq"], dtype=float)
+        self.metadata: Dict[str, Any] = header["metadata"]
+        self.dtype = _dtype_from_json(header["dtype"])
+        # Incomplete record may be left at the end of the file after a crash, it's skipped
+        count = (os.path.getsize(path) - self.offset) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=self.offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def angles(self) -> np.ndarray:
+        return self.records["angle"]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.records["timestamp"]
+
+    @property
+    def s(self) -> np.ndarray:
+        """Angle x frequency x 2 x 2 S-parameters"""
+        return self.records["s"]
+
+    @property
+    def extra_fields(self) -> List[Tuple[str, str, Tuple[int, ...]]]:
+        """Fields stored next to angle, timestamp and S-parameters, in the form accepted by PatternStoreWriter"""
+        return [(name, base, tuple(shape)) for name, base, shape in _dtype_to_json(self.dtype) if name not in BASE_FIELDS]
+
+    def sparam(self, row: int, col: int) -> np.ndarray:
+        """Angle x frequency cube of a single S-parameter, e.g. sparam(1, 0) for S21"""
+        return self.records["s"][:, :, row, col]
+
+    def sorted_indices(self) -> np.ndarray:
+        return np.argsort(self.angles, kind="stable")
+
+    def network(self, index: int) -> rf.Network:
+        network = rf.Network(f=self.freq/1E9, s=np.array(self.s[index]), f_unit="GHz")
+        network.comments = f"angle={self.angles[index]:f}deg"
+        return network
+
+    def networks(self) -> Iterator[Tuple[float, rf.Network]]:
+        for index in range(len(self)):
+            yield float(self.angles[index]), self.network(index)
@@ -0,0 +1,196 @@
+from typing import Any, Callable, Dict, Iterable, List
+import queue
+import threading
+import time
+
+STAGE_MOTION = "motion"
+STAGE_SWEEP = "sweep"
+STAGE_TRANSFER = "transfer"
+STAGE_PERSIST = "persist"
+STAGES = (STAGE_MOTION, STAGE_SWEEP, STAGE_TRANSFER, STAGE_PERSIST)
+
+_END = object()
+_WAIT_INTERVAL = 0.1
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.busy_time = 0.0
+        self.items = 0
+
+    def utilization(self, wall_time: float) -> float:
+        if wall_time <= 0:
+            return 0.0
+        return self.busy_time / wall_time
+
+class PipelineStopped(Exception):
+    pass
+
+class MeasurementPipeline:
+    """Acquisition engine with separate motion, sweep, transfer and persist stages connected by bounded queues.
+
+    Table starts moving to the next angle as soon as the sweep is completed, while trace data is still being
+    transferred and persisted. Next sweep waits until previous trace data has been read out from VNA.
+    Persist stage runs in the caller thread, so it may safely use GUI. When tracer is given, every stage
+    of every angle is recorded as a span, see antenna_meas_cli.profiling.Tracer.
+    Stage functions should pass stop event to their blocking waits, so they return early when the run is
+    interrupted or a stage fails. Then halt is called before and after workers are joined, e.g. to halt the table.
+    """
+    def __init__(self, move: Callable[[float], None], sweep: Callable[[], None], transfer: Callable[[], Any],
+            persist_queue_size: int = 16, tracer = None, halt: Callable[[], None] = None):
+        self.move = move
+        self.sweep = sweep
+        self.transfer = transfer
+        self.persist_queue_size = persist_queue_size
+        self.tracer = tracer
+        self.halt = halt
+        self.stop = threading.Event()
+        self.stats = {name: StageStats(name) for name in STAGES}
+        self.wall_time = 0.0
+
+    def run(self, angles: Iterable[float], persist: Callable[[float, Any], None]) -> None:
+        self.stats = {name: StageStats(name) for name in STAGES}
+        self.stop.clear()
+        self._errors: List[BaseException] = []
+        self._move_permit = threading.Semaphore(1)
+        self._vna_free = threading.Semaphore(1)
+        positioned = queue.Queue(maxsize=1)
+        swept = queue.Queue(maxsize=1)
+        results = queue.Queue(maxsize=self.persist_queue_size)
+        workers = [
+            threading.Thread(target=self._run_worker, args=(self._motion_stage, list(angles), positioned), daemon=True),
+            threading.Thread(target=self._run_worker, args=(self._sweep_stage, positioned, swept), daemon=True),
+            threading.Thread(target=self._run_worker, args=(self._transfer_stage, swept, results), daemon=True),
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        is_finished = False
+        try:
+            while True:
+                item = self._get(results)
+                if item is _END:
+                    is_finished = True
+                    break
+                angle, data = item
+                with self._timed(STAGE_PERSIST, angle):
+                    persist(angle, data)
+        except PipelineStopped:
+            pass
+        finally:
+            self.stop.set()
+            if not is_finished:
+                self._halt()
+            for worker in workers:
+                worker.join()
+            if not is_finished:
+                # Motion stage may have sent a move after the first halt, before it noticed the stop
+                self._halt()
+            self.wall_time = time.perf_counter() - start
+        if len(self._errors) > 0:
+            raise self._errors[0]
+
+    def utilization(self) -> Dict[str, float]:
+        return {name: stats.utilization(self.wall_time) for name, stats in self.stats.items()}
+
+    def bottleneck(self) -> str:
+        utilization = self.utilization()
+        return max(utilization, key=utilization.get)
+
+    def format_stats(self) -> str:
+        lines = [f"{'stage':<10}{'items':>7}{'busy (s)':>10}{'util':>8}"]
+        for name, stats in self.stats.items():
+            lines.append(f"{name:<10}{stats.items:>7d}{stats.busy_time:>10.2f}{stats.utilization(self.wall_time):>8.1%}")
+        lines.append(f"wall time {self.wall_time:.2f} s, bottleneck: {self.bottleneck()}")
+        return "\n".join(lines)
+
+    def _halt(self) -> None:
+        if self.halt is None:
+            return
+        # Caller halts the table again after the run and reports when it fails
+        try:
+            self.halt()
+        except IOError:
+            pass
+
+    def _motion_stage(self, angles: List[float], output: queue.Queue) -> None:
+        for angle in angles:
+            self._acquire(self._move_permit)
+            with self._timed(STAGE_MOTION, angle):
+                self.move(angle)
+            self._put(output, angle)
+
+    def _sweep_stage(self, input: queue.Queue, output: queue.Queue) -> None:
+        while True:
+            angle = self._get(input)
+            if angle is _END:
+                return
+            self._acquire(self._vna_free)
+            with self._timed(STAGE_SWEEP, angle):
+                self.sweep()
+            self._move_permit.release()
+            self._put(output, angle)
+
+    def _transfer_stage(self, input: queue.Queue, output: queue.Queue) -> None:
+        while True:
+            angle = self._get(input)
+            if angle is _END:
+                return
+            with self._timed(STAGE_TRANSFER, angle):
+                data = self.transfer()
+            self._vna_free.release()
+            self._put(output, (angle, data))
+
+    def _run_worker(self, stage: Callable, input, output: queue.Queue) -> None:
+        try:
+            stage(input, output)
+            self._put(output, _END)
+        except PipelineStopped:
+            pass
+        except BaseException as err:
+            self._errors.append(err)
+            self.stop.set()
+
+    def _get(self, input: queue.Queue):
+        while not self.stop.is_set():
+            try:
+                return input.get(timeout=_WAIT_INTERVAL)
+            except queue.Empty:
+                pass
+        raise PipelineStopped()
+
+    def _put(self, output: queue.Queue, item) -> None:
+        while not self.stop.is_set():
+            try:
+                output.put(item, timeout=_WAIT_INTERVAL)
+                return
+            except queue.Full:
+                pass
+        raise PipelineStopped()
+
+    def _acquire(self, semaphore: threading.Semaphore) -> None:
+        while not self.stop.is_set():
+            if semaphore.acquire(timeout=_WAIT_INTERVAL):
+                return
+        raise PipelineStopped()
+
+    def _timed(self, stage_name: str, angle: float) -> "_StageTimer":
+        span = None
+        if self.tracer is not None:
+            span = self.tracer.span(stage_name, "pipeline", angle=float(angle))
+        return _StageTimer(self.stats[stage_name], span)
+
+class _StageTimer:
+    def __init__(self, stats: StageStats, span = None):
+        self.stats = stats
+        self.span = span
+    def __enter__(self):
+        if self.span is not None:
+            self.span.__enter__()
+        self.start = time.perf_counter()
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.busy_time += time.perf_counter() - self.start
+        if exc_type is None:
+            self.stats.items += 1
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc_value, traceback)
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import contextlib
+import json
+import os
+import threading
+import time
+
+class Span:
+    """Context manager recording a single timed span, arguments may be added while it's open, e.g. span["bytes"] = 10"""
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.args[key] = value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.category, self.start, end - self.start, self.args)
+
+class Tracer:
+    """Collector of timed spans from many threads, exported as Chrome trace (chrome://tracing, Perfetto) and summary table.
+
+    Drivers and measurement pipeline record spans only when their tracer attribute is set, so there is no overhead otherwise.
+    """
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self.lock = threading.Lock()
+
+    def span(self, name: str, category: str = "", **args) -> Span:
+        return Span(self, name, category, args)
+
+    def record(self, name: str, category: str, start: float, duration: float, args: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self.origin)*1E6,
+            "dur": duration*1E6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        with self.lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in self.thread_names.items()]
+            return {"traceEvents": metadata + list(self.events), "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_chrome_trace(), file, default=str)
+
+    def summary(self) -> "OrderedDict[str, Dict[str, float]]":
+        """Return count, total, mean and max duration in seconds and transferred bytes of spans grouped by name"""
+        summary = OrderedDict()
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            row = summary.setdefault(event["name"], {"count": 0, "total": 0.0, "max": 0.0, "bytes": 0})
+            duration = event["dur"]*1E-6
+            row["count"] += 1
+            row["total"] += duration
+            row["max"] = max(row["max"], duration)
+            row["bytes"] += event["args"].get("bytes_out", 0) + event["args"].get("bytes_in", 0)
+        for row in summary.values():
+            row["mean"] = row["total"] / row["count"]
+        return summary
+
+    def format_summary(self) -> str:
+        lines = [f"{'span':<28}{'count':>7}{'total (s)':>11}{'mean (ms)':>11}{'max (ms)':>10}{'bytes':>11}"]
+        for name, row in self.summary().items():
+            lines.append(f"{name:<28}{row['count']:>7d}{row['total']:>11.3f}{row['mean']*1E3:>11.2f}{row['max']*1E3:>10.2f}{row['bytes']:>11d}")
+        return "\n".join(lines)
+
+def optional_span(tracer: Optional[Tracer], name: str, category: str = "", **args):
+    """Span of tracer or no-op context manager when tracer is None"""
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, category, **args)
+
+class TracedResource:
+    """Proxy of pyvisa resource recording a span with transferred bytes for every I/O call"""
+    def __init__(self, resource, tracer: Tracer):
+        self._resource = resource
+        self._tracer = tracer
+
+    def __getattr__(self, name: str):
+        return getattr(self._resource, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._resource, name, value)
+
+    def write(self, message: str, *args, **kwargs):
+        with self._tracer.span("visa.write", "io", bytes_out=len(message)):
+            return self._resource.write(message, *args, **kwargs)
+
+    def read_raw(self, *args, **kwargs) -> bytes:
+        with self._tracer.span("visa.read_raw", "io") as span:
+            data = self._resource.read_raw(*args, **kwargs)
+            span["bytes_in"] = len(data)
+            return data
+
+    def read_bytes(self, count: int, *args, **kwargs) -> bytes:
+        with self._tracer.span("visa.read_bytes", "io") as span:
+            data = self._resource.read_bytes(count, *args, **kwargs)
+            span["bytes_in"] = len(data)
+            return data
+
+    def query(self, message: str, *args, **kwargs) -> str:
+        with self._tracer.span("visa.query", "io", command=message, bytes_out=len(message)) as span:
+            response = self._resource.query(message, *args, **kwargs)
+            span["bytes_in"] = len(response)
+            return response
+
+def trace_vna(vna, tracer: Tracer) -> None:
+    """Record spans of VNA operations and of every I/O call of its resource"""
+    vna.tracer = tracer
+    if not isinstance(vna.inst, TracedResource):
+        vna.inst = TracedResource(vna.inst, tracer)
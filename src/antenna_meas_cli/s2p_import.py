@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import os
+import re
+import numpy as np
+import skrf as rf
+from antenna_meas_cli.pattern_store import PatternStoreWriter
+
+FILENAME_ANGLE_PATTERN = re.compile(r"^(?P<name>.*)_(?P<angle>-?\d+(?:#\d+)?)deg\.s2p$", re.IGNORECASE)
+COMMENT_ANGLE_PATTERN = re.compile(r"angle=(?P<angle>-?\d+(?:\.\d*)?)deg")
+
+def angle_from_s2p_filename(filename: str) -> Optional[float]:
+    """Recover angle from filename created by filename_from_angle_n_s2pname(), None if it doesn't match the scheme"""
+    match = FILENAME_ANGLE_PATTERN.match(os.path.basename(filename))
+    if match is None:
+        return None
+    return float(match.group("angle").replace("#", "."))
+
+def name_from_s2p_filename(filename: str) -> Optional[str]:
+    match = FILENAME_ANGLE_PATTERN.match(os.path.basename(filename))
+    if match is None:
+        return None
+    return match.group("name")
+
+def angle_from_s2p_comment(comments: str) -> Optional[float]:
+    match = COMMENT_ANGLE_PATTERN.search(comments or "")
+    if match is None:
+        return None
+    return float(match.group("angle"))
+
+def list_s2p_files(directory: str, name: str = None) -> List[str]:
+    paths = []
+    for filename in sorted(os.listdir(directory)):
+        file_name = name_from_s2p_filename(filename)
+        if file_name is None or (name is not None and file_name != name):
+            continue
+        paths.append(os.path.join(directory, filename))
+    return paths
+
+def read_s2p_file(path: str) -> Tuple[float, float, np.ndarray, np.ndarray]:
+    """Return angle, modification time, frequencies and S-parameters of a single S2P file"""
+    network = rf.Network(path)
+    angle = angle_from_s2p_comment(network.comments)
+    if angle is None:
+        angle = angle_from_s2p_filename(path)
+    return angle, os.path.getmtime(path), network.f, network.s
+
+def import_s2p_directory(directory: str, store_path: str, name: str = None, workers: int = None) -> int:
+    """Convert per-angle S2P files created by meas command into a single pattern store, return number of imported angles.
+
+    Files are parsed in a process pool. All files must share the same frequency points. Records are written sorted by angle.
+    """
+    paths = list_s2p_files(directory, name)
+    if len(paths) == 0:
+        raise ValueError(f"There are no S2P files with angle suffix in {directory}.")
+    if name is None and len(set(name_from_s2p_filename(path) for path in paths)) > 1:
+        raise ValueError(f"There are many measurements in {directory}, choose one of them by name.")
+    if workers == 1:
+        results = list(map(read_s2p_file, paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(read_s2p_file, paths, chunksize=max(1, len(paths) // (4*(workers or os.cpu_count() or 1)))))
+    results.sort(key=lambda result: result[0])
+    freq = results[0][2]
+    metadata = {
+        "imported_from": os.path.abspath(directory),
+        "name": name_from_s2p_filename(paths[0]),
+    }
+    with PatternStoreWriter(store_path, freq, metadata) as writer:
+        for angle, timestamp, file_freq, s in results:
+            if len(file_freq) != len(freq) or not np.allclose(file_freq, freq):
+                raise ValueError(f"Frequency points of file with angle {angle:f}deg differ from other files.")
+            writer.append(angle, s, timestamp)
+    return len(results)
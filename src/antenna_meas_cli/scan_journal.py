@@ -0,0 +1,137 @@
+"""Write-ahead journal of an angular scan in JSON lines.
+
+The first line holds scan settings, home reference and instrument settings, then a line is appended and
+synced to disk after every angle is persisted and the last line marks completed scan. Interrupted scan is
+resumed from the journal, only angles missing in it are measured again.
+"""
+from typing import Any, Dict, List
+import json
+import os
+import time
+
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".journal"
+RECORD_START = "start"
+RECORD_ANGLE = "angle"
+RECORD_POSITION = "position"
+RECORD_COMPLETE = "complete"
+
+def journal_path_for(store: str = None, s2p_name: str = None, s2p_dir: str = None) -> str:
+    """Default journal path next to the pattern store or S2P files of the scan"""
+    if store is not None:
+        return store + JOURNAL_SUFFIX
+    return os.path.join(s2p_dir or ".", s2p_name + JOURNAL_SUFFIX)
+
+def _replace_file(path: str, data: str) -> None:
+    """Replace file content at once, a crash leaves either the old or the new content"""
+    temp_path = f"{path}.{os.getpid():d}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+class ScanJournal:
+    def __init__(self, path: str, start: Dict[str, Any], angles: List[Dict[str, Any]] = None, is_complete: bool = False,
+            writable: bool = True):
+        self.path = path
+        self.start = start
+        self.angles = list(angles or [])
+        self.is_complete = is_complete
+        # Table angle readback of the last completed angle or of the position after interruption
+        self.last_table_angle: float = None
+        self.file = open(path, "a") if writable else None
+
+    @classmethod
+    def create(cls, path: str, settings: Dict[str, Any], home: Dict[str, Any], instrument: Dict[str, Any]) -> "ScanJournal":
+        start = {
+            "type": RECORD_START,
+            "version": JOURNAL_VERSION,
+            "time": time.time(),
+            "settings": settings,
+            "home": home,
+            "instrument": instrument,
+        }
+        with open(path, "w") as file:
+            file.write(json.dumps(start) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        return cls(path, start)
+
+    @classmethod
+    def load(cls, path: str, writable: bool = True) -> "ScanJournal":
+        """Read journal of a previous scan, a line truncated by a crash at the end of the file is ignored.
+
+        Writable journal is opened for appending and the truncated line is dropped from the file, read-only
+        journal leaves the file untouched, e.g. to check whether the scan was completed.
+        """
+        with open(path) as file:
+            lines = file.read().split("\n")
+        records = []
+        is_truncated = False
+        for i, line in enumerate(lines):
+            if len(line.strip()) == 0:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                if i < len(lines) - 1 and any(len(rest.strip()) > 0 for rest in lines[i+1:]):
+                    raise ValueError(f"Scan journal {path} is corrupted at line {i+1:d}.")
+                is_truncated = True
+        if len(records) == 0 or records[0].get("type") != RECORD_START:
+            raise ValueError(f"{path} isn't a scan journal.")
+        if records[0]["version"] > JOURNAL_VERSION:
+            raise ValueError(f"Scan journal version {records[0]['version']:d} isn't supported.")
+        angles = [record for record in records[1:] if record["type"] == RECORD_ANGLE]
+        is_complete = any(record["type"] == RECORD_COMPLETE for record in records[1:])
+        if writable and is_truncated:
+            # Rewriting drops a truncated line, so new records start on a new line
+            _replace_file(path, "".join(json.dumps(record) + "\n" for record in records))
+        journal = cls(path, records[0], angles, is_complete, writable)
+        for record in records[1:]:
+            if record.get("table_angle") is not None:
+                journal.last_table_angle = record["table_angle"]
+        return journal
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.start["settings"]
+
+    @property
+    def home(self) -> Dict[str, Any]:
+        return self.start["home"]
+
+    @property
+    def instrument(self) -> Dict[str, Any]:
+        return self.start["instrument"]
+
+    @property
+    def completed_angles(self) -> List[float]:
+        return [record["angle"] for record in self.angles]
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self.file is None:
+            raise IOError(f"Scan journal {self.path} is opened read-only.")
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record_angle(self, angle: float, table_angle: float = None) -> None:
+        record = {"type": RECORD_ANGLE, "angle": float(angle), "table_angle": table_angle, "time": time.time()}
+        self._write(record)
+        self.angles.append(record)
+        if table_angle is not None:
+            self.last_table_angle = table_angle
+
+    def record_position(self, table_angle: float) -> None:
+        """Record table angle readback, e.g. after the table was halted on interruption"""
+        self._write({"type": RECORD_POSITION, "table_angle": table_angle, "time": time.time()})
+        self.last_table_angle = table_angle
+
+    def complete(self) -> None:
+        self._write({"type": RECORD_COMPLETE, "time": time.time()})
+        self.is_complete = True
+
+    def close(self) -> None:
+        if self.file is not None and not self.file.closed:
+            self.file.close()
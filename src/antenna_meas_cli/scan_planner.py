@@ -0,0 +1,128 @@
+"""Ordering of scan angles with explicit direction of every move and estimation of motion time.
+
+Rotate requests carry angle modulo 360 and the table takes the shorter path to it, so moves longer than
+half a turn go through waypoints like in continuous_meas. Unless wrapping is allowed, the table never
+crosses 0/360deg, so a cable to the antenna is unwound when the scan returns home.
+"""
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List
+import threading
+import time
+import numpy as np
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from antenna_meas_cli.continuous_meas import WAYPOINT_STEP, wrap_angle_delta
+
+ScanPlan = namedtuple("ScanPlan", ("order", "angles", "motion_time"))
+
+ORDER_AUTO = "auto"
+# Acceleration in rpm per second, same as of simulated head
+DEFAULT_ACCELERATION = 60
+DEGREES_PER_SECOND_PER_RPM = 6
+# Readbacks this close below 360deg are taken as slightly before home, not as almost a full turn
+HOME_TOLERANCE = 1.0
+
+def start_position(table_angle: float) -> float:
+    """Position of the table from its angle readback, slightly negative when it's just before home"""
+    angle = table_angle % 360
+    if angle > 360 - HOME_TOLERANCE:
+        angle -= 360
+    return angle
+
+def unwrapped_position(angle: float) -> float:
+    """Position of the table inside the range it moves in when wrapping isn't allowed.
+
+    Planned angles are taken modulo 360, negative angles from start_position are kept as they are.
+    """
+    if -HOME_TOLERANCE < angle < 0:
+        return angle
+    return angle % 360
+
+def leg_delta(angle_from: float, angle_to: float, allow_wrap: bool = False) -> float:
+    """Signed travel between angles, along the shorter path when wrapping is allowed, inside 0-360deg otherwise"""
+    if allow_wrap:
+        return wrap_angle_delta(angle_from, angle_to)
+    return unwrapped_position(angle_to) - unwrapped_position(angle_from)
+
+def path_waypoints(angle_from: float, angle_to: float, allow_wrap: bool = False, step: float = WAYPOINT_STEP) -> List[float]:
+    """Targets of rotate requests moving the table in the intended direction, the last one is angle_to"""
+    delta = leg_delta(angle_from, angle_to, allow_wrap)
+    count = max(1, int(np.ceil(abs(delta) / step - 1E-9)))
+    return [(angle_from + delta*(i + 1)/count) % 360 for i in range(count)]
+
+def move_time(distance: float, rpm: float, acceleration: float = DEFAULT_ACCELERATION) -> float:
+    """Time of a move with trapezoidal speed profile, triangular when the distance is too short to reach rpm"""
+    distance = abs(distance)
+    speed = abs(rpm) * DEGREES_PER_SECOND_PER_RPM
+    acceleration = acceleration * DEGREES_PER_SECOND_PER_RPM
+    if distance >= speed**2 / acceleration:
+        return distance/speed + speed/acceleration
+    return 2*np.sqrt(distance / acceleration)
+
+def estimate_motion_time(angles: Iterable[float], rpm: float, start: float = 0, home: float = 0, allow_wrap: bool = False,
+        acceleration: float = DEFAULT_ACCELERATION, move_overhead: float = 0) -> float:
+    """Estimate time of moves from start through all angles in order and back home, move_overhead is added per angle"""
+    positions = [start] + list(angles) + [home]
+    total = 0.0
+    for angle_from, angle_to in zip(positions[:-1], positions[1:]):
+        delta = leg_delta(angle_from, angle_to, allow_wrap)
+        if abs(delta) > 1E-9:
+            total += move_time(delta, rpm, acceleration)
+    return total + move_overhead*(len(positions) - 2)
+
+def order_sequential(angles: np.ndarray) -> np.ndarray:
+    return np.sort(angles)
+
+def order_reversed(angles: np.ndarray) -> np.ndarray:
+    return np.sort(angles)[::-1]
+
+def order_interleaved(angles: np.ndarray) -> np.ndarray:
+    """Every second angle on the way out and the rest on the way back, so the scan ends near where it started"""
+    angles = np.sort(angles)
+    return np.concatenate((angles[0::2], angles[1::2][::-1]))
+
+SCAN_ORDERS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "sequential": order_sequential,
+    "reversed": order_reversed,
+    "interleaved": order_interleaved,
+}
+
+def plan_scan(angles: Iterable[float], rpm: float, order: str = ORDER_AUTO, start: float = 0, allow_wrap: bool = False,
+        acceleration: float = DEFAULT_ACCELERATION, move_overhead: float = 0) -> ScanPlan:
+    """Order angles of a scan starting at start and ending at home, auto order picks the one with the shortest motion time"""
+    angles = np.asarray(angles, dtype=float) % 360
+    if order == ORDER_AUTO:
+        orders = list(SCAN_ORDERS)
+    elif order in SCAN_ORDERS:
+        orders = [order]
+    else:
+        raise ValueError(f"Unknown scan order {order}.")
+    plans = []
+    for name in orders:
+        ordered = SCAN_ORDERS[name](angles)
+        plans.append(ScanPlan(name, ordered, estimate_motion_time(ordered, rpm, start, 0, allow_wrap, acceleration, move_overhead)))
+    # Stable minimum keeps the order of SCAN_ORDERS when estimates are equal
+    return min(plans, key=lambda plan: plan.motion_time)
+
+def move_along(rt: rt_api.RotaryTable, address: int, angle_from: float, angle_to: float, rpm: float,
+        allow_wrap: bool = False, timeout: float = 120, poll_interval: float = 0.05,
+        stop: threading.Event = None) -> rt_msg.ResponseMotorStatus:
+    """Move table through waypoints without stopping on them and wait until it stops at angle_to.
+
+    When stop is set, returns the last status at once and the table is left moving, so the caller should halt it.
+    """
+    waypoints = path_waypoints(angle_from, angle_to, allow_wrap)
+    deadline = time.monotonic() + timeout
+    for waypoint in waypoints[:-1]:
+        rt.send_request(rt_msg.RequestRotate(address, waypoint, rpm))
+        # Next waypoint is sent when it's closer than half a turn ahead, so the table keeps direction
+        while True:
+            status = rt.send_request(rt_msg.RequestGetStatus(address))
+            if abs(wrap_angle_delta(status.current_angle, waypoint)) < WAYPOINT_STEP/2:
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Rotary table with address {address:d} didn't reach waypoint {waypoint:.2f}deg!")
+            if rt_api.sleep_unless_stopped(poll_interval, stop):
+                return status
+    rt.send_request(rt_msg.RequestRotate(address, waypoints[-1], rpm))
+    return rt.wait_until_stopped(address, rpm, max(deadline - time.monotonic(), 0), stop=stop)
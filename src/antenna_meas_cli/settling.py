@@ -0,0 +1,149 @@
+from typing import Callable, Dict, Hashable, List
+import threading
+import time
+import numpy as np
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.vna_types import SParam
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from antenna_meas_cli.continuous_meas import wrap_angle_delta
+
+DEFAULT_MAX_SETTLE_TIME = 0.5
+STEP_RESOLUTION = 5
+
+class SettleTimeEstimator:
+    """Settle times learned per setup key with exponential moving average, same scheme as SweepTimeEstimator"""
+    def __init__(self, history_weight: float = 0.3):
+        self.history_weight = history_weight
+        self.history: Dict[Hashable, float] = {}
+
+    def has_history(self, key: Hashable) -> bool:
+        return key in self.history
+
+    def estimate(self, key: Hashable) -> float:
+        return self.history.get(key, 0.0)
+
+    def record(self, key: Hashable, duration: float) -> None:
+        if key in self.history:
+            self.history[key] += self.history_weight * (duration - self.history[key])
+        else:
+            self.history[key] = duration
+
+def relative_variance(probes: List[np.ndarray]) -> float:
+    """Variance of complex probes over time relative to their mean power, maximum over frequency points"""
+    probes = np.stack(probes)
+    power = np.mean(np.abs(probes)**2, axis=0)
+    return float(np.max(np.var(probes, axis=0) / np.maximum(power, np.finfo(float).tiny)))
+
+class SettleDetector:
+    """Wait until table and antenna stop ringing after a move instead of sleeping for a fixed time.
+
+    Table is settled when current angle readbacks stay within angle_tolerance for stable_time, which should cover
+    a good part of the ringing period, otherwise readbacks around an extreme of the oscillation look stable.
+    When vna_probe is given, wait_signal() repeats it until relative variance of the last probe_window S21
+    probes drops below variance_threshold. Times until the readbacks or probes became stable are learned per
+    step size and speed and most of the learned time is slept before polling starts, so only confirming reads
+    are added to it. Learned time is updated only when motion is seen after that sleep, otherwise the table
+    settled during the sleep and the real settle time isn't known. Waiting never takes longer than max_settle_time.
+    """
+    # Fraction of learned settle time slept before polling
+    trusted_fraction = 0.8
+
+    def __init__(self, rt: rt_api.RotaryTable, address: int, max_settle_time: float = DEFAULT_MAX_SETTLE_TIME,
+            stable_time: float = 0.1, angle_tolerance: float = rt_msg.ANGLE_PRECISION, poll_interval: float = 0.02,
+            vna_probe: Callable[[], np.ndarray] = None, variance_threshold: float = 1E-4, probe_window: int = 3):
+        self.rt = rt
+        self.address = address
+        self.max_settle_time = max_settle_time
+        self.stable_time = stable_time
+        self.angle_tolerance = angle_tolerance
+        self.poll_interval = poll_interval
+        self.vna_probe = vna_probe
+        self.variance_threshold = variance_threshold
+        self.probe_window = probe_window
+        self.estimator = SettleTimeEstimator()
+        self.signal_estimator = SettleTimeEstimator()
+        self.settle_times: List[float] = []
+        self.timeouts = 0
+        self.last_key = None
+
+    def setup_key(self, step: float, rpm: float) -> Hashable:
+        return (int(np.ceil(abs(step) / STEP_RESOLUTION)), abs(rpm))
+
+    def _sleep_learned(self, estimator: SettleTimeEstimator, key: Hashable, stop: threading.Event = None) -> bool:
+        if estimator.has_history(key):
+            return rt_api.sleep_unless_stopped(min(estimator.estimate(key) * self.trusted_fraction, self.max_settle_time), stop)
+        return False
+
+    def wait(self, step: float, rpm: float, stop: threading.Event = None) -> float:
+        """Wait until readbacks of current angle are stable after a move by step at rpm, return settle time.
+
+        When stop is set, returns at once without learning the settle time.
+        """
+        key = self.setup_key(step, rpm)
+        self.last_key = key
+        start = time.monotonic()
+        if self._sleep_learned(self.estimator, key, stop):
+            return time.monotonic() - start
+        reference_angle = None
+        is_motion_seen = False
+        while True:
+            read_time = time.monotonic() - start
+            status = self.rt.send_request(rt_msg.RequestGetStatus(self.address))
+            angle = status.current_angle
+            if status.is_rotating or reference_angle is None or abs(wrap_angle_delta(reference_angle, angle)) >= self.angle_tolerance:
+                is_motion_seen = reference_angle is not None or status.is_rotating
+                reference_angle = angle
+                settled_time = read_time
+            elapsed = time.monotonic() - start
+            if read_time - settled_time >= self.stable_time:
+                break
+            if elapsed >= self.max_settle_time:
+                self.timeouts += 1
+                break
+            if rt_api.sleep_unless_stopped(self.poll_interval, stop):
+                return time.monotonic() - start
+        if is_motion_seen or not self.estimator.has_history(key):
+            self.estimator.record(key, settled_time)
+        self.settle_times.append(elapsed)
+        return elapsed
+
+    def wait_signal(self) -> float:
+        """Repeat VNA probe until S21 is stable, return waiting time, no-op without vna_probe.
+
+        It must not overlap with other VNA operations, so in the measurement pipeline it runs in the sweep stage.
+        """
+        if self.vna_probe is None:
+            return 0.0
+        start = time.monotonic()
+        self._sleep_learned(self.signal_estimator, self.last_key)
+        probes = []
+        probe_times = []
+        while True:
+            probe_times.append(time.monotonic() - start)
+            probes.append(np.asarray(self.vna_probe()))
+            probes = probes[-self.probe_window:]
+            probe_times = probe_times[-self.probe_window:]
+            elapsed = time.monotonic() - start
+            if len(probes) >= self.probe_window and relative_variance(probes) < self.variance_threshold:
+                break
+            if elapsed >= self.max_settle_time:
+                self.timeouts += 1
+                break
+        self.signal_estimator.record(self.last_key, probe_times[0])
+        return elapsed
+
+    def format_stats(self) -> str:
+        if len(self.settle_times) == 0:
+            return "No settle times recorded"
+        times = np.asarray(self.settle_times)
+        return (f"settle time mean {times.mean()*1E3:.0f} ms, max {times.max()*1E3:.0f} ms, "
+            f"{self.timeouts:d} times limited to {self.max_settle_time*1E3:.0f} ms")
+
+def make_vna_s21_probe(vna: vna_api.VNA) -> Callable[[], np.ndarray]:
+    """Probe sweeping VNA with current settings and reading only S21 trace"""
+    trace = next(trace for trace, sparam in vna_api.TRACES_MAPPING.items() if sparam == SParam.S21)
+    def probe() -> np.ndarray:
+        vna.start_single_sweep_await()
+        return vna.get_trace_data(trace)
+    return probe
@@ -0,0 +1,119 @@
+"""Two-axis scans with one head as azimuth (phi) and another as elevation (theta) over the sphere.
+
+Both heads share the bus and move in parallel, time of a move is the time of the slower axis. Grid scans
+step the slow axis once per row and sweep the fast one back and forth, so neither head returns over
+a measured row. Results are stored in a pattern store with theta and phi fields in every record.
+"""
+from collections import namedtuple
+from typing import Dict, List, Tuple
+import threading
+import numpy as np
+from rotary_table_api.bus_scheduler import BusScheduler
+from rotary_table_api import rotary_table_messages as rt_msg
+from antenna_meas_cli.pattern_store import PatternStore
+from antenna_meas_cli.scan_planner import DEFAULT_ACCELERATION, leg_delta, path_waypoints, move_time
+
+SpherePoint = namedtuple("SpherePoint", ("theta", "phi"))
+SpherePlan = namedtuple("SpherePlan", ("trajectory", "slow_axis", "points", "motion_time"))
+
+SPHERE_FIELDS = [("theta", "<f8"), ("phi", "<f8")]
+TRAJECTORY_GRID = "grid"
+TRAJECTORY_SPIRAL = "spiral"
+AXIS_THETA = "theta"
+AXIS_PHI = "phi"
+
+def theta_values(theta_step: float, theta_max: float = 180) -> np.ndarray:
+    """Elevation angles from the pole to theta_max inclusive"""
+    return np.arange(0, theta_max + theta_step/2, theta_step).clip(max=theta_max)
+
+def grid_trajectory(theta_step: float, phi_step: float, theta_max: float = 180, slow_axis: str = AXIS_THETA) -> List[SpherePoint]:
+    """Serpentine theta x phi grid, every row of the slow axis is swept in the opposite direction than previous one"""
+    thetas = theta_values(theta_step, theta_max)
+    phis = np.arange(0, 360, phi_step)
+    slow, fast = (thetas, phis) if slow_axis == AXIS_THETA else (phis, thetas)
+    points = []
+    for i, slow_value in enumerate(slow):
+        for fast_value in (fast if i % 2 == 0 else fast[::-1]):
+            theta, phi = (slow_value, fast_value) if slow_axis == AXIS_THETA else (fast_value, slow_value)
+            points.append(SpherePoint(float(theta), float(phi)))
+    return points
+
+def spiral_trajectory(theta_step: float, phi_step: float, theta_max: float = 180) -> List[SpherePoint]:
+    """Spiral with theta rising by theta_step per turn of phi, turns alternate direction to keep the cable unwound.
+
+    Number of points per turn follows sin(theta), so spacing on the sphere stays about phi_step at the equator
+    and the poles aren't oversampled like with a grid. Every move drives both heads.
+    """
+    points = []
+    turns = int(np.ceil(theta_max / theta_step - 1E-9))
+    for turn in range(turns):
+        theta_start = turn * theta_step
+        theta_center = min(theta_start + theta_step/2, theta_max)
+        count = max(1, int(np.ceil(360 * np.sin(np.deg2rad(theta_center)) / phi_step - 1E-9)))
+        for k in range(count):
+            phi = k * 360 / count if turn % 2 == 0 else (count - 1 - k) * 360 / count
+            points.append(SpherePoint(float(min(theta_start + theta_step*k/count, theta_max)), float(phi)))
+    points.append(SpherePoint(float(theta_max), points[-1].phi if len(points) > 0 else 0.0))
+    return points
+
+def estimate_trajectory_time(points: List[SpherePoint], phi_rpm: float, theta_rpm: float, start: SpherePoint = SpherePoint(0, 0),
+        acceleration: float = DEFAULT_ACCELERATION) -> float:
+    """Estimate time of parallel moves through all points and back to start, each move takes as long as its slower axis"""
+    positions = [start] + list(points) + [start]
+    total = 0.0
+    for point_from, point_to in zip(positions[:-1], positions[1:]):
+        total += max(move_time(leg_delta(point_from.phi, point_to.phi), phi_rpm, acceleration),
+            move_time(leg_delta(point_from.theta, point_to.theta), theta_rpm, acceleration))
+    return total
+
+def plan_sphere_scan(theta_step: float, phi_step: float, phi_rpm: float, theta_rpm: float, theta_max: float = 180,
+        trajectory: str = TRAJECTORY_GRID, acceleration: float = DEFAULT_ACCELERATION) -> SpherePlan:
+    """Plan trajectory of a sphere scan, grid is stepped along the axis which gives shorter estimated motion time"""
+    if trajectory == TRAJECTORY_SPIRAL:
+        points = spiral_trajectory(theta_step, phi_step, theta_max)
+        return SpherePlan(trajectory, None, points, estimate_trajectory_time(points, phi_rpm, theta_rpm, acceleration=acceleration))
+    if trajectory != TRAJECTORY_GRID:
+        raise ValueError(f"Unknown sphere scan trajectory {trajectory}.")
+    plans = []
+    for slow_axis in (AXIS_THETA, AXIS_PHI):
+        points = grid_trajectory(theta_step, phi_step, theta_max, slow_axis)
+        plans.append(SpherePlan(trajectory, slow_axis, points, estimate_trajectory_time(points, phi_rpm, theta_rpm, acceleration=acceleration)))
+    return min(plans, key=lambda plan: plan.motion_time)
+
+def move_heads(scheduler: BusScheduler, moves: Dict[int, Tuple[float, float]], rpms: Dict[int, float],
+        stop: threading.Event = None) -> Dict[int, rt_msg.ResponseMotorStatus]:
+    """Move heads in parallel from first to second angle of their moves, long moves go through waypoints in lockstep.
+
+    When stop is set, returns at once and heads are left moving, so the caller should halt them.
+    """
+    paths = {address: path_waypoints(angle_from, angle_to) for address, (angle_from, angle_to) in moves.items()
+        if abs(leg_delta(angle_from, angle_to)) > 0}
+    for i in range(max((len(waypoints) for waypoints in paths.values()), default=0)):
+        for address, waypoints in paths.items():
+            if i < len(waypoints):
+                scheduler.rotate({address: waypoints[i]}, rpms[address])
+        # Reported rpm is low while accelerating, the highest requested one keeps arrival predictions early enough
+        scheduler.wait_until_all_stopped(max(rpms[address] for address in paths), stop=stop)
+        if stop is not None and stop.is_set():
+            break
+    if len(paths) == 0:
+        scheduler.refresh()
+    return scheduler.status_table
+
+def is_sphere_store(store: PatternStore) -> bool:
+    return all(name in store.dtype.names for name, _ in SPHERE_FIELDS)
+
+def sphere_coordinates(store: PatternStore) -> Tuple[np.ndarray, np.ndarray]:
+    """Theta and phi of every record of a sphere scan store"""
+    if not is_sphere_store(store):
+        raise ValueError(f"{store.path} doesn't hold a sphere scan.")
+    return store.records["theta"], store.records["phi"]
+
+def sphere_grid(store: PatternStore, row: int = 1, col: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return sorted theta and phi values and theta x phi x frequency cube of a single S-parameter, NaN where not measured"""
+    theta, phi = sphere_coordinates(store)
+    thetas, theta_indices = np.unique(np.round(theta, 6), return_inverse=True)
+    phis, phi_indices = np.unique(np.round(phi, 6), return_inverse=True)
+    cube = np.full((len(thetas), len(phis), len(store.freq)), np.nan, dtype=np.complex128)
+    cube[theta_indices, phi_indices] = store.sparam(row, col)
+    return thetas, phis, cube
@@ -0,0 +1,78 @@
+import re
+import numpy as np
+
+class GateMode:
+    BANDPASS = "bandpass" # Keep response inside the gate
+    BANDSTOP = "bandstop" # Remove response inside the gate
+
+def make_window(name: str, length: int) -> np.ndarray:
+    """Return window by name: rect, hann, hamming, blackman or kaiser<beta>, e.g. kaiser6"""
+    name = name.lower()
+    if name in ("rect", "boxcar"):
+        return np.ones(length)
+    if name in ("hann", "hanning"):
+        return np.hanning(length)
+    if name == "hamming":
+        return np.hamming(length)
+    if name == "blackman":
+        return np.blackman(length)
+    match = re.fullmatch(r"kaiser(\d+(?:\.\d*)?)?", name)
+    if match is not None:
+        beta = float(match.group(1)) if match.group(1) else 6
+        return np.kaiser(length, beta)
+    raise ValueError(f"Unknown window {name}.")
+
+def time_axis(freq: np.ndarray) -> np.ndarray:
+    """Time points in seconds of time-domain response computed by time_domain()"""
+    freq = np.asarray(freq, dtype=float)
+    return np.fft.fftshift(np.fft.fftfreq(len(freq), freq[1] - freq[0]))
+
+def check_freq_spacing(freq: np.ndarray) -> None:
+    steps = np.diff(np.asarray(freq, dtype=float))
+    if len(steps) < 1 or not np.allclose(steps, steps[0], rtol=1E-6):
+        raise ValueError("Time-domain transform requires at least two uniformly spaced frequency points.")
+
+def _expand(vector: np.ndarray, ndim: int, axis: int) -> np.ndarray:
+    shape = [1]*ndim
+    shape[axis] = len(vector)
+    return vector.reshape(shape)
+
+def time_domain(s: np.ndarray, freq: np.ndarray, window: str = "kaiser6", axis: int = 1) -> np.ndarray:
+    """Windowed time-domain response of frequency data along axis, for all other dimensions at once"""
+    check_freq_spacing(freq)
+    s = np.asarray(s)
+    window_values = _expand(make_window(window, s.shape[axis]), s.ndim, axis)
+    return np.fft.fftshift(np.fft.ifft(s*window_values, axis=axis), axes=axis)
+
+def make_gate(freq: np.ndarray, center: float, span: float, gate_window: str = "kaiser6") -> np.ndarray:
+    """Time-domain gate sampled at time_axis(freq), center and span are in seconds"""
+    t = time_axis(freq)
+    inside = np.flatnonzero(np.abs(t - center) <= span/2)
+    gate = np.zeros(len(t))
+    if len(inside) > 0:
+        gate[inside] = make_window(gate_window, len(inside))
+    return gate
+
+def time_gate(s: np.ndarray, freq: np.ndarray, center: float, span: float, window: str = "kaiser6",
+        gate_window: str = "kaiser6", mode: str = GateMode.BANDPASS, axis: int = 1) -> np.ndarray:
+    """Apply time-domain gate to frequency data along axis, batched over all other dimensions, e.g. angles.
+
+    Data is windowed, transformed to time domain, gated and transformed back. Result is divided by the window
+    response gated with the same gate centered at 0 s, which compensates window attenuation at band edges.
+    In bandstop mode the gated response is subtracted from the original data.
+    """
+    if mode not in (GateMode.BANDPASS, GateMode.BANDSTOP):
+        raise ValueError(f"Unknown gate mode {mode}.")
+    check_freq_spacing(freq)
+    s = np.asarray(s)
+    window_values = make_window(window, s.shape[axis])
+    window_td = np.fft.fftshift(np.fft.ifft(window_values))
+    window_response = np.fft.fft(np.fft.ifftshift(window_td*make_gate(freq, 0, span, gate_window)))
+    gate = _expand(make_gate(freq, center, span, gate_window), s.ndim, axis)
+    td = time_domain(s, freq, window, axis)
+    gated = np.fft.fft(np.fft.ifftshift(td*gate, axes=axis), axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gated /= _expand(window_response, s.ndim, axis)
+    if mode == GateMode.BANDSTOP:
+        return s - gated
+    return gated
@@ -31,9 +31,16 @@ for angle in angle_points:
     print(f"angle={angle}deg")
     # Request rotate to position and wait until RT stopped
     rt.send_request(rt_msg.RequestRotate(rt_id, angle, speed))
-    while(rt.send_request(rt_msg.RequestGetStatus(rt_id)).is_rotating):
-        time.sleep(0.2)
-    time.sleep(0.5)
+    rt.wait_until_stopped(rt_id, speed)
+    # Wait at most 0.5 s until two angle readbacks 0.1 s apart are equal, so RT stopped ringing
+    settle_start = time.monotonic()
+    last_angle = None
+    while time.monotonic() - settle_start < 0.5:
+        current_angle = rt.send_request(rt_msg.RequestGetStatus(rt_id)).current_angle
+        if current_angle == last_angle:
+            break
+        last_angle = current_angle
+        time.sleep(0.1)
 
     # Make single measurement, read it out and save in file
     vna.start_single_sweep_await()
@@ -43,5 +50,4 @@ for angle in angle_points:
 
 # Return to home position after last measurement
 rt.send_request(rt_msg.RequestRotate(rt_id, 0, speed))
-while(rt.send_request(rt_msg.RequestGetStatus(rt_id)).is_rotating):
-    time.sleep(0.2)
+rt.wait_until_stopped(rt_id, speed)
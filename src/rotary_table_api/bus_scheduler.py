@@ -0,0 +1,133 @@
+from typing import Dict, Iterable, Optional
+import threading
+import time
+from rotary_table_api.rotary_table_api import RotaryTable, BROADCAST_ADDRESS, predict_rotation_time, sleep_unless_stopped
+from rotary_table_api.rotary_table_messages import *
+
+class BusScheduler:
+    """Drives many rotary tables sharing a single RS-485 bus.
+
+    Commands common for all heads are sent as a single broadcast request, so heads move together.
+    Status of every head is kept in status_table, which is refreshed by round-robin polling limited
+    to poll_rate requests per second. Broadcast affects every head on the bus, so use_broadcast should be
+    disabled when scheduler doesn't own all heads connected to the controller.
+    """
+    # Number of status requests in a row without response, after which waiting for a head fails
+    max_missed_polls = 5
+
+    def __init__(self, rt: RotaryTable, addresses: Iterable[int], poll_rate: float = 20, use_broadcast: bool = True):
+        self.rt = rt
+        self.addresses = tuple(addresses)
+        if len(self.addresses) == 0:
+            raise ValueError("Bus scheduler requires at least one rotary table address.")
+        if BROADCAST_ADDRESS in self.addresses:
+            raise ValueError("Broadcast address can't be used as rotary table address.")
+        self.poll_interval = 1 / poll_rate
+        self.use_broadcast = use_broadcast
+        self.status_table: Dict[int, Optional[ResponseMotorStatus]] = {address: None for address in self.addresses}
+        self.status_time: Dict[int, float] = {address: 0 for address in self.addresses}
+        self.errors: Dict[int, int] = {address: 0 for address in self.addresses}
+        self.missed_polls: Dict[int, int] = {address: 0 for address in self.addresses}
+        self._next_poll_index = 0
+        self._next_request_time = 0
+
+    def send_to_all(self, request_type) -> None:
+        """Send parameterless request like RequestHalt to all heads"""
+        if self.use_broadcast:
+            self._send(request_type(BROADCAST_ADDRESS))
+        else:
+            for address in self.addresses:
+                self._send(request_type(address))
+
+    def halt_all(self) -> None:
+        self.send_to_all(RequestHalt)
+
+    def disable_all(self) -> None:
+        self.send_to_all(RequestDisable)
+
+    def set_home_all(self) -> None:
+        self.send_to_all(RequestSetHome)
+
+    def rotate_all(self, angle: float, rpm: float) -> None:
+        self.rotate({address: angle for address in self.addresses}, rpm)
+
+    def rotate(self, angles: Dict[int, float], rpm: float) -> None:
+        """Rotate heads to given angles, single broadcast is used when all heads have the same target"""
+        targets = set(RequestRotate(BROADCAST_ADDRESS, angle, rpm).angle for angle in angles.values())
+        if self.use_broadcast and set(angles.keys()) == set(self.addresses) and len(targets) == 1:
+            self._send(RequestRotate(BROADCAST_ADDRESS, targets.pop(), rpm))
+            return
+        for address, angle in angles.items():
+            self._send(RequestRotate(address, angle, rpm))
+
+    def poll_next(self) -> int:
+        """Poll status of the next head in round-robin order and return its address"""
+        address = self.addresses[self._next_poll_index]
+        self._next_poll_index = (self._next_poll_index + 1) % len(self.addresses)
+        self.poll(address)
+        return address
+
+    def poll(self, address: int) -> Optional[ResponseMotorStatus]:
+        try:
+            status = self._send(RequestGetStatus(address))
+        except IOError:
+            self.errors[address] += 1
+            self.missed_polls[address] += 1
+            return None
+        self.missed_polls[address] = 0
+        self.status_table[address] = status
+        self.status_time[address] = time.monotonic()
+        return status
+
+    def refresh(self) -> Dict[int, Optional[ResponseMotorStatus]]:
+        for _ in self.addresses:
+            self.poll_next()
+        return self.status_table
+
+    def is_any_rotating(self) -> bool:
+        return any(status is None or status.is_rotating for status in self.status_table.values())
+
+    def wait_until_all_stopped(self, rpm: float = None, timeout: float = 120, stop: threading.Event = None) -> Dict[int, ResponseMotorStatus]:
+        """Poll heads which are still rotating until all of them stop or stop is set, polling rate is kept within the bus budget.
+
+        Raises IOError when a head doesn't respond to max_missed_polls status requests in a row.
+        """
+        start_time = time.monotonic()
+        self.refresh()
+        while self.is_any_rotating():
+            if stop is not None and stop.is_set():
+                break
+            if time.monotonic() - start_time > timeout:
+                raise TimeoutError(f"Rotary tables didn't stop in {timeout:.1f} s!")
+            moving = [address for address, status in self.status_table.items() if status is None or status.is_rotating]
+            known = [self.status_table[address] for address in moving if self.status_table[address] is not None]
+            remaining = min((predict_rotation_time(status, rpm) for status in known), default=0)
+            if remaining > self.poll_interval * len(moving):
+                if sleep_unless_stopped(remaining - self.poll_interval * len(moving), stop):
+                    break
+            for address in moving:
+                if self.poll(address) is None and self.missed_polls[address] >= self.max_missed_polls:
+                    raise IOError(f"Rotary table with address {address:d} didn't respond to {self.missed_polls[address]:d} status requests in a row!")
+        return self.status_table
+
+    def format_status_table(self) -> str:
+        lines = [f"{'addr':>4} {'rot':>4} {'en':>3} {'ok':>3} {'current':>9} {'target':>9} {'rpm':>7} {'age (s)':>8} {'err':>4}"]
+        now = time.monotonic()
+        for address in self.addresses:
+            status = self.status_table[address]
+            if status is None:
+                lines.append(f"{address:>4} {'-':>4} {'-':>3} {'-':>3} {'-':>9} {'-':>9} {'-':>7} {'-':>8} {self.errors[address]:>4}")
+                continue
+            lines.append(f"{address:>4} {int(status.is_rotating):>4} {int(status.is_enabled):>3} {int(status.is_motor_OK):>3} "
+                f"{status.current_angle:>9.3f} {status.target_angle:>9.3f} {status.rpm:>7.2f} "
+                f"{now - self.status_time[address]:>8.2f} {self.errors[address]:>4}")
+        return "\n".join(lines)
+
+    def _send(self, request: Request) -> Response:
+        now = time.monotonic()
+        if now < self._next_request_time:
+            time.sleep(self._next_request_time - now)
+        try:
+            return self.rt.send_request(request)
+        finally:
+            self._next_request_time = time.monotonic() + self.poll_interval
@@ -1,4 +1,7 @@
-from typing import Dict
+from typing import Dict, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import serial
 from serial.serialutil import PARITY_NONE
 import serial.tools.list_ports as ser_list
@@ -9,6 +12,9 @@ COM_PORT_VID = 0x0483
 COM_PORT_PID = 0x5740
 BROADCAST_ADDRESS = 0xF
 CONTROLLER_ADDRESS = 0xE
+# Timeout in seconds of controller ping during discovery and number of ports pinged at once
+PROBE_TIMEOUT = 0.3
+PROBE_WORKERS = 8
 
 def list_com_ports() -> Dict[str, ListPortInfo]:
     ports = ser_list.comports()
@@ -23,26 +29,150 @@ def is_com_port_valid(port_info: ListPortInfo) -> bool:
             return True
     return False
 
+def ping_controller(port_name: str, timeout: float = PROBE_TIMEOUT) -> Optional[ResponseConverterStatus]:
+    """Send converter status request to controller on the port, None when there is no valid response"""
+    try:
+        rt = RotaryTable(port_name, rs_converter=False, timeout=timeout)
+    except (serial.SerialException, ValueError):
+        return None
+    try:
+        resp = rt.send_request(RequestGetConverterStatus(CONTROLLER_ADDRESS))
+    except (IOError, ValueError):
+        return None
+    finally:
+        rt.close()
+    # Other devices on the port may answer with noise which happens to look like a response
+    if not isinstance(resp, ResponseConverterStatus) or not resp.is_valid:
+        return None
+    return resp
+
+def probe_com_ports(port_names: Iterable[str] = None, timeout: float = PROBE_TIMEOUT,
+        workers: int = PROBE_WORKERS) -> Dict[str, Optional[ResponseConverterStatus]]:
+    """Ping controllers on ports concurrently, all COM port devices by default, return converter status or None for every port"""
+    if port_names is None:
+        port_names = [port_info.device for port_info in list_com_ports().values()]
+    port_names = list(port_names)
+    if len(port_names) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(port_names))) as executor:
+        return dict(zip(port_names, executor.map(lambda port_name: ping_controller(port_name, timeout), port_names)))
+
+def predict_rotation_time(status: ResponseMotorStatus, rpm: float = None) -> float:
+    """Predict time in seconds until table reaches target angle.
+
+    Distance is taken along the shorter path and speed as the higher of reported and requested rpm,
+    so prediction is never longer than the real movement.
+    """
+    if not status.is_rotating:
+        return 0
+    distance = (status.target_angle - status.current_angle) % 360
+    distance = min(distance, 360 - distance)
+    speed = abs(status.rpm)
+    if rpm is not None:
+        speed = max(speed, abs(rpm))
+    if speed == 0:
+        return 0
+    return distance / (speed * 360 / 60)
+
+def sleep_unless_stopped(duration: float, stop: threading.Event = None) -> bool:
+    """Sleep for duration or until stop is set, return True when stop is set"""
+    if stop is None:
+        time.sleep(duration)
+        return False
+    return stop.wait(duration)
+
+class StopWaiter:
+    """Stall and timeout checks of waiting until a table stops, shared by synchronous and asynchronous API"""
+    def __init__(self, address: int, rpm: float = None, timeout: float = 120, stall_timeout: float = 2,
+            guard_time: float = 0.1, poll_interval: float = 0.02):
+        self.address = address
+        self.rpm = rpm
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.guard_time = guard_time
+        self.poll_interval = poll_interval
+        self.start_time = time.monotonic()
+        self.last_angle = None
+        self.last_move_time = self.start_time
+
+    def next_sleep(self, status: ResponseMotorStatus) -> Optional[float]:
+        """Return time to sleep before the next status request, None when the table has stopped"""
+        now = time.monotonic()
+        if not status.is_rotating:
+            return None
+        if status.current_angle != self.last_angle:
+            self.last_angle = status.current_angle
+            self.last_move_time = now
+        elif now - self.last_move_time > self.stall_timeout:
+            raise IOError(f"Rotary table with address {self.address:d} stalled at {self.last_angle:.3f}deg!")
+        if now - self.start_time > self.timeout:
+            raise TimeoutError(f"Rotary table with address {self.address:d} didn't stop in {self.timeout:.1f} s!")
+        remaining = predict_rotation_time(status, self.rpm) - self.guard_time
+        return max(self.poll_interval, min(remaining, self.stall_timeout/2))
+
 class RotaryTable:
-    def __init__(self, port_name: str, rs_converter: bool = True):
+    # Object with span(name, category, **args) method returning context manager, e.g. antenna_meas_cli.profiling.Tracer
+    tracer = None
+    def __init__(self, port_name: str, rs_converter: bool = True, timeout: float = 1):
         if rs_converter:
-            self.inst = serial.Serial(port_name, baudrate=38400, parity=PARITY_NONE, timeout=1)
+            self.inst = serial.serial_for_url(port_name, baudrate=38400, parity=PARITY_NONE, timeout=timeout)
         else:
-            self.inst = serial.Serial(port_name, timeout=1)
+            self.inst = serial.serial_for_url(port_name, timeout=timeout)
+        # Request and its response must not interleave with another thread's, e.g. halt sent on interruption
+        self.lock = threading.Lock()
     
     def __del__(self):
-        self.close()
+        # Port is missing when opening it failed in constructor
+        if hasattr(self, "inst"):
+            self.close()
     
     def send_request(self, request: Request) -> Response:
-        self.inst.reset_input_buffer()
-        self.inst.write(request.to_bytes())
-        resp_data = self.inst.read(REPONSE_LENGTH)
-        self.inst.rts = True
-        if request.address == BROADCAST_ADDRESS:
-            return
+        if self.tracer is None:
+            return self._send_request(request)
+        with self.tracer.span("rt.send_request", "io", request=type(request).__name__, address=request.address,
+                bytes_out=REQUEST_LENGTH) as span:
+            response = self._send_request(request)
+            span["bytes_in"] = REPONSE_LENGTH if response is not None else 0
+            return response
+
+    def _send_request(self, request: Request) -> Response:
+        with self.lock:
+            self.inst.reset_input_buffer()
+            self.inst.write(request.to_bytes())
+            if request.address == BROADCAST_ADDRESS:
+                # Heads don't answer broadcast, so waiting for a response would only run into timeout
+                self.inst.flush()
+                self.inst.rts = True
+                return
+            resp_data = self.inst.read(REPONSE_LENGTH)
+            self.inst.rts = True
         if len(resp_data) == 0:
             raise IOError(f"There is no reponse from rotary table with address {request.address:d}!")
         return parse_response(resp_data)
     
+    def wait_until_stopped(self, address: int, rpm: float = None, timeout: float = 120, stall_timeout: float = 2,
+            guard_time: float = 0.1, poll_interval: float = 0.02, stop: threading.Event = None) -> ResponseMotorStatus:
+        """Wait until table stops rotating and return its last status.
+
+        Sleeps until shortly before predicted arrival and then polls densely. Raises IOError when current angle
+        doesn't change for stall_timeout seconds and TimeoutError when table doesn't stop within timeout.
+        When stop is set, returns the last status at once, though the table may be still rotating.
+        """
+        if self.tracer is None:
+            return self._wait_until_stopped(address, rpm, timeout, stall_timeout, guard_time, poll_interval, stop)
+        with self.tracer.span("rt.wait_until_stopped", "motion", address=address) as span:
+            status = self._wait_until_stopped(address, rpm, timeout, stall_timeout, guard_time, poll_interval, stop)
+            span["angle"] = status.current_angle
+            return status
+
+    def _wait_until_stopped(self, address: int, rpm: float, timeout: float, stall_timeout: float,
+            guard_time: float, poll_interval: float, stop: threading.Event) -> ResponseMotorStatus:
+        waiter = StopWaiter(address, rpm, timeout, stall_timeout, guard_time, poll_interval)
+        while True:
+            status = self.send_request(RequestGetStatus(address))
+            sleep_time = waiter.next_sleep(status)
+            if sleep_time is None or sleep_unless_stopped(sleep_time, stop):
+                return status
+
     def close(self):
         self.inst.close()
@@ -0,0 +1,130 @@
+from collections import deque
+from typing import Deque, Dict, List
+import asyncio
+import serial
+from serial.serialutil import PARITY_NONE
+from rotary_table_api.rotary_table_messages import *
+from rotary_table_api.rotary_table_api import BROADCAST_ADDRESS, StopWaiter
+
+class FrameParser:
+    """Incremental parser finding response frames in a byte stream by PREAMBLE and CRC"""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.dropped_bytes = 0
+
+    def feed(self, data: bytes) -> List[Response]:
+        self.buffer += data
+        responses = []
+        while True:
+            start = self.buffer.find(PREAMBLE)
+            if start < 0:
+                self.dropped_bytes += len(self.buffer)
+                self.buffer.clear()
+                break
+            if start > 0:
+                self.dropped_bytes += start
+                del self.buffer[:start]
+            if len(self.buffer) < REPONSE_LENGTH:
+                break
+            resp = parse_response(bytes(self.buffer[:REPONSE_LENGTH]))
+            if resp.is_valid:
+                responses.append(resp)
+                del self.buffer[:REPONSE_LENGTH]
+            else:
+                self.dropped_bytes += 1
+                del self.buffer[:1]
+        return responses
+
+class AsyncRotaryTable:
+    """Rotary table controller driven from asyncio event loop.
+
+    Serial port is read without blocking, responses are resynchronised by FrameParser and matched
+    to pending requests by address, so requests to many addresses may be in flight at once.
+    """
+    def __init__(self, port_name: str, rs_converter: bool = True, read_interval: float = 0.002):
+        if rs_converter:
+            self.inst = serial.serial_for_url(port_name, baudrate=38400, parity=PARITY_NONE, timeout=0)
+        else:
+            self.inst = serial.serial_for_url(port_name, timeout=0)
+        self.read_interval = read_interval
+        self.parser = FrameParser()
+        self.unexpected_responses = 0
+        self._pending: Dict[int, Deque[asyncio.Future]] = {}
+        self._reader_task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def start(self):
+        if self._reader_task is None:
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def send_request(self, request: Request, timeout: float = 1) -> Response:
+        self.start()
+        if request.address == BROADCAST_ADDRESS:
+            self._write(request)
+            return
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(request.address, deque())
+        pending.append(future)
+        self._write(request)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise IOError(f"There is no reponse from rotary table with address {request.address:d}!")
+        finally:
+            if future in pending:
+                pending.remove(future)
+
+    async def wait_until_stopped(self, address: int, rpm: float = None, timeout: float = 120, stall_timeout: float = 2,
+            guard_time: float = 0.1, poll_interval: float = 0.02) -> ResponseMotorStatus:
+        """Asynchronous equivalent of RotaryTable.wait_until_stopped()"""
+        waiter = StopWaiter(address, rpm, timeout, stall_timeout, guard_time, poll_interval)
+        while True:
+            status = await self.send_request(RequestGetStatus(address))
+            sleep_time = waiter.next_sleep(status)
+            if sleep_time is None:
+                return status
+            await asyncio.sleep(sleep_time)
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        for pending in self._pending.values():
+            for future in pending:
+                if not future.done():
+                    future.set_exception(IOError("Rotary table connection closed!"))
+        self._pending.clear()
+        self.inst.close()
+
+    def _write(self, request: Request):
+        self.inst.write(request.to_bytes())
+        self.inst.rts = True
+
+    def _dispatch(self, resp: Response):
+        pending = self._pending.get(resp.address)
+        while pending:
+            future = pending.popleft()
+            if not future.done():
+                future.set_result(resp)
+                return
+        self.unexpected_responses += 1
+
+    async def _read_loop(self):
+        while True:
+            data = self.inst.read(max(self.inst.in_waiting, 1))
+            if len(data) == 0:
+                await asyncio.sleep(self.read_interval)
+                continue
+            for resp in self.parser.feed(data):
+                self._dispatch(resp)
+            await asyncio.sleep(0)
@@ -0,0 +1,64 @@
+import numpy as np
+from rotary_table_api import rotary_table_messages as rt_msg
+
+RESPONSE_DTYPE = np.dtype([
+    ("offset", np.int64),
+    ("address", np.uint8),
+    ("response_header", np.uint8),
+    ("status", np.uint8),
+    ("is_motor_OK", np.bool_),
+    ("is_rotating", np.bool_),
+    ("is_enabled", np.bool_),
+    ("current_angle", np.float64),
+    ("target_angle", np.float64),
+    ("rpm", np.float64),
+])
+
+def find_frames(data: bytes) -> np.ndarray:
+    """Return offsets of valid response frames in a captured byte stream.
+
+    Candidate frames start at every PREAMBLE byte and are validated with vectorised CRC8. Candidates overlapping
+    an earlier valid frame are rejected, which resynchronises parsing after lost or corrupted bytes.
+    """
+    stream = np.frombuffer(data, dtype=np.uint8)
+    if len(stream) < rt_msg.REPONSE_LENGTH:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.flatnonzero(stream[:len(stream) - rt_msg.REPONSE_LENGTH + 1] == rt_msg.PREAMBLE[0])
+    frames = stream[candidates[:, None] + np.arange(rt_msg.REPONSE_LENGTH)]
+    table = np.frombuffer(rt_msg.CRC8_TABLE, dtype=np.uint8)
+    crc = np.zeros(len(candidates), dtype=np.uint8)
+    for i in range(rt_msg.REPONSE_LENGTH - 1):
+        crc = table[crc ^ frames[:, i]]
+    offsets = candidates[crc == frames[:, -1]]
+    if np.all(np.diff(offsets) >= rt_msg.REPONSE_LENGTH):
+        return offsets.astype(np.int64)
+    accepted = []
+    next_free = 0
+    for offset in offsets.tolist():
+        if offset >= next_free:
+            accepted.append(offset)
+            next_free = offset + rt_msg.REPONSE_LENGTH
+    return np.asarray(accepted, dtype=np.int64)
+
+def parse_responses(data: bytes) -> np.ndarray:
+    """Decode all valid response frames in a captured byte stream into structured array with RESPONSE_DTYPE.
+
+    Angle and rpm fields are meaningful only for motor status frames (response_header equal to 0xF).
+    """
+    offsets = find_frames(data)
+    stream = np.frombuffer(data, dtype=np.uint8)
+    frames = stream[offsets[:, None] + np.arange(rt_msg.REPONSE_LENGTH)]
+    result = np.empty(len(offsets), dtype=RESPONSE_DTYPE)
+    result["offset"] = offsets
+    result["address"] = frames[:, 1] >> rt_msg.ADDRESS_LENGTH
+    result["response_header"] = frames[:, 1] & (2**rt_msg.ADDRESS_LENGTH - 1)
+    status = frames[:, 2]
+    result["status"] = status
+    result["is_motor_OK"] = (status & rt_msg.IS_MOTOR_OK_MASK) > 0
+    result["is_rotating"] = (status & rt_msg.IS_ROTATING_MASK) > 0
+    result["is_enabled"] = (status & rt_msg.IS_ENABLED_MASK) > 0
+    angle_scale = 2.0**-rt_msg.ANGLE_FRACTION_LENGTH
+    result["current_angle"] = (frames[:, 3].astype(np.uint16) << 8 | frames[:, 4]) * angle_scale
+    result["target_angle"] = (frames[:, 5].astype(np.uint16) << 8 | frames[:, 6]) * angle_scale
+    result["rpm"] = frames[:, 7].view(np.int8) * rt_msg.RPM_PRECISION
+    return result
@@ -1,7 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Type
-
-import crc8
+from typing import Dict, Tuple, Type
 
 def round_to(val: float, precision: float):
     if val % precision < precision/2:
@@ -10,9 +8,33 @@ def round_to(val: float, precision: float):
         val += precision - val % precision
     return val
 
+CRC8_POLYNOMIAL = 0x07
+def make_crc8_table(polynomial: int = CRC8_POLYNOMIAL) -> bytes:
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ polynomial) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+        table[i] = crc
+    return bytes(table)
+CRC8_TABLE = make_crc8_table()
+def calc_crc8(data: bytes, crc: int = 0) -> int:
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
 ADDRESS_LENGTH = 4
 PREAMBLE = b"\x5D"
+REQUEST_LENGTH = 6
+_FRAME_CACHE: Dict[Tuple[type, int], bytes] = {}
 class Request(ABC):
+    __slots__ = ("__address",)
+    # Requests without parameters other than address opt in to be encoded once and then served from cache
+    is_cacheable = False
+
     def __init__(self, address: int):
         self.address = address
     @property
@@ -34,11 +56,18 @@ class Request(ABC):
         header = self.address << (8-ADDRESS_LENGTH) | self.get_command()
         return PREAMBLE + header.to_bytes(1, byteorder="big") + self.get_body()
     def get_CRC(self) -> bytes:
-        hash = crc8.crc8()
-        hash.update(self.get_content())
-        return hash.digest()
+        return calc_crc8(self.get_content()).to_bytes(1, byteorder="big")
     def to_bytes(self) -> bytes:
-        return self.get_content() + self.get_CRC()
+        if self.is_cacheable:
+            key = (type(self), self.address)
+            frame = _FRAME_CACHE.get(key)
+            if frame is None:
+                frame = _FRAME_CACHE[key] = self.encode()
+            return frame
+        return self.encode()
+    def encode(self) -> bytes:
+        content = self.get_content()
+        return content + calc_crc8(content).to_bytes(1, byteorder="big")
 
     def __eq__(self, other):
         if isinstance(other, Request):
@@ -46,22 +75,32 @@ class Request(ABC):
         return False
 
 class RequestGetStatus(Request):
+    __slots__ = ()
+    is_cacheable = True
     def get_command(self) -> int:
         return 0
 
 class RequestSetHome(Request):
+    __slots__ = ()
+    is_cacheable = True
     def get_command(self) -> int:
         return 1
 
 class RequestHalt(Request):
+    __slots__ = ()
+    is_cacheable = True
     def get_command(self) -> int:
         return 2
         
 class RequestDisable(Request):
+    __slots__ = ()
+    is_cacheable = True
     def get_command(self) -> int:
         return 3
         
 class RequestGetConverterStatus(Request):
+    __slots__ = ()
+    is_cacheable = True
     def get_command(self) -> int:
         return 5
 
@@ -85,6 +124,8 @@ def angle_from_bytes(data: bytes) -> float:
     return int.from_bytes(data, byteorder="big") * 2**-ANGLE_FRACTION_LENGTH
 
 class RequestRotate(Request):
+    __slots__ = ("__rpm", "__angle")
+
     def __init__(self, address: int, angle: float, rpm: float):
         self.address = address
         self.rpm = rpm
@@ -114,6 +155,8 @@ class RequestRotate(Request):
 
 REPONSE_LENGTH = 9
 class Response():
+    __slots__ = ("__preamble", "__payload", "__crc")
+
     def __init__(self, data: bytes):
         if len(data) != REPONSE_LENGTH:
             raise ValueError(f"Response data must be {REPONSE_LENGTH} bits length.")
@@ -146,10 +189,7 @@ class Response():
         return self.payload[0] & (2**ADDRESS_LENGTH-1)
     
     def calc_CRC(self) -> bytes:
-        hash = crc8.crc8()
-        hash.update(self.preamble)
-        hash.update(self.payload)
-        return hash.digest()
+        return calc_crc8(self.payload, calc_crc8(self.preamble)).to_bytes(1, byteorder="big")
 
     @property
     def is_valid(self) -> bool:
@@ -167,6 +207,8 @@ IS_ENABLED_MASK = 0b1<<2
 IS_CRC_VALID_MASK = 0b1<<3
 VOLTAGE_FRACTION_LENGTH = 4
 class ResponseMotorStatus(Response):
+    __slots__ = ()
+
     @property
     def status(self) -> int:
         return self.payload[1]
@@ -185,15 +227,22 @@ class ResponseMotorStatus(Response):
 
     @property
     def current_angle(self) -> float:
-        return angle_from_bytes(self.payload[2:4])
+        payload = self.payload
+        return (payload[2] << 8 | payload[3]) * 2**-ANGLE_FRACTION_LENGTH
     @property
     def target_angle(self) -> float:
-        return angle_from_bytes(self.payload[4:6])
+        payload = self.payload
+        return (payload[4] << 8 | payload[5]) * 2**-ANGLE_FRACTION_LENGTH
     @property
     def rpm(self) -> float:
-        return rpm_from_bytes(self.payload[6:7])
+        rpm = self.payload[6]
+        if rpm & 0x80:
+            rpm -= 0x100
+        return rpm*RPM_PRECISION
     
 class ResponseConverterStatus(Response):
+    __slots__ = ()
+
     @property
     def status(self) -> int:
         return self.payload[1]
@@ -210,10 +259,12 @@ class ResponseConverterStatus(Response):
     def reserved_data(self) -> bytes:
         return self.payload[3:]
 
+RESPONSE_TYPES = {
+    0xE: ResponseConverterStatus,
+    0xF: ResponseMotorStatus
+}
 def parse_response(data: bytes) -> Type[Response]:
-    resp = Response(data)
-    if resp.response_header == 0xE:
-        return ResponseConverterStatus(data)
-    elif resp.response_header == 0xF:
-        return ResponseMotorStatus(data)
-    return resp
\ No newline at end of file
+    if len(data) != REPONSE_LENGTH:
+        raise ValueError(f"Response data must be {REPONSE_LENGTH} bits length.")
+    response_type = RESPONSE_TYPES.get(data[1] & (2**ADDRESS_LENGTH-1), Response)
+    return response_type(data)
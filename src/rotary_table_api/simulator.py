@@ -0,0 +1,245 @@
+"""Rotary table controller simulator speaking the framed protocol on a local TCP socket.
+
+RotaryTable is connected to it unchanged by pyserial URL given as port name:
+
+    sim = RotaryTableSimulator([0, 1])
+    sim.start()
+    rt = RotaryTable(sim.port_name)
+"""
+from typing import Dict, Iterable, List, Optional
+import math
+import select
+import socket
+import threading
+import time
+from rotary_table_api.rotary_table_messages import *
+from rotary_table_api.rotary_table_api import BROADCAST_ADDRESS, CONTROLLER_ADDRESS
+
+SIMULATION_STEP = 1E-3
+DEGREES_PER_SECOND_PER_RPM = 6
+
+class SimulatedHead:
+    """Motion model of a single head with trapezoidal speed profile along the shorter path to target.
+
+    After arrival reported angle rings with decaying oscillation of ringing_amplitude in degrees.
+    """
+    def __init__(self, address: int, acceleration: float = 60, ringing_amplitude: float = 0,
+            ringing_decay: float = 0.1, ringing_frequency: float = 5):
+        self.address = address
+        # Acceleration in rpm/s
+        self.acceleration = acceleration
+        self.ringing_amplitude = ringing_amplitude
+        self.ringing_decay = ringing_decay
+        self.ringing_frequency = ringing_frequency
+        self.time_since_arrival = math.inf
+        self.angle = 0.0
+        self.target = 0.0
+        self.speed = 0.0
+        self.max_speed = 0.0
+        self.is_enabled = True
+        self.is_motor_OK = True
+
+    @property
+    def distance(self) -> float:
+        return (self.target - self.angle + 180) % 360 - 180
+
+    @property
+    def is_rotating(self) -> bool:
+        return self.speed > 0 or abs(self.distance) >= ANGLE_PRECISION/2
+
+    @property
+    def reported_angle(self) -> float:
+        t = self.time_since_arrival
+        if self.ringing_amplitude == 0 or math.isinf(t):
+            return self.angle
+        ringing = self.ringing_amplitude * math.exp(-t/self.ringing_decay) * math.cos(2*math.pi*self.ringing_frequency*t)
+        return (self.angle + ringing) % 360
+
+    @property
+    def rpm(self) -> float:
+        return math.copysign(self.speed / DEGREES_PER_SECOND_PER_RPM, self.distance)
+
+    def advance(self, duration: float) -> None:
+        while duration > 0:
+            dt = min(duration, SIMULATION_STEP)
+            duration -= dt
+            distance = self.distance
+            if not self.is_enabled or abs(distance) < 1E-9:
+                self.speed = 0.0
+                self.time_since_arrival += duration + dt
+                return
+            acceleration = self.acceleration * DEGREES_PER_SECOND_PER_RPM
+            stop_speed = math.sqrt(2*acceleration*abs(distance))
+            desired = min(self.max_speed, stop_speed)
+            if self.speed < desired:
+                self.speed = min(desired, self.speed + acceleration*dt)
+            else:
+                self.speed = max(desired, self.speed - acceleration*dt)
+            step = max(self.speed, acceleration*dt) * dt
+            self.time_since_arrival = math.inf
+            if step >= abs(distance):
+                self.angle = self.target
+                self.speed = 0.0
+                self.time_since_arrival = duration
+                return
+            self.angle = (self.angle + math.copysign(step, distance)) % 360
+
+    def rotate(self, angle: float, rpm: float) -> None:
+        self.is_enabled = True
+        self.target = angle % 360
+        self.max_speed = abs(rpm) * DEGREES_PER_SECOND_PER_RPM
+
+    def halt(self) -> None:
+        self.is_enabled = True
+        self.target = self.angle
+        self.speed = 0.0
+
+    def disable(self) -> None:
+        self.is_enabled = False
+        self.target = self.angle
+        self.speed = 0.0
+
+    def set_home(self) -> None:
+        self.angle = 0.0
+        self.target = 0.0
+
+    def status(self, is_crc_valid: bool = True) -> int:
+        status = 0
+        if self.is_motor_OK:
+            status |= IS_MOTOR_OK_MASK
+        if self.is_rotating:
+            status |= IS_ROTATING_MASK
+        if self.is_enabled:
+            status |= IS_ENABLED_MASK
+        if is_crc_valid:
+            status |= IS_CRC_VALID_MASK
+        return status
+
+def encode_response(payload: bytes) -> bytes:
+    data = PREAMBLE + payload
+    return data + calc_crc8(data).to_bytes(1, byteorder="big")
+
+def encode_motor_status(head: SimulatedHead) -> bytes:
+    header = head.address << ADDRESS_LENGTH | 0xF
+    payload = bytes([header, head.status()]) + angle_to_bytes(head.reported_angle) + angle_to_bytes(head.target) + rpm_to_bytes(head.rpm)
+    return encode_response(payload)
+
+def encode_converter_status(voltage: float) -> bytes:
+    header = CONTROLLER_ADDRESS << ADDRESS_LENGTH | 0xE
+    status = IS_VOLTAGE_OK_MASK if voltage >= 11 else 0
+    return encode_response(bytes([header, status, int(voltage * 2**VOLTAGE_FRACTION_LENGTH)]) + bytes(4))
+
+class RotaryTableSimulator:
+    """Simulated controller with heads under given addresses, answering requests of one client at a time on a TCP socket.
+
+    Responses are delayed by response_delay plus transmission time of the frame at given baudrate.
+    """
+    def __init__(self, addresses: Iterable[int] = (0,), acceleration: float = 60, baudrate: int = 38400,
+            response_delay: float = 1E-3, voltage: float = 12, ringing_amplitude: float = 0):
+        self.heads: Dict[int, SimulatedHead] = {address: SimulatedHead(address, acceleration, ringing_amplitude)
+            for address in addresses}
+        self.baudrate = baudrate
+        self.response_delay = response_delay
+        self.voltage = voltage
+        self.requests_count = 0
+        self.invalid_bytes = 0
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port_name = "socket://127.0.0.1:{:d}".format(self.server.getsockname()[1])
+        self._lock = threading.Lock()
+        self._last_update = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.server.close()
+
+    def update(self) -> None:
+        """Advance motion of all heads up to now"""
+        with self._lock:
+            now = time.monotonic()
+            for head in self.heads.values():
+                head.advance(now - self._last_update)
+            self._last_update = now
+
+    def head(self, address: int) -> SimulatedHead:
+        self.update()
+        return self.heads[address]
+
+    def handle_request(self, frame: bytes) -> Optional[bytes]:
+        self.update()
+        self.requests_count += 1
+        address = frame[1] >> ADDRESS_LENGTH
+        command = frame[1] & (2**ADDRESS_LENGTH - 1)
+        if command == 5:
+            return encode_converter_status(self.voltage) if address != BROADCAST_ADDRESS else None
+        heads: List[SimulatedHead] = list(self.heads.values()) if address == BROADCAST_ADDRESS else [self.heads.get(address)]
+        if heads[0] is None:
+            return None
+        with self._lock:
+            for head in heads:
+                if command == 1:
+                    head.set_home()
+                elif command == 2:
+                    head.halt()
+                elif command == 3:
+                    head.disable()
+                elif command == 4:
+                    head.rotate(angle_from_bytes(frame[2:4]), rpm_from_bytes(frame[4:5]))
+        if address == BROADCAST_ADDRESS:
+            return None
+        return encode_motor_status(heads[0])
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self.server], [], [], 0.01)
+            if readable:
+                connection, _ = self.server.accept()
+                with connection:
+                    self._serve(connection)
+
+    def _serve(self, connection: socket.socket) -> None:
+        buffer = bytearray()
+        while not self._stop.is_set():
+            readable, _, _ = select.select([connection], [], [], 0.01)
+            if not readable:
+                continue
+            try:
+                data = connection.recv(1024)
+            except OSError:
+                return
+            if len(data) == 0:
+                return
+            buffer += data
+            while len(buffer) >= REQUEST_LENGTH:
+                start = buffer.find(PREAMBLE)
+                if start < 0:
+                    self.invalid_bytes += len(buffer)
+                    buffer.clear()
+                    break
+                if start > 0:
+                    self.invalid_bytes += start
+                    del buffer[:start]
+                    continue
+                frame = bytes(buffer[:REQUEST_LENGTH])
+                if calc_crc8(frame[:-1]) != frame[-1]:
+                    self.invalid_bytes += 1
+                    del buffer[:1]
+                    continue
+                del buffer[:REQUEST_LENGTH]
+                response = self.handle_request(frame)
+                if response is not None:
+                    time.sleep(self.response_delay + len(response)*10/self.baudrate)
+                    connection.sendall(response)
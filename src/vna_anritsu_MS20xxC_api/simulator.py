@@ -0,0 +1,252 @@
+"""MS20xxC simulator answering SCPI commands used by VNA, connected through SimulatedResourceManager:
+
+    rm = SimulatedResourceManager(SimulatedVNA(points_num=401, sweep_time=0.2))
+    vna = VNA(rm, SIMULATED_RESOURCE_NAME)
+
+Sweep duration follows sweep time model unless given explicitly and every transaction is delayed by latency
+plus transfer time of the response, so timing of measurement loops is close to the real instrument.
+"""
+from typing import Callable, Dict, Optional, Tuple
+import re
+import threading
+import time
+import numpy as np
+import pyvisa
+from pyvisa.constants import VI_ERROR_TMO
+from vna_anritsu_MS20xxC_api.vna_types import *
+from vna_anritsu_MS20xxC_api.sweep_time import estimate_sweep_time
+from vna_anritsu_MS20xxC_api.vna_api import DATA_FORMAT_DTYPES
+
+SIMULATED_RESOURCE_NAME = "SIM::MS2028C::INSTR"
+SIMULATED_IDN = "\"Anritsu,MS2028C/10/2,00000000,1.23\""
+SWEEP_COMPLETE_MASK = 0b1<<8
+TRACES_SPARAMS = (SParam.S11, SParam.S12, SParam.S21, SParam.S22)
+
+SModel = Callable[[np.ndarray, float], np.ndarray]
+
+def default_s_model(freq: np.ndarray, angle: float) -> np.ndarray:
+    """Two identical antennas 1 m apart with a weak reflection 3 ns behind the direct path.
+
+    Gain of rotated antenna is cos^8 of half the angle from boresight with -40 dB floor, return (N, 2, 2) S-parameters.
+    """
+    freq = np.asarray(freq, dtype=float)
+    delay = 3.3E-9
+    gain = max(np.cos(np.deg2rad(angle)/2)**8, 1E-2)
+    s21 = 0.1*gain*np.exp(-2j*np.pi*freq*delay) + 0.005*np.exp(-2j*np.pi*freq*(delay + 3E-9))
+    s11 = 0.2*np.exp(-2j*np.pi*freq*0.5E-9)
+    s = np.empty((len(freq), 2, 2), dtype=np.complex128)
+    s[:, 0, 0] = s11
+    s[:, 1, 1] = s11
+    s[:, 0, 1] = s21
+    s[:, 1, 0] = s21
+    return s
+
+def encode_block(payload: bytes) -> bytes:
+    """Encode IEEE-488.2 definite length block"""
+    length = str(len(payload))
+    return f"#{len(length):d}{length}".encode("ascii") + payload
+
+class SimulatedVNA:
+    """State of simulated instrument and SCPI commands handling.
+
+    S-parameters are computed by s_model for frequency points and angle given by angle_source when a sweep starts,
+    e.g. lambda: rt_simulator.head(0).angle. Complex gaussian noise with noise_level standard deviation is added.
+    """
+    def __init__(self, f_start: float = 1E9, f_stop: float = 18E9, points_num: int = 201, ifbw: float = 10E3,
+            sweep_time: float = None, latency: float = 1E-3, transfer_rate: float = 1E6, s_model: SModel = default_s_model,
+            angle_source: Callable[[], float] = None, noise_level: float = 0, seed: int = None):
+        self.f_start = f_start
+        self.f_stop = f_stop
+        self.points_num = points_num
+        self.ifbw = ifbw
+        self.averaging = 1
+        self.sweep_time = sweep_time
+        self.latency = latency
+        self.transfer_rate = transfer_rate
+        self.s_model = s_model
+        self.angle_source = angle_source
+        self.noise_level = noise_level
+        self.rng = np.random.default_rng(seed)
+        self.data_format = DataFormat.ASCII
+        self.traces_count = 4
+        self.traces_sparams = dict(enumerate(TRACES_SPARAMS, start=1))
+        self.traces_domains = {trace: Domain.FREQ for trace in self.traces_sparams}
+        self.is_continuous = True
+        self.sweep_end = 0.0
+        self.sweeps_count = 0
+        self.commands_count = 0
+        self.data: np.ndarray = None
+        self.lock = threading.RLock()
+
+    @property
+    def freq(self) -> np.ndarray:
+        return np.linspace(self.f_start, self.f_stop, self.points_num)
+
+    def get_sweep_duration(self) -> float:
+        if self.sweep_time is not None:
+            return self.sweep_time
+        return estimate_sweep_time(SweepSettings(self.points_num, self.ifbw, self.averaging))
+
+    def measure(self) -> np.ndarray:
+        angle = self.angle_source() if self.angle_source is not None else 0.0
+        s = self.s_model(self.freq, angle)
+        if self.noise_level > 0:
+            s = s + self.noise_level/np.sqrt(2)*(self.rng.standard_normal(s.shape) + 1j*self.rng.standard_normal(s.shape))
+        return s
+
+    def start_sweep(self) -> None:
+        self.data = self.measure()
+        self.sweep_end = time.monotonic() + self.get_sweep_duration()
+        self.sweeps_count += 1
+
+    def is_sweep_completed(self) -> bool:
+        return time.monotonic() >= self.sweep_end
+
+    def get_data(self) -> np.ndarray:
+        if self.is_continuous or self.data is None:
+            return self.measure()
+        return self.data
+
+    def format_values(self, values: np.ndarray) -> bytes:
+        if self.data_format == DataFormat.ASCII:
+            return encode_block(",".join(f"{value:.6E}" for value in values).encode("ascii"))
+        return encode_block(np.asarray(values).astype(DATA_FORMAT_DTYPES[self.data_format]).tobytes())
+
+    def get_trace_values(self, trace: int) -> np.ndarray:
+        s = self.get_data()
+        sparam = self.traces_sparams[trace]
+        row, col = int(sparam[1]) - 1, int(sparam[2]) - 1
+        return np.ascontiguousarray(s[:, row, col]).view(float)
+
+    def handle(self, message: str) -> Optional[bytes]:
+        """Execute commands chained with semicolons, return joined responses of queries or None when there aren't any"""
+        responses = []
+        with self.lock:
+            for command in message.strip().split(";"):
+                command = command.strip()
+                if len(command) == 0:
+                    continue
+                self.commands_count += 1
+                response = self.execute(command)
+                if response is not None:
+                    responses.append(response)
+        if len(responses) == 0:
+            return None
+        return b";".join(responses) + b"\n"
+
+    def execute(self, command: str) -> Optional[bytes]:
+        header, _, argument = command.partition(" ")
+        header = header.upper()
+        argument = argument.strip()
+        if header == "*IDN?":
+            return SIMULATED_IDN.encode("ascii")
+        if header == "*OPC?":
+            time.sleep(max(0, self.sweep_end - time.monotonic()))
+            return b"1"
+        if header == ":INIT:IMM":
+            self.start_sweep()
+            return None
+        if re.fullmatch(r":STAT(US)?:OPER(ATION)?\?", header):
+            return str(SWEEP_COMPLETE_MASK if self.is_sweep_completed() else 0).encode("ascii")
+        match = re.fullmatch(r":TRAC:(DATA|PRE)\?", header)
+        if match is not None:
+            trace = int(argument)
+            if match.group(1) == "PRE":
+                return encode_block(f"NAME=TRACE{trace:d},SPAR={self.traces_sparams[trace].upper()},POINTS={self.points_num:d}".encode("ascii"))
+            return self.format_values(self.get_trace_values(trace))
+        if re.fullmatch(r":SENS\d?:FREQ:DATA\?", header):
+            return self.format_values(self.freq)
+        match = re.fullmatch(r":TRAC(\d)?:(SPAR|DOM)(\?)?", header)
+        if match is not None:
+            trace = int(match.group(1) or 1)
+            values = self.traces_sparams if match.group(2) == "SPAR" else self.traces_domains
+            if match.group(3):
+                return values[trace].upper().encode("ascii")
+            values[trace] = argument.lower() if match.group(2) == "SPAR" else argument.upper()
+            return None
+        for setting_header, (attribute, convert, response_format) in self.settings_commands().items():
+            if header == setting_header + "?":
+                return response_format.format(getattr(self, attribute)).encode("ascii")
+            if header == setting_header:
+                setattr(self, attribute, convert(argument))
+                if attribute in ("f_start", "f_stop", "points_num"):
+                    self.data = None
+                return None
+        raise ValueError(f"Simulated VNA doesn't support command {command}.")
+
+    @staticmethod
+    def settings_commands() -> Dict[str, Tuple[str, Callable, str]]:
+        return {
+            ":FREQ:STAR": ("f_start", float, "{:.9E}"),
+            ":FREQ:STOP": ("f_stop", float, "{:.9E}"),
+            ":SENS:SWE:POIN": ("points_num", int, "{:d}"),
+            ":SENS:SWE:IFBW": ("ifbw", float, "{:.6E}"),
+            ":SENS:AVER:COUN": ("averaging", int, "{:d}"),
+            ":TRACE:TOT": ("traces_count", int, "{:d}"),
+            ":FORM:READ:DATA": ("data_format", lambda val: val.upper(), "{}"),
+            ":INIT:CONT": ("is_continuous", lambda val: bool(int(val)), "{:d}"),
+        }
+
+class SimulatedInstrument:
+    """Part of pyvisa resource interface used by VNA, connected to SimulatedVNA.
+
+    Responses are read from a byte stream and read_raw() stops at line feed read termination like with socket resources.
+    """
+    read_termination = "\n"
+
+    def __init__(self, device: SimulatedVNA):
+        self.device = device
+        self.timeout = 2000
+        self.buffer = bytearray()
+        self.is_open = True
+
+    def write(self, message: str) -> int:
+        if not self.is_open:
+            raise IOError("Simulated instrument is closed.")
+        time.sleep(self.device.latency)
+        response = self.device.handle(message)
+        if response is not None:
+            self.buffer += response
+        return len(message)
+
+    def _take(self, count: int) -> bytes:
+        if count > len(self.buffer):
+            time.sleep(self.timeout / 1000)
+            raise pyvisa.VisaIOError(VI_ERROR_TMO)
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        time.sleep(count / self.device.transfer_rate)
+        return data
+
+    def read_bytes(self, count: int) -> bytes:
+        return self._take(count)
+
+    def read_raw(self) -> bytes:
+        end = self.buffer.find(self.read_termination.encode("ascii"))
+        return self._take(end + 1 if end >= 0 else len(self.buffer) + 1)
+
+    def read(self) -> str:
+        return self.read_raw().decode("latin-1").rstrip("\n")
+
+    def query(self, message: str) -> str:
+        self.write(message)
+        return self.read()
+
+    def close(self) -> None:
+        self.is_open = False
+
+class SimulatedResourceManager:
+    """Resource manager exposing SimulatedVNA under SIMULATED_RESOURCE_NAME, it can be passed to VNA instead of pyvisa's one"""
+    def __init__(self, device: SimulatedVNA = None):
+        self.device = device if device is not None else SimulatedVNA()
+
+    def list_resources(self) -> Tuple[str, ...]:
+        return (SIMULATED_RESOURCE_NAME,)
+
+    def open_resource(self, name: str) -> SimulatedInstrument:
+        if name != SIMULATED_RESOURCE_NAME:
+            raise ValueError(f"There is no simulated resource {name}.")
+        return SimulatedInstrument(self.device)
+
+    def close(self) -> None:
+        pass
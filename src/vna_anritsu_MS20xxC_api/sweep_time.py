@@ -0,0 +1,40 @@
+from typing import Dict
+from vna_anritsu_MS20xxC_api.vna_types import SweepSettings
+
+# Model parameters roughly matching MS20xxC, they are refined at runtime by SweepTimeEstimator
+POINT_OVERHEAD = 0.5E-3
+SWEEP_OVERHEAD = 0.1
+
+def estimate_sweep_time(settings: SweepSettings, point_overhead: float = POINT_OVERHEAD, sweep_overhead: float = SWEEP_OVERHEAD) -> float:
+    """Estimate duration of a single sweep in seconds from points number, IF bandwidth and averaging count"""
+    averaging = max(settings.averaging, 1)
+    return averaging * settings.points_num * (1/settings.ifbw + point_overhead) + sweep_overhead
+
+class SweepTimeEstimator:
+    """Sweep time estimation refined by measured sweep durations.
+
+    Durations measured for the same settings are averaged with exponential moving average. For settings
+    without history, the model estimate is scaled by the mean ratio of measured to modelled durations.
+    """
+    def __init__(self, history_weight: float = 0.3):
+        self.history_weight = history_weight
+        self.history: Dict[SweepSettings, float] = {}
+        self.model_correction = 1.0
+        self.samples = 0
+
+    def has_history(self, settings: SweepSettings) -> bool:
+        return settings in self.history
+
+    def estimate(self, settings: SweepSettings) -> float:
+        if settings in self.history:
+            return self.history[settings]
+        return estimate_sweep_time(settings) * self.model_correction
+
+    def record(self, settings: SweepSettings, duration: float) -> None:
+        if settings in self.history:
+            self.history[settings] += self.history_weight * (duration - self.history[settings])
+        else:
+            self.history[settings] = duration
+        self.samples += 1
+        ratio = duration / estimate_sweep_time(settings)
+        self.model_correction += (ratio - self.model_correction) / self.samples
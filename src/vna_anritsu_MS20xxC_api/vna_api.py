@@ -1,8 +1,10 @@
-from typing import List, NoReturn, Tuple, Dict
+from typing import Iterable, List, NoReturn, Tuple, Dict, Union
+from concurrent.futures import ThreadPoolExecutor
 
 from numpy.core.fromnumeric import trace
 from pyvisa.constants import VI_ERROR_TMO
 from vna_anritsu_MS20xxC_api.vna_types import *
+from vna_anritsu_MS20xxC_api.sweep_time import SweepTimeEstimator
 
 import pyvisa
 import re
@@ -16,25 +18,60 @@ TRACES_MAPPING = {
     3: SParam.S21,
     4: SParam.S22
 }
+S2P_INDICES = {
+    SParam.S11: (0, 0),
+    SParam.S12: (0, 1),
+    SParam.S21: (1, 0),
+    SParam.S22: (1, 1)
+}
+DATA_FORMAT_DTYPES = {
+    DataFormat.REAL32: np.dtype("<f4"),
+    DataFormat.REAL64: np.dtype("<f8"),
+    DataFormat.INT: np.dtype("<i4")
+}
+BLOCK_SEPARATORS = b";,\r\n "
+# Responses are terminated with line feed, in binary responses it follows the last block
+RESPONSE_TERMINATION = b"\n"
 EXCEPTION_PREFIX = "VNA_COMMUNICATION: "
+# Timeout in seconds of identification query during discovery and number of instruments queried at once
+PROBE_TIMEOUT = 0.5
+PROBE_WORKERS = 8
 
 def list_visa_instruments(rm: pyvisa.ResourceManager) -> Tuple[str, ...]:
     return rm.list_resources()
-def find_vna_instrument_by_idn(rm: pyvisa.ResourceManager) -> str:
-    instruments = list_visa_instruments(rm)
-    for inst_name in instruments:
-        if is_instrument_supported(get_instrument_idn(rm, inst_name)):
+def find_vna_instrument_by_idn(rm: pyvisa.ResourceManager, timeout: float = PROBE_TIMEOUT) -> str:
+    idns = probe_visa_instruments(rm, timeout=timeout)
+    for inst_name, idn in idns.items():
+        if is_instrument_supported(idn):
             return inst_name
     return None
-def get_instrument_idn(resource_manager: pyvisa.ResourceManager, inst_name: str) -> str:
-    inst = resource_manager.open_resource(inst_name)
+def get_instrument_idn(resource_manager: pyvisa.ResourceManager, inst_name: str, timeout: float = None) -> str:
+    """Query identification of instrument, None when it doesn't answer, timeout in seconds overrides the resource one"""
+    try:
+        inst = resource_manager.open_resource(inst_name)
+    except pyvisa.VisaIOError as err:
+        return None
     try:
+        if timeout is not None:
+            inst.timeout = timeout*1000
         idn = inst.query("*IDN?")
     except pyvisa.VisaIOError as err:
         return None
     finally:
         inst.close()
     return idn
+def probe_visa_instruments(rm: pyvisa.ResourceManager, instruments: Iterable[str] = None, timeout: float = PROBE_TIMEOUT,
+        workers: int = PROBE_WORKERS) -> Dict[str, str]:
+    """Query identification of instruments concurrently, so a dead one costs a single timeout, not one per instrument.
+
+    Return identifications in order of instruments, None for instruments which didn't answer.
+    """
+    instruments = list(list_visa_instruments(rm) if instruments is None else instruments)
+    if len(instruments) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(instruments))) as executor:
+        idns = executor.map(lambda inst_name: get_instrument_idn(rm, inst_name, timeout), instruments)
+        return dict(zip(instruments, idns))
 
 def is_instrument_supported(identification) -> bool:
     if identification is None:
@@ -53,14 +90,29 @@ def convert_traces_data_to_s2p(traces_data: Dict[str, np.ndarray], freq_data: np
     s2p[:, 1, 0] = traces_data[SParam.S21]
     s2p[:, 1, 1] = traces_data[SParam.S22]
     return rf.Network(f=freq_data/1E9, s=s2p, f_unit="GHz")
+def convert_freq_blocks(freq_blocks: List[memoryview], dtype: np.dtype) -> np.ndarray:
+    freq = np.frombuffer(freq_blocks[0], dtype=dtype).astype(float)
+    for block in freq_blocks[1:]:
+        if (np.frombuffer(block, dtype=dtype) != freq).any():
+            raise IOError(EXCEPTION_PREFIX + "Unable to readout traces data, frequency data differs between traces.")
+    return freq
+def convert_blocks_to_s2p(traces_blocks: List[memoryview], points_num: int, dtype: np.dtype) -> np.ndarray:
+    s2p = np.empty(shape=(points_num,2,2), dtype=np.complex128)
+    for block, sparam in zip(traces_blocks, TRACES_MAPPING.values()):
+        if len(block) != 2*points_num*dtype.itemsize:
+            raise IOError(EXCEPTION_PREFIX + "Unable to create s2p matrix from traces data. Lengths of trace data and freq data are different.")
+        row, col = S2P_INDICES[sparam]
+        s2p[:, row, col] = convert_block_to_complex(block, dtype)
+    return s2p
 def convert_from_NR1(val: str) -> int:
     return int(val)
 def convert_from_NR3(val: str) -> float:
     return float(val)
-def convert_from_trace_data(val: str, format: str) -> List[str]:
+def convert_from_trace_data(val: Union[str, bytes], format: str) -> Union[List[str], np.ndarray]:
+    """Convert trace data block to list of strings for ASCII format or to array of numbers for binary formats"""
     if len(val) < 2:
          return None
-    len_dig_count = int(val[1])+2
+    len_dig_count = int(val[1:2])+2
     if len(val) <= len_dig_count:
          return None
     if format == DataFormat.ASCII:
@@ -69,13 +121,10 @@ def convert_from_trace_data(val: str, format: str) -> List[str]:
             return splited[:-1]
         else:
             return splited
-    elif format == DataFormat.REAL32 or format == DataFormat.REAL64:
-        num_size = 4
-        if format == DataFormat.REAL64:
-            num_size = 8
-        data = []
-        for i in range(len_dig_count, len(val), num_size):
-            tmp = val[i:num_size]
+    elif format in DATA_FORMAT_DTYPES:
+        if isinstance(val, str):
+            val = val.encode("latin-1")
+        return np.frombuffer(parse_binary_blocks(val)[0], dtype=DATA_FORMAT_DTYPES[format])
     else:
         raise NotImplementedError(f"Converting from {format} format is not implemented!")
 def convert_data_to_complex(data: List):
@@ -87,6 +136,37 @@ def convert_data_to_complex(data: List):
     real = real.reshape((len(real)//2, 2))
     complex = real[:, 0] + real[:, 1]*1j
     return complex
+def convert_block_to_complex(block: memoryview, dtype: np.dtype) -> np.ndarray:
+    """Convert binary block of interleaved real and imaginary parts to complex array, equivalent of convert_data_to_complex()"""
+    values = np.frombuffer(block, dtype=dtype)
+    if len(values)%2 == 1:
+        values = np.append(values, values.dtype.type(0))
+    if values.dtype.kind == "f":
+        return values.view(f"{values.dtype.byteorder}c{2*values.dtype.itemsize:d}").astype(np.complex128)
+    return values.astype(float).view(np.complex128)
+def parse_binary_blocks(data: bytes) -> List[memoryview]:
+    """Split response of one or many chained queries into payloads of IEEE-488.2 definite length blocks without copying"""
+    view = memoryview(data)
+    blocks = []
+    pos = 0
+    while pos < len(data):
+        if data[pos] in BLOCK_SEPARATORS:
+            pos += 1
+            continue
+        if data[pos:pos+1] != b"#" or not data[pos+1:pos+2].isdigit():
+            raise IOError(EXCEPTION_PREFIX + f"Binary block header expected at position {pos:d}.")
+        len_dig_count = int(data[pos+1:pos+2])
+        if len_dig_count == 0:
+            raise IOError(EXCEPTION_PREFIX + "Indefinite length binary blocks aren't supported.")
+        start = pos + 2 + len_dig_count
+        if not data[pos+2:start].isdigit():
+            raise IOError(EXCEPTION_PREFIX + f"Binary block length expected at position {pos+2:d}.")
+        end = start + int(data[pos+2:start])
+        if end > len(data):
+            raise IOError(EXCEPTION_PREFIX + "Binary block is truncated.")
+        blocks.append(view[start:end])
+        pos = end
+    return blocks
 def convert_header_to_dict(data: List[str]) -> Dict[str, str]:
     header = {}
     for record in data:
@@ -99,8 +179,20 @@ def convert_header_to_dict(data: List[str]) -> Dict[str, str]:
 
 class VNA: 
     data_format = DataFormat.REAL32
+    # Read all traces in a single transaction of chained queries
+    batch_readout = True
+    # Check done before reusing cached frequency data, see FreqCacheValidation
+    freq_cache_validation = FreqCacheValidation.POINTS
+    # Wait for sweep completion with *OPC? query instead of polling operation status register
+    use_opc = False
+    sweep_poll_interval = 0.02
+    # Object with span(name, category, **args) method returning context manager, e.g. antenna_meas_cli.profiling.Tracer
+    tracer = None
     def __init__(self, resource_manager: pyvisa.ResourceManager, instrument_id: str):
         self.inst = resource_manager.open_resource(instrument_id)
+        self.freq_cache: Tuple[FrequencySettings, np.ndarray] = None
+        self.sweep_settings: SweepSettings = None
+        self.sweep_time_estimator = SweepTimeEstimator()
     
     def __del___(self):
         if self.inst is not None:
@@ -110,20 +202,95 @@ class VNA:
         return self.inst.query("*IDN?")
 
     def get_traces_data_as_s2p(self, check_traces_freq = False) -> rf.Network:
+        if self.tracer is None:
+            return self._get_traces_data_as_s2p(check_traces_freq)
+        with self.tracer.span("vna.get_traces_data", "vna", batched=self.batch_readout) as span:
+            s2p = self._get_traces_data_as_s2p(check_traces_freq)
+            span["points"] = len(s2p.f)
+            return s2p
+
+    def _get_traces_data_as_s2p(self, check_traces_freq: bool) -> rf.Network:
+        if self.batch_readout:
+            s2p, freq = self.get_traces_data_batched(check_traces_freq)
+            return rf.Network(f=freq/1E9, s=s2p, f_unit="GHz")
         data = {}
-        freq = None
+        freq = None if check_traces_freq else self.get_cached_freq_data()
         default_timeout = self.inst.timeout
         self.inst.timeout = 10000
         for trace, sparam in TRACES_MAPPING.items():
             data[sparam] = self.get_trace_data(trace)
-            if freq is None or check_traces_freq:
+            if check_traces_freq or (freq is None and trace == 1):
                 trace_freq = self.get_trace_freq_data(trace)
                 if freq is not None and (trace_freq != freq).any():
                     raise IOError(EXCEPTION_PREFIX + "Unable to readout traces data, frequency data differs between traces.")
                 freq = trace_freq
+                self.store_freq_cache(freq)
         self.inst.timeout = default_timeout
         return convert_traces_data_to_s2p(data, freq)
 
+    def get_traces_data_batched(self, check_traces_freq = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Read all traces and frequency data with one chained query, return (N, 2, 2) S-parameters and frequencies"""
+        queries = [f":TRAC:DATA? {trace:d}" for trace in TRACES_MAPPING]
+        freq = None if check_traces_freq else self.get_cached_freq_data()
+        if freq is None:
+            freq_traces = list(TRACES_MAPPING) if check_traces_freq else list(TRACES_MAPPING)[:1]
+            queries += [f":SENS{trace:d}:FREQ:DATA?" for trace in freq_traces]
+        default_timeout = self.inst.timeout
+        self.inst.timeout = 10000
+        try:
+            self.inst.write(";".join(queries))
+            blocks = self.read_binary_blocks(len(queries))
+        finally:
+            self.inst.timeout = default_timeout
+        dtype = DATA_FORMAT_DTYPES[self.data_format]
+        if freq is None:
+            freq = convert_freq_blocks(blocks[len(TRACES_MAPPING):], dtype)
+            self.store_freq_cache(freq)
+        return convert_blocks_to_s2p(blocks[:len(TRACES_MAPPING)], len(freq), dtype), freq
+
+    def read_binary_blocks(self, count: int) -> List[bytes]:
+        """Read count definite length blocks of a response by lengths in their headers and then response termination.
+
+        Binary data may contain termination character, so blocks aren't read up to it like with read_raw().
+        """
+        blocks = []
+        for i in range(count):
+            header = self.inst.read_bytes(2)
+            if i > 0 and header[:1] in BLOCK_SEPARATORS:
+                header = header[1:] + self.inst.read_bytes(1)
+            if header[:1] != b"#" or not header[1:2].isdigit():
+                raise IOError(EXCEPTION_PREFIX + f"Binary block header expected, but got {bytes(header)!r}.")
+            len_dig_count = int(header[1:2])
+            if len_dig_count == 0:
+                raise IOError(EXCEPTION_PREFIX + "Indefinite length binary blocks aren't supported.")
+            length = self.inst.read_bytes(len_dig_count)
+            if not length.isdigit():
+                raise IOError(EXCEPTION_PREFIX + f"Binary block length expected, but got {bytes(length)!r}.")
+            blocks.append(self.inst.read_bytes(int(length)))
+        if self.inst.read_bytes(len(RESPONSE_TERMINATION)) != RESPONSE_TERMINATION:
+            raise IOError(EXCEPTION_PREFIX + "Response termination expected after the last binary block.")
+        return blocks
+
+    def get_cached_freq_data(self) -> np.ndarray:
+        """Return cached frequency data or None when cache is empty or doesn't match current sweep settings"""
+        if self.freq_cache is None:
+            return None
+        settings, freq = self.freq_cache
+        if self.freq_cache_validation == FreqCacheValidation.POINTS:
+            if convert_from_NR1(self.inst.query(":SENS:SWE:POIN?")) != settings.points_num:
+                self.invalidate_freq_cache()
+                return None
+        elif self.freq_cache_validation == FreqCacheValidation.SETTINGS:
+            current = self.get_freq_settings()
+            if current.points_num != settings.points_num or not np.allclose(current[:2], settings[:2], rtol=1E-6):
+                self.invalidate_freq_cache()
+                return None
+        return freq
+    def store_freq_cache(self, freq: np.ndarray) -> None:
+        self.freq_cache = (FrequencySettings(freq[0], freq[-1], len(freq)), freq)
+    def invalidate_freq_cache(self) -> None:
+        self.freq_cache = None
+
     def set_traces_as_s2p(self) -> None:
         self.set_data_format(self.data_format)
         for trace, sparam in TRACES_MAPPING.items():
@@ -144,22 +311,21 @@ class VNA:
     def get_trace_domain(self, trace_num: int) -> str:
         return self.inst.query(f":TRAC{trace_num:d}:DOM?")
     def set_trace_domain(self, trace_num: int, domain: str) -> None:
+        self.invalidate_freq_cache()
         self.inst.write(f":TRAC{trace_num:d}:DOM {domain}")
+    def query_binary_block(self, query: str) -> bytes:
+        self.inst.write(query)
+        return self.read_binary_blocks(1)[0]
     def get_trace_data(self, trace_num: int) -> np.ndarray:
-        datatype = None
-        if self.data_format == DataFormat.REAL64:
-            datatype = "d"
-        elif self.data_format == DataFormat.REAL32:
-            datatype = "f"
-        resp = self.inst.query_binary_values(f":TRAC:DATA? {trace_num:d}", datatype=datatype)
-        return convert_data_to_complex(resp)
+        query = f":TRAC:DATA? {trace_num:d}"
+        if self.data_format == DataFormat.ASCII:
+            return convert_data_to_complex(convert_from_trace_data(self.inst.query(query), DataFormat.ASCII))
+        return convert_block_to_complex(self.query_binary_block(query), DATA_FORMAT_DTYPES[self.data_format])
     def get_trace_freq_data(self, trace_num: int) -> np.ndarray:
-        if self.data_format == DataFormat.REAL64:
-            datatype = "d"
-        elif self.data_format == DataFormat.REAL32:
-            datatype = "f"
-        resp = self.inst.query_binary_values(f":SENS{trace_num:d}:FREQ:DATA?", datatype=datatype)
-        return np.asarray(resp, dtype=float)
+        query = f":SENS{trace_num:d}:FREQ:DATA?"
+        if self.data_format == DataFormat.ASCII:
+            return np.asarray(convert_from_trace_data(self.inst.query(query), DataFormat.ASCII), dtype=float)
+        return np.frombuffer(self.query_binary_block(query), dtype=DATA_FORMAT_DTYPES[self.data_format]).astype(float)
     def get_trace_header(self, trace_num: int) -> Dict[str, str]:
         resp = convert_from_trace_data(self.inst.query(f":TRAC:PRE? {trace_num:d}"), DataFormat.ASCII)
         return convert_header_to_dict(resp)
@@ -170,13 +336,30 @@ class VNA:
         points_num = convert_from_NR1(self.inst.query(":SENS:SWE:POIN?"))
         return FrequencySettings(f_start, f_stop, points_num)
     def set_freq_settings(self, f_start: float, f_stop: float, points_num: int) -> None:
+        self.invalidate_freq_cache()
+        self.sweep_settings = None
         self.inst.write(f":FREQ:STAR {round(f_start):d}")
         self.inst.write(f":FREQ:STOP {round(f_stop):d}")
         self.inst.write(f":SENS:SWE:POIN {points_num:d}")
 
+    def get_ifbw(self) -> float:
+        return convert_from_NR3(self.inst.query(":SENS:SWE:IFBW?"))
+    def set_ifbw(self, ifbw: float) -> None:
+        self.sweep_settings = None
+        self.inst.write(f":SENS:SWE:IFBW {round(ifbw):d}")
+    def get_averaging_count(self) -> int:
+        return convert_from_NR1(self.inst.query(":SENS:AVER:COUN?"))
+    def set_averaging_count(self, count: int) -> None:
+        self.sweep_settings = None
+        self.inst.write(f":SENS:AVER:COUN {count:d}")
+    def get_sweep_settings(self) -> SweepSettings:
+        """Return settings affecting sweep time, they are queried only after change made by library setters"""
+        if self.sweep_settings is None:
+            points_num = convert_from_NR1(self.inst.query(":SENS:SWE:POIN?"))
+            self.sweep_settings = SweepSettings(points_num, self.get_ifbw(), self.get_averaging_count())
+        return self.sweep_settings
     def get_sweep_time(self) -> float:
-        # TODO: Get sweep time based on IFBW and SWEEP NUMBER
-        return 20
+        return self.sweep_time_estimator.estimate(self.get_sweep_settings())
     def get_is_sweep_completed(self) -> bool:
         resp = self.inst.query(":STATus:OPERation?")
         return convert_from_NR1(resp) & 0b1<<8 > 0
@@ -188,14 +371,51 @@ class VNA:
         self.inst.write(f":INIT:CONT {int(is_continuous)}")
     def start_sweep(self) -> None:
         self.inst.write(":INIT:IMM")
-    def start_single_sweep_await(self) -> None:
-        wait_time = 0.5
-        self.start_sweep()
-        time.sleep(wait_time)
-        for i in range(0,100):
-            if self.get_is_sweep_completed():
-                return
-            time.sleep(wait_time)
-        if not self.get_is_sweep_completed():
-            raise IOError(EXCEPTION_PREFIX + "Sweep isn't complete in expected amount of time.")
+    def start_single_sweep_await(self, timeout: float = None) -> None:
+        """Start single sweep and wait until it's completed.
+
+        Waiting sleeps for most of the estimated sweep time and then polls densely, estimation is refined with measured
+        sweep durations. Timeout defaults to three times estimated sweep time, but not less than 10 s.
+        """
+        if self.tracer is None:
+            return self._start_single_sweep_await(timeout)
+        with self.tracer.span("vna.sweep", "vna", opc=self.use_opc):
+            self._start_single_sweep_await(timeout)
+
+    def _start_single_sweep_await(self, timeout: float) -> None:
+        settings = self.get_sweep_settings()
+        estimate = self.sweep_time_estimator.estimate(settings)
+        if timeout is None:
+            timeout = max(3*estimate, 10)
+        start = time.monotonic()
+        if self.use_opc:
+            default_timeout = self.inst.timeout
+            self.inst.timeout = timeout*1000
+            try:
+                self.inst.query(":INIT:IMM;*OPC?")
+            except pyvisa.VisaIOError as err:
+                raise IOError(EXCEPTION_PREFIX + "Sweep isn't complete in expected amount of time.") from err
+            finally:
+                self.inst.timeout = default_timeout
+            end = time.monotonic()
+        else:
+            self.start_sweep()
+            # Model-only estimate may be inaccurate, so polling starts earlier until there is a history
+            trusted_fraction = 0.9 if self.sweep_time_estimator.has_history(settings) else 0.5
+            time.sleep(estimate*trusted_fraction)
+            pending_time = None
+            while True:
+                poll_start = time.monotonic()
+                is_completed = self.get_is_sweep_completed()
+                # Instrument answers the status query about half of its round trip after it's sent
+                answer_time = (poll_start + time.monotonic()) / 2
+                if is_completed:
+                    break
+                if answer_time - start > timeout:
+                    raise IOError(EXCEPTION_PREFIX + "Sweep isn't complete in expected amount of time.")
+                pending_time = answer_time
+                time.sleep(self.sweep_poll_interval)
+            # Sweep ended between the last two answers, so poll interval and query latency aren't learned as sweep time
+            end = answer_time if pending_time is None else (pending_time + answer_time) / 2
+        self.sweep_time_estimator.record(settings, end - start)
 
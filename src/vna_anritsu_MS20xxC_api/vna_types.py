@@ -2,6 +2,7 @@ from collections import namedtuple
 from typing import Final
 
 FrequencySettings = namedtuple("FrequencySettings", ("start", "stop", "points_num"))  
+SweepSettings = namedtuple("SweepSettings", ("points_num", "ifbw", "averaging"))
 
 class SParam:
     S11: Final = "s11"
@@ -21,3 +22,8 @@ class DataFormat:
     REAL32: Final = "REAL,32"
     REAL64: Final = "REAL,64"
 
+class FreqCacheValidation:
+    """Check done by VNA before cached frequency data is reused"""
+    NONE: Final = "none" # Cache is invalidated only by library setters
+    POINTS: Final = "points" # Sweep points number is queried
+    SETTINGS: Final = "settings" # Start and stop frequencies and sweep points number are queried
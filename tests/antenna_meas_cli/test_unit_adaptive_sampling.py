@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from antenna_meas_cli import adaptive_sampling
+from antenna_meas_cli.adaptive_sampling import AdaptiveSampler
+from antenna_meas_cli.pattern_analysis import normalize_pattern, pattern_db
+
+def antenna_s21(angle):
+    """Gaussian main lobe narrowing with frequency over smooth back lobes"""
+    a = np.angle(np.exp(1j*np.deg2rad(angle)))
+    k = np.array([1.0, 1.5, 2.0])
+    return 0.1*(np.exp(-(3*k*a)**2) + 0.03*(1 + 0.3*np.cos(a)) + 0.01*np.cos(2*a)**2)
+
+def max_interpolation_error(angles):
+    angles = np.sort(np.asarray(angles) % 360)
+    measured = normalize_pattern(pattern_db(np.stack([antenna_s21(angle) for angle in angles])))
+    dense = np.arange(0, 360, 0.1)
+    truth = normalize_pattern(pattern_db(np.stack([antenna_s21(angle) for angle in dense])))
+    interpolated = np.stack([np.interp(dense, angles, measured[:, i], period=360) for i in range(measured.shape[1])], axis=1)
+    return np.abs(interpolated - truth).max()
+
+def run_sampler(sampler):
+    angles = sampler.initial_angles()
+    while len(angles) > 0:
+        for angle in angles:
+            sampler.add(angle, antenna_s21(angle))
+        angles = sampler.next_angles()
+
+def test_interpolation_error():
+    angles = np.arange(0, 360, 10.0)
+    linear = np.abs(angles - 180)[:, None]
+    error = adaptive_sampling.interpolation_error(angles, linear)
+    assert error[5] == pytest.approx(0) and error[-1] > 0
+    quadratic = (angles**2/100)[:, None]
+    assert adaptive_sampling.interpolation_error(angles, quadratic)[10] == pytest.approx(2*10**2/100/8)
+
+def test_budget_and_min_step():
+    sampler = AdaptiveSampler(30, 20, tolerance=0, min_step=5)
+    run_sampler(sampler)
+    assert sampler.measured_count == 20
+    assert np.diff(sorted(sampler.values)).min() >= 5
+    with pytest.raises(ValueError):
+        AdaptiveSampler(10, 20)
+
+def test_fidelity_with_half_points():
+    sampler = AdaptiveSampler(20, 36)
+    run_sampler(sampler)
+    assert sampler.measured_count == 36
+    assert max_interpolation_error(list(sampler.values)) <= max_interpolation_error(np.arange(0, 360, 5)) + 1E-6
+    assert max_interpolation_error(list(sampler.values)) < max_interpolation_error(np.arange(0, 360, 10))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api.simulator import RotaryTableSimulator
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.simulator import SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME
+from antenna_meas_cli.angular_scan import AngularScan
+from antenna_meas_cli.pattern_store import PatternStore
+from antenna_meas_cli.scan_journal import ScanJournal
+from antenna_meas_cli.settling import SettleDetector
+
+def test_angular_scan(tmp_path):
+    store = str(tmp_path / "scan.rhp")
+    with RotaryTableSimulator([1], acceleration=3600) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        device = SimulatedVNA(points_num=11, sweep_time=0.01, latency=0, angle_source=lambda: sim.head(1).angle)
+        vna = vna_api.VNA(SimulatedResourceManager(device), SIMULATED_RESOURCE_NAME)
+        vna.set_traces_as_s2p()
+        vna.set_is_sweep_continuous(False)
+        journal = ScanJournal.create(str(tmp_path / "scan.journal"), {}, {}, {})
+        persisted = []
+        try:
+            scan = AngularScan(rt, 1, vna, journal, SettleDetector(rt, 1, max_settle_time=0.1), 30, store=store,
+                s2p_name="ant", s2p_dir=str(tmp_path), metadata={"angle_step": 90})
+            angles = scan.pending_angles(np.arange(0, 360, 90))
+            scan.run(scan.plan(angles), lambda: persisted.append(scan.position))
+            scan.finish()
+        finally:
+            scan.close()
+            journal.close()
+            rt.close()
+        assert sorted(journal.completed_angles) == [0, 90, 180, 270] and journal.is_complete
+        assert len(persisted) == 4 and scan.position == 0
+        assert sim.head(1).angle == pytest.approx(0, abs=0.1)
+    pattern = PatternStore(store)
+    assert sorted(pattern.angles) == [0, 90, 180, 270]
+    assert pattern.metadata["angle_step"] == 90 and pattern.metadata["freq_settings"]["points_num"] == 11
+    assert (tmp_path / "ant_90deg.s2p").exists()
+    assert "Pass" not in scan.format_stats()
+
+def test_pending_angles(tmp_path):
+    journal = ScanJournal.create(str(tmp_path / "scan.journal"), {}, {}, {})
+    journal.record_angle(0, 0.0)
+    journal.record_angle(180, 180.0)
+    with RotaryTableSimulator([1]) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        try:
+            vna = vna_api.VNA(SimulatedResourceManager(SimulatedVNA(points_num=11)), SIMULATED_RESOURCE_NAME)
+            scan = AngularScan(rt, 1, vna, journal, SettleDetector(rt, 1), 5, s2p_name="ant")
+            assert list(scan.pending_angles(np.arange(0, 360, 90))) == [90, 270]
+            assert scan.store_writer is None
+        finally:
+            journal.close()
+            rt.close()
@@ -0,0 +1,60 @@
+import threading
+import numpy as np
+import pytest
+import skrf as rf
+from antenna_meas_cli.averaging import ComplexWelford, SweepAverager, s21_ci_db, averaging_fields, STD_FIELD, SWEEPS_FIELD
+from antenna_meas_cli.pattern_store import PatternStore, PatternStoreWriter
+
+def make_network(s: np.ndarray) -> rf.Network:
+    return rf.Network(f=np.linspace(1, 2, len(s)), s=s, f_unit="GHz")
+
+def test_welford_matches_batch_statistics():
+    rng = np.random.default_rng(1)
+    sweeps = rng.standard_normal((20, 5, 2, 2)) + 1j*rng.standard_normal((20, 5, 2, 2))
+    accumulator = ComplexWelford()
+    for sweep in sweeps:
+        accumulator.add(sweep)
+    assert accumulator.count == 20
+    np.testing.assert_allclose(accumulator.mean, sweeps.mean(axis=0))
+    np.testing.assert_allclose(accumulator.variance, sweeps.var(axis=0, ddof=1))
+    np.testing.assert_allclose(accumulator.standard_error, sweeps.std(axis=0, ddof=1) / np.sqrt(20))
+
+def test_ci_db():
+    accumulator = ComplexWelford()
+    for value in (0.9, 1.1):
+        accumulator.add(np.full((3, 2, 2), value, dtype=complex))
+    # Standard error of two sweeps 0.1 apart from the mean is 0.1
+    assert s21_ci_db(accumulator) == pytest.approx(20*np.log10(1 + 1.959964*0.1), rel=1E-5)
+
+def test_early_stopping():
+    rng = np.random.default_rng(2)
+    def noisy(noise_level):
+        return lambda: make_network(np.full((4, 2, 2), 0.1) + noise_level*rng.standard_normal((4, 2, 2)))
+    averager = SweepAverager(32, ci_target_db=0.5)
+    averaged, accumulator = averager.measure(noisy(0))
+    assert accumulator.count == 4 and np.allclose(averaged.s, 0.1)
+    _, accumulator = averager.measure(noisy(0.1))
+    assert accumulator.count == 32
+    assert averager.counts == [4, 32]
+    assert "1 of 2 angles stopped early" in averager.format_stats()
+    assert SweepAverager(3).measure(noisy(0))[1].count == 3
+    stop = threading.Event()
+    stop.set()
+    assert SweepAverager(3).measure(noisy(0), stop)[1].count == 1
+    with pytest.raises(ValueError):
+        SweepAverager(0)
+
+def test_store_std_next_to_mean(tmp_path):
+    path = str(tmp_path / "averaged.pst")
+    freq = np.array([1E9, 2E9, 3E9])
+    accumulator = ComplexWelford()
+    for value in (1, 2, 3):
+        accumulator.add(np.full((3, 2, 2), value, dtype=complex))
+    with PatternStoreWriter(path, freq, extra_fields=averaging_fields(len(freq))) as writer:
+        writer.append(10, accumulator.mean, **{STD_FIELD: accumulator.std, SWEEPS_FIELD: accumulator.count})
+    with PatternStoreWriter.reopen(path) as writer:
+        writer.append(20, accumulator.mean, **{STD_FIELD: accumulator.std, SWEEPS_FIELD: accumulator.count})
+    store = PatternStore(path)
+    assert len(store) == 2 and np.all(store.s == 2)
+    np.testing.assert_allclose(store.records[STD_FIELD], 1)
+    assert store.records[SWEEPS_FIELD].tolist() == [3, 3]
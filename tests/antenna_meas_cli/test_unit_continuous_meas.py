@@ -0,0 +1,59 @@
+import pytest
+from collections import namedtuple
+from click.testing import CliRunner
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.simulator import RotaryTableSimulator
+from vna_anritsu_MS20xxC_api.simulator import SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME
+from antenna_meas_cli import cli, continuous_meas
+
+FakeStatus = namedtuple("FakeStatus", ("current_angle", "is_rotating"))
+
+class FakeRotaryTable:
+    def __init__(self, angles):
+        self.angles = list(angles)
+        self.rotate_requests = []
+    def send_request(self, request):
+        if isinstance(request, rt_msg.RequestRotate):
+            self.rotate_requests.append(request.angle)
+            return None
+        angle = self.angles.pop(0)
+        return FakeStatus(angle, len(self.angles) > 0)
+
+class FakeVNA:
+    def start_single_sweep_await(self):
+        pass
+    def get_traces_data_as_s2p(self):
+        return "s2p"
+
+def test_angle_helpers():
+    assert continuous_meas.wrap_angle_delta(350, 10) == 20
+    assert continuous_meas.wrap_angle_delta(10, 350) == -20
+    assert continuous_meas.wrap_angle_delta(0, 180) == 180
+    assert continuous_meas.interpolate_angle(1, 0, 10, 2, 20) == 15
+    assert continuous_meas.interpolate_angle(1, 1, 10, 1, 20) == 10
+
+def test_continuous_measure():
+    rt = FakeRotaryTable([0, 40, 80, 120, 160, 200, 240, 280, 320, 0])
+    sweeps = list(continuous_meas.continuous_measure(rt, FakeVNA(), 1, 1))
+    assert len(sweeps) == 9
+    assert rt.rotate_requests == [90, 180, 270, 0]
+    for sweep in sweeps:
+        assert 0 <= sweep.angle < 360
+        assert 0 <= sweep.smear <= 40
+        assert sweep.s2p == "s2p"
+    assert sweeps[0].angle == pytest.approx(sweeps[0].angle_start + sweeps[0].smear/2)
+
+def test_meas_continuous_halts_on_failure(tmp_path, monkeypatch):
+    device = SimulatedVNA(points_num=11, latency=0)
+    monkeypatch.setattr(cli.pyvisa, "ResourceManager", lambda: SimulatedResourceManager(device))
+    def failing_measure(rt, vna, rt_id, rpm):
+        rt.send_request(rt_msg.RequestRotate(rt_id, 90, rpm))
+        raise IOError("no response")
+        yield
+    monkeypatch.setattr(continuous_meas, "continuous_measure", failing_measure)
+    with RotaryTableSimulator([1]) as sim:
+        result = CliRunner().invoke(cli.cli, ["meas-continuous", "--rt-port", sim.port_name, "--rt-id", "1",
+            "--vna-name", SIMULATED_RESOURCE_NAME, "--s2p-name", "ant", "--s2p-dir", str(tmp_path)])
+        assert result.exit_code == 0
+        assert "Measurement failed: no response" in result.output
+        assert not sim.head(1).is_rotating and not sim.head(1).is_enabled
@@ -0,0 +1,72 @@
+import json
+import socket
+import threading
+import time
+import pytest
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api.simulator import RotaryTableSimulator
+from vna_anritsu_MS20xxC_api.simulator import SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME
+from antenna_meas_cli import discovery
+
+def test_discover_devices():
+    device = SimulatedVNA(latency=0)
+    with RotaryTableSimulator(voltage=11.5) as sim:
+        devices = discovery.discover_devices(SimulatedResourceManager(device), ports=[sim.port_name, "socket://127.0.0.1:1"])
+    assert devices.instruments == {SIMULATED_RESOURCE_NAME: device.execute("*IDN?").decode()}
+    assert devices.controllers[sim.port_name] == pytest.approx(11.5, abs=0.1)
+    assert devices.controllers["socket://127.0.0.1:1"] is None
+    assert discovery.find_vna(devices) == SIMULATED_RESOURCE_NAME
+    assert discovery.find_controller(devices) == sim.port_name
+
+def test_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache" / "devices.json")
+    device = SimulatedVNA(latency=0)
+    rm = SimulatedResourceManager(device)
+    monkeypatch.setattr(discovery, "list_ports", lambda: [])
+    devices = discovery.cached_discover_devices(rm, path)
+    assert not devices.is_cached and discovery.find_vna(devices) == SIMULATED_RESOURCE_NAME
+    commands_count = device.commands_count
+    cached = discovery.cached_discover_devices(rm, path)
+    assert cached.is_cached and cached.instruments == devices.instruments
+    assert device.commands_count == commands_count
+
+    assert discovery.load_cache(path, 600, [SIMULATED_RESOURCE_NAME, "GPIB0::1::INSTR"], []) is None
+    assert discovery.load_cache(path, 600, [SIMULATED_RESOURCE_NAME], ["COM3"]) is None
+    with open(path) as file:
+        cache = json.load(file)
+    cache["time"] -= 601
+    with open(path, "w") as file:
+        json.dump(cache, file)
+    assert not discovery.cached_discover_devices(rm, path).is_cached
+    assert not discovery.cached_discover_devices(rm, path, refresh=True).is_cached
+
+def test_ping_controller():
+    with RotaryTableSimulator() as sim:
+        assert rt_api.ping_controller(sim.port_name).voltage == pytest.approx(12, abs=0.1)
+    start = time.monotonic()
+    statuses = rt_api.probe_com_ports(["socket://127.0.0.1:1", "loop://"], timeout=0.2)
+    assert list(statuses.values()) == [None, None]
+    assert time.monotonic() - start < 0.4
+
+def serve_garbage(server: socket.socket, garbage: bytes) -> None:
+    """Answer every request with garbage until the server is closed"""
+    while True:
+        try:
+            connection, _ = server.accept()
+        except OSError:
+            return
+        with connection:
+            while len(connection.recv(64)) > 0:
+                connection.sendall(garbage)
+
+@pytest.mark.parametrize("garbage", [bytes(range(9)), bytes([0xE0] + [0x5A]*8)])
+def test_ping_garbage(garbage):
+    server = socket.create_server(("127.0.0.1", 0))
+    threading.Thread(target=serve_garbage, args=(server, garbage), daemon=True).start()
+    port_name = "socket://127.0.0.1:{:d}".format(server.getsockname()[1])
+    try:
+        assert rt_api.ping_controller(port_name, timeout=0.2) is None
+        devices = discovery.discover_devices(SimulatedResourceManager(SimulatedVNA(latency=0)), ports=[port_name], serial_timeout=0.2)
+        assert devices.controllers == {port_name: None}
+    finally:
+        server.close()
@@ -0,0 +1,43 @@
+import time
+import numpy as np
+import skrf as rf
+from antenna_meas_cli import live_plot
+
+def test_frequency_indices():
+    freq = np.array([1E9, 2E9, 3E9, 4E9])
+    assert live_plot.frequency_indices(freq, [1.1E9, 3.9E9, 2.5E9]).tolist() == [0, 3, 1]
+
+def test_live_plot_process(monkeypatch):
+    monkeypatch.setenv("MPLBACKEND", "Agg")
+    network = rf.Network(f=[1, 2, 3], s=np.full((3, 2, 2), 0.1+0j), f_unit="GHz")
+    plot = live_plot.LivePlot([2E9], polar=True)
+    plot.start()
+    for angle in range(0, 360, 90):
+        plot.update(angle, network)
+    assert plot.indices.tolist() == [1]
+    plot.close()
+    assert plot.process.exitcode == 0
+    assert plot.dropped == 0
+
+def test_drop_oldest():
+    plot = live_plot.LivePlot([2E9], queue_size=2)
+    plot.put((0, [0]))
+    plot.put((90, [0]))
+    # Let queued items reach the pipe, so the oldest one can be taken
+    time.sleep(0.2)
+    plot.put((180, [0]))
+    assert plot.dropped == 1
+    plot.close()
+    assert plot.dropped == 2
+    assert plot.queue.get(timeout=1) == (180, [0])
+    assert plot.queue.get(timeout=1) is None
+
+def test_put_never_blocks():
+    plot = live_plot.LivePlot([2E9], queue_size=1)
+    start = time.monotonic()
+    for angle in range(0, 360, 10):
+        plot.put((angle, [0]))
+    assert time.monotonic() - start < live_plot.REFRESH_INTERVAL
+    assert plot.dropped == 35
+    plot.close()
+    assert plot.queue.get(timeout=1) is None
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from antenna_meas_cli import pattern_analysis
+
+def gaussian_beam(angles: np.ndarray, peak_angle: float, hpbw: float) -> np.ndarray:
+    distance = (angles - peak_angle + 180) % 360 - 180
+    return 10**(-12*(distance/hpbw)**2/20)
+
+def test_analyze_pattern():
+    angles = np.arange(0, 360, 1.0)
+    peaks = [90, 350, 0]
+    widths = [60, 40, 20]
+    s21 = np.column_stack([0.5*gaussian_beam(angles, peak, width) for peak, width in zip(peaks, widths)])
+    order = np.random.permutation(len(angles))
+    figures = pattern_analysis.analyze_pattern(angles[order], [1E9, 2E9, 3E9], s21[order])
+    assert figures.peak_angle.tolist() == peaks
+    assert figures.peak_db == pytest.approx(20*np.log10(0.5))
+    assert figures.hpbw == pytest.approx(widths, abs=0.1)
+    assert figures.front_to_back == pytest.approx([12*(180/width)**2 for width in widths])
+    assert figures.null_depth == pytest.approx([-12*(180/width)**2 for width in widths])
+    assert figures.null_angle.tolist() == [270, 170, 180]
+    assert pattern_analysis.figures_to_table(figures).shape == (3, 7)
+
+def test_omnidirectional_pattern():
+    angles = np.arange(0, 360, 10.0)
+    s21 = np.ones((len(angles), 2))
+    figures = pattern_analysis.analyze_pattern(angles, [1E9, 2E9], s21)
+    assert np.isnan(figures.hpbw).all()
+    assert figures.front_to_back.tolist() == [0, 0]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import skrf as rf
+from antenna_meas_cli.pattern_store import PatternStore, PatternStoreWriter
+
+def random_network(points: int) -> rf.Network:
+    s = np.random.rand(points, 2, 2) + 1j*np.random.rand(points, 2, 2)
+    return rf.Network(f=np.linspace(1, 2, points), s=s, f_unit="GHz")
+
+def test_write_and_read(tmp_path):
+    path = tmp_path / "pattern.rhp"
+    networks = [random_network(11) for _ in range(3)]
+    with PatternStoreWriter.from_network(str(path), networks[0], {"angle_step": 5}) as writer:
+        for i, network in enumerate(networks):
+            writer.append_network(5*i, network, timestamp=100+i)
+            assert len(PatternStore(str(path))) == i+1
+        with pytest.raises(ValueError):
+            writer.append_network(15, random_network(12))
+    store = PatternStore(str(path))
+    assert len(store) == 3
+    assert store.metadata == {"angle_step": 5}
+    assert store.angles.tolist() == [0, 5, 10]
+    assert store.timestamps.tolist() == [100, 101, 102]
+    assert np.allclose(store.freq, networks[0].f)
+    assert store.s.shape == (3, 11, 2, 2)
+    assert np.array_equal(store.sparam(1, 0)[2], networks[2].s[:, 1, 0])
+    angles, exported = zip(*store.networks())
+    assert angles == (0, 5, 10)
+    assert np.array_equal(exported[1].s, networks[1].s)
+    assert exported[1].comments == "angle=5.000000deg"
+
+def test_incomplete_record_and_extra_fields(tmp_path):
+    path = tmp_path / "pattern.rhp"
+    network = random_network(5)
+    with PatternStoreWriter.from_network(str(path), network, extra_fields=[("smear", "<f8")]) as writer:
+        writer.append_network(1, network, smear=0.5)
+    with open(path, "ab") as file:
+        file.write(b"\0" * 10)
+    store = PatternStore(str(path))
+    assert len(store) == 1
+    assert store.records["smear"][0] == 0.5
+    assert store.extra_fields == [("smear", "<f8", ())]
+    path.write_bytes(b"not a pattern store")
+    with pytest.raises(ValueError):
+        PatternStore(str(path))
+
+def test_append_many(tmp_path):
+    path = tmp_path / "pattern.rhp"
+    s = np.random.rand(4, 5, 2, 2) + 0j
+    with PatternStoreWriter(str(path), np.linspace(1E9, 2E9, 5)) as writer:
+        writer.append_many([0, 90, 180, 270], s, [1, 2, 3, 4])
+    store = PatternStore(str(path))
+    assert store.angles.tolist() == [0, 90, 180, 270]
+    assert np.array_equal(store.s, s)
+
+def test_reopen(tmp_path):
+    path = tmp_path / "pattern.rhp"
+    network = random_network(5)
+    with PatternStoreWriter.from_network(str(path), network, {"angle_step": 5}) as writer:
+        for angle in (0, 5, 10):
+            writer.append_network(angle, network)
+    with open(path, "ab") as file:
+        file.write(b"\0" * 10)
+    with PatternStoreWriter.reopen(str(path), count=2) as writer:
+        assert writer.count == 2 and writer.metadata == {"angle_step": 5}
+        writer.append_network(7.5, network)
+    store = PatternStore(str(path))
+    assert store.angles.tolist() == [0, 5, 7.5]
+    assert store.metadata == {"angle_step": 5}
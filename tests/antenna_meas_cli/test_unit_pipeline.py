@@ -0,0 +1,82 @@
+import pytest
+import threading
+import time
+from antenna_meas_cli.pipeline import MeasurementPipeline
+from antenna_meas_cli.scan_planner import move_along
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.simulator import RotaryTableSimulator
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.simulator import SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME
+
+def test_pipeline_order_and_stats():
+    events = []
+    lock = threading.Lock()
+    def log(event):
+        with lock:
+            events.append(event)
+    def move(angle):
+        log(("move", angle))
+    def sweep():
+        log(("sweep",))
+        time.sleep(0.01)
+    def transfer():
+        log(("transfer",))
+        time.sleep(0.02)
+        return "data"
+    results = []
+    pipeline = MeasurementPipeline(move, sweep, transfer)
+    pipeline.run([0, 10, 20], lambda angle, data: results.append((angle, data)))
+    assert results == [(0, "data"), (10, "data"), (20, "data")]
+    assert [event[0] for event in events].count("sweep") == 3
+    sweeps = [i for i, event in enumerate(events) if event[0] == "sweep"]
+    transfers = [i for i, event in enumerate(events) if event[0] == "transfer"]
+    for i in range(1, 3):
+        assert transfers[i-1] < sweeps[i]
+    for name in ("motion", "sweep", "transfer", "persist"):
+        assert pipeline.stats[name].items == 3
+    assert pipeline.utilization()["transfer"] > 0
+    assert pipeline.bottleneck() == "transfer"
+
+def test_pipeline_error():
+    def move(angle):
+        if angle == 10:
+            raise IOError("no response")
+    pipeline = MeasurementPipeline(move, lambda: None, lambda: None)
+    results = []
+    with pytest.raises(IOError):
+        pipeline.run([0, 10, 20], lambda angle, data: results.append(angle))
+    assert 20 not in results
+
+def test_pipeline_with_simulators():
+    with RotaryTableSimulator([1], acceleration=600) as rt_sim:
+        device = SimulatedVNA(points_num=51, sweep_time=0.05, angle_source=lambda: rt_sim.head(1).angle)
+        vna = vna_api.VNA(SimulatedResourceManager(device), SIMULATED_RESOURCE_NAME)
+        vna.set_traces_as_s2p()
+        vna.set_is_sweep_continuous(False)
+        rt = rt_api.RotaryTable(rt_sim.port_name)
+        def move(angle):
+            rt.send_request(rt_msg.RequestRotate(1, angle, 30))
+            rt.wait_until_stopped(1, 30, timeout=5)
+        results = {}
+        pipeline = MeasurementPipeline(move, vna.start_single_sweep_await, vna.get_traces_data_as_s2p)
+        pipeline.run([0, 20, 40], lambda angle, s2p: results.setdefault(angle, s2p))
+        rt.close()
+    assert list(results) == [0, 20, 40]
+    assert abs(results[0].s[0, 1, 0]) > abs(results[40].s[0, 1, 0])
+    assert device.sweeps_count == 3
+
+def test_pipeline_interrupt_halts_moving_table():
+    with RotaryTableSimulator([1], acceleration=600) as rt_sim:
+        rt = rt_api.RotaryTable(rt_sim.port_name)
+        def move(angle):
+            move_along(rt, 1, rt.send_request(rt_msg.RequestGetStatus(1)).current_angle, angle, 5, stop=pipeline.stop)
+        def persist(angle, data):
+            raise KeyboardInterrupt()
+        pipeline = MeasurementPipeline(move, lambda: None, lambda: None, halt=lambda: rt.send_request(rt_msg.RequestHalt(1)))
+        start = time.monotonic()
+        with pytest.raises(KeyboardInterrupt):
+            pipeline.run([1, 300], persist)
+        assert time.monotonic() - start < 1
+        assert not rt.send_request(rt_msg.RequestGetStatus(1)).is_rotating
+        rt.close()
@@ -0,0 +1,49 @@
+import json
+import pytest
+from antenna_meas_cli.pipeline import MeasurementPipeline
+from antenna_meas_cli.profiling import Tracer, TracedResource, optional_span, trace_vna
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.simulator import SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME
+
+def test_spans_and_summary(tmp_path):
+    tracer = Tracer()
+    with tracer.span("outer", "test", angle=5) as span:
+        span["bytes_in"] = 10
+        with tracer.span("inner"):
+            pass
+    with pytest.raises(ValueError):
+        with tracer.span("inner"):
+            raise ValueError()
+    summary = tracer.summary()
+    assert summary["outer"]["count"] == 1 and summary["outer"]["bytes"] == 10
+    assert summary["inner"]["count"] == 2
+    assert tracer.events[-1]["args"]["error"] == "ValueError"
+    with optional_span(None, "disabled"):
+        pass
+    assert "disabled" not in tracer.summary()
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert {event["ph"] for event in events} == {"M", "X"}
+    assert "outer" in tracer.format_summary()
+
+def test_traced_vna_and_pipeline():
+    device = SimulatedVNA(points_num=11, sweep_time=0.01, latency=0, transfer_rate=1E9)
+    vna = vna_api.VNA(SimulatedResourceManager(device), SIMULATED_RESOURCE_NAME)
+    vna.set_traces_as_s2p()
+    vna.set_is_sweep_continuous(False)
+    tracer = Tracer()
+    trace_vna(vna, tracer)
+    trace_vna(vna, tracer)
+    assert isinstance(vna.inst, TracedResource) and not isinstance(vna.inst._resource, TracedResource)
+    vna.inst.timeout = 1234
+    assert device is vna.inst.device and vna.inst.timeout == 1234
+    pipeline = MeasurementPipeline(lambda angle: None, vna.start_single_sweep_await, vna.get_traces_data_as_s2p, tracer=tracer)
+    pipeline.run([0, 10], lambda angle, s2p: None)
+    summary = tracer.summary()
+    for name in ("motion", "sweep", "transfer", "persist", "vna.sweep", "vna.get_traces_data"):
+        assert summary[name]["count"] == 2
+    assert summary["visa.read_bytes"]["bytes"] > 2*4*11*8
+    angles = sorted(event["args"]["angle"] for event in tracer.events if event["name"] == "sweep")
+    assert angles == [0, 10]
+    assert len(tracer.thread_names) >= 3
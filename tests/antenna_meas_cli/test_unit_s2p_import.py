@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+import skrf as rf
+from antenna_meas_cli import s2p_import
+from antenna_meas_cli.cli import filename_from_angle_n_s2pname
+from antenna_meas_cli.pattern_store import PatternStore
+
+def test_angle_recovery():
+    assert s2p_import.angle_from_s2p_filename("test_0deg.s2p") == 0
+    assert s2p_import.angle_from_s2p_filename("dir/test_12#5deg.s2p") == 12.5
+    assert s2p_import.angle_from_s2p_filename("my_ant_2_355deg.S2P") == 355
+    assert s2p_import.angle_from_s2p_filename("test.s2p") is None
+    assert s2p_import.name_from_s2p_filename("my_ant_2_355deg.s2p") == "my_ant_2"
+    assert s2p_import.angle_from_s2p_comment("angle=12.125000deg") == 12.125
+    assert s2p_import.angle_from_s2p_comment("") is None
+    for angle, step in ((0, 5), (12.5, 2.5), (7.125, None)):
+        filename = filename_from_angle_n_s2pname("test", angle, step) + ".s2p"
+        assert s2p_import.angle_from_s2p_filename(filename) == angle
+
+def test_import_directory(tmp_path):
+    freq = rf.Frequency(1, 2, 11, "ghz")
+    networks = {}
+    for angle in (10, 0, 2.5):
+        network = rf.Network(frequency=freq, s=np.random.rand(11, 2, 2) + 1j*np.random.rand(11, 2, 2))
+        network.comments = f"angle={angle:f}deg"
+        network.write_touchstone(filename_from_angle_n_s2pname("ant", angle, 2.5), str(tmp_path), skrf_comment=False)
+        networks[angle] = network
+    (tmp_path / "other.txt").write_text("")
+    store_path = str(tmp_path / "ant.rhp")
+    assert s2p_import.import_s2p_directory(str(tmp_path), store_path, workers=2) == 3
+    store = PatternStore(store_path)
+    assert store.angles.tolist() == [0, 2.5, 10]
+    assert store.metadata["name"] == "ant"
+    assert np.allclose(store.s[2], networks[10].s)
+    assert np.allclose(store.freq, freq.f)
+
+    network = rf.Network(frequency=freq, s=np.zeros((11, 2, 2)))
+    network.write_touchstone("other_5deg", str(tmp_path))
+    with pytest.raises(ValueError):
+        s2p_import.import_s2p_directory(str(tmp_path), store_path, workers=1)
+    assert s2p_import.import_s2p_directory(str(tmp_path), store_path, name="other", workers=1) == 1
@@ -0,0 +1,69 @@
+import pytest
+from click.testing import CliRunner
+from antenna_meas_cli import cli
+from antenna_meas_cli.scan_journal import ScanJournal, journal_path_for
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / "scan.journal")
+    journal = ScanJournal.create(path, {"angle_step": 5}, {"rt_id": 1}, {"points_num": 201})
+    journal.record_angle(0, 0.0)
+    journal.record_angle(5, 5.0078125)
+    journal.close()
+    with open(path, "a") as file:
+        file.write('{"type": "angle", "ang')
+    with open(path) as file:
+        content = file.read()
+    journal = ScanJournal.load(path, writable=False)
+    assert journal.completed_angles == [0, 5] and not journal.is_complete
+    with pytest.raises(IOError):
+        journal.record_angle(10, 10.0)
+    journal.close()
+    with open(path) as file:
+        assert file.read() == content
+    journal = ScanJournal.load(path)
+    assert journal.settings == {"angle_step": 5} and journal.home == {"rt_id": 1}
+    assert journal.instrument == {"points_num": 201}
+    assert journal.completed_angles == [0, 5] and journal.last_table_angle == 5.0078125
+    assert not journal.is_complete
+    journal.record_angle(10, 10.0)
+    journal.complete()
+    journal.close()
+    journal = ScanJournal.load(path)
+    assert journal.completed_angles == [0, 5, 10] and journal.is_complete
+    journal.close()
+
+def test_corrupted_journal(tmp_path):
+    path = tmp_path / "scan.journal"
+    path.write_text('{"type": "angle", "angle": 0}\n')
+    with pytest.raises(ValueError):
+        ScanJournal.load(str(path))
+    path.write_text('{"type": "start", "version": 1, "settings": {}}\n{"type": "ang\n{"type": "complete"}\n')
+    with pytest.raises(ValueError):
+        ScanJournal.load(str(path))
+
+def test_journal_path():
+    assert journal_path_for("scan.rhp") == "scan.rhp.journal"
+    assert journal_path_for(None, "scan", "out").replace("\\", "/") == "out/scan.journal"
+
+def test_position_record(tmp_path):
+    path = str(tmp_path / "scan.journal")
+    journal = ScanJournal.create(path, {}, {}, {})
+    assert journal.last_table_angle is None
+    journal.record_angle(0, 0.0)
+    journal.record_position(3.5)
+    journal.close()
+    journal = ScanJournal.load(path)
+    assert journal.completed_angles == [0] and journal.last_table_angle == 3.5
+    journal.close()
+
+def test_resume_without_store(tmp_path):
+    store = str(tmp_path / "scan.rhp")
+    settings = {"rt_id": 1, "angle_step": 5, "adaptive_budget": None, "adaptive_tol": None, "store": store, "s2p_name": None,
+        "s2p_dir": None, "sweeps_per_angle": 1, "speed": 5, "scan_order": "auto", "allow_wrap": False}
+    journal = ScanJournal.create(journal_path_for(store), settings, {"rt_id": 1}, {})
+    journal.record_angle(0, 0.0)
+    journal.close()
+    result = CliRunner().invoke(cli.cli, ["meas", "--rt-id", "1", "--store", store, "--resume"])
+    assert result.exit_code == 2 and "doesn't exist" in result.output
+    result = CliRunner().invoke(cli.cli, ["meas", "--rt-id", "1", "--store", store, "--speed", "2", "--resume"])
+    assert result.exit_code == 2 and "speed" in result.output
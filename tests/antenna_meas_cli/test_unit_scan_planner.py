@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+import pytest
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.simulator import RotaryTableSimulator
+from antenna_meas_cli.scan_planner import (leg_delta, path_waypoints, move_time, estimate_motion_time, order_interleaved,
+    plan_scan, move_along, start_position)
+
+def test_leg_delta():
+    assert leg_delta(330, 0) == -330
+    assert leg_delta(330, 0, allow_wrap=True) == 30
+    # Readback slightly below home isn't almost a full turn, but planned angles near 360deg are
+    assert leg_delta(start_position(359.9), 30) == pytest.approx(30.1)
+    assert leg_delta(359.9, 30) == pytest.approx(-329.9)
+    assert leg_delta(359.0, 359.5) == pytest.approx(0.5)
+    assert start_position(-0.2) == pytest.approx(-0.2) and start_position(200) == 200
+
+def test_path_waypoints():
+    assert path_waypoints(10, 50) == [50]
+    waypoints = path_waypoints(300, 0)
+    assert waypoints[-1] == 0 and len(waypoints) == 4
+    assert all(later < earlier for earlier, later in zip(waypoints[:-1], waypoints[1:]))
+    assert path_waypoints(300, 0, allow_wrap=True) == [0]
+
+def test_move_time():
+    # 10 rpm is 60deg/s, reached after 10deg with 60 rpm/s acceleration
+    assert move_time(70, 10, 60) == pytest.approx(70/60 + 1/6)
+    assert move_time(5, 10, 60) == pytest.approx(2*np.sqrt(5/360))
+
+def test_orders():
+    angles = np.arange(0, 360, 60)
+    np.testing.assert_array_equal(order_interleaved(angles), [0, 120, 240, 300, 180, 60])
+    sequential = estimate_motion_time(angles, 10)
+    assert sequential == pytest.approx(5*move_time(60, 10) + move_time(300, 10))
+    assert estimate_motion_time(angles, 10, allow_wrap=True) == pytest.approx(6*move_time(60, 10))
+
+def test_plan_scan():
+    angles = np.arange(0, 360, 30)
+    plans = {order: plan_scan(angles, 10, order) for order in ("sequential", "reversed", "interleaved")}
+    assert plan_scan(angles, 10).motion_time == min(plan.motion_time for plan in plans.values())
+    # Starting near the end of the turn favours going back
+    assert plan_scan(angles, 10, start=340).order == "reversed"
+    with pytest.raises(ValueError):
+        plan_scan(angles, 10, "random")
+
+def test_move_along_keeps_direction():
+    with RotaryTableSimulator(acceleration=600) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        try:
+            rt.send_request(rt_msg.RequestRotate(0, 10, 30))
+            rt.wait_until_stopped(0, 30)
+            angles = []
+            done = threading.Event()
+            def sample():
+                while not done.is_set():
+                    angles.append(sim.head(0).angle)
+                    done.wait(0.005)
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            try:
+                # Shorter path goes back through 0, the scan must stay within 10-300deg
+                status = move_along(rt, 0, 10, 300, 30)
+            finally:
+                done.set()
+                sampler.join()
+            assert status.current_angle == pytest.approx(300, abs=rt_msg.ANGLE_PRECISION)
+            assert min(angles) > 9 and max(angles) < 301
+        finally:
+            rt.close()
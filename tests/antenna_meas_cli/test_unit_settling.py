@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.simulator import RotaryTableSimulator
+from antenna_meas_cli.settling import SettleDetector, SettleTimeEstimator, relative_variance
+
+def test_estimator():
+    estimator = SettleTimeEstimator(history_weight=0.5)
+    assert not estimator.has_history("a") and estimator.estimate("a") == 0
+    estimator.record("a", 0.2)
+    estimator.record("a", 0.4)
+    assert estimator.estimate("a") == pytest.approx(0.3)
+
+def test_relative_variance():
+    stable = [np.array([1+1j, 2]), np.array([1+1j, 2]), np.array([1+1j, 2])]
+    assert relative_variance(stable) == 0
+    assert relative_variance(stable[:2] + [np.array([1+1j, 2.2])]) > 1E-3
+
+def test_settle_on_ringing_table():
+    with RotaryTableSimulator([1], acceleration=600, ringing_amplitude=1) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        try:
+            settle = SettleDetector(rt, 1, max_settle_time=2, poll_interval=0.01)
+            settle_times = []
+            for angle in (10, 20, 30):
+                rt.send_request(rt_msg.RequestRotate(1, angle, 20))
+                rt.wait_until_stopped(1, 20)
+                settle_times.append(settle.wait(10, 20))
+                assert sim.head(1).reported_angle == pytest.approx(angle, abs=rt_msg.ANGLE_PRECISION)
+            assert settle.timeouts == 0
+            assert all(0.1 < settle_time < 1.5 for settle_time in settle_times)
+            assert settle.estimator.has_history(settle.setup_key(10, 20))
+
+            quiet = SettleDetector(rt, 1, max_settle_time=2, poll_interval=0.01)
+            sim.head(1).ringing_amplitude = 0
+            rt.send_request(rt_msg.RequestRotate(1, 40, 20))
+            rt.wait_until_stopped(1, 20)
+            assert quiet.wait(10, 20) < 0.2
+        finally:
+            rt.close()
+
+def test_settle_keeps_estimate_on_still_table():
+    with RotaryTableSimulator([1], acceleration=600, ringing_amplitude=0) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        try:
+            settle = SettleDetector(rt, 1, max_settle_time=1, poll_interval=0.01)
+            key = settle.setup_key(10, 20)
+            settle.estimator.record(key, 0.3)
+            for _ in range(3):
+                settle.wait(10, 20)
+            assert settle.estimator.estimate(key) == pytest.approx(0.3)
+        finally:
+            rt.close()
+
+def test_settle_signal_probe():
+    values = iter([1.0, 1.5, 1.2, 1.0, 1.0, 1.0, 1.0])
+    settle = SettleDetector(None, 1, max_settle_time=1, vna_probe=lambda: np.array([next(values)]), variance_threshold=1E-6)
+    settle.wait_signal()
+    assert next(values) == 1.0
+    assert SettleDetector(None, 1).wait_signal() == 0
@@ -0,0 +1,88 @@
+import os
+import time
+import numpy as np
+import pytest
+from click.testing import CliRunner
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api.bus_scheduler import BusScheduler
+from rotary_table_api.simulator import RotaryTableSimulator
+from antenna_meas_cli.cli import cli
+from antenna_meas_cli.pattern_store import PatternStore, PatternStoreWriter
+from antenna_meas_cli.scan_planner import move_time
+from antenna_meas_cli.sphere_scan import (SPHERE_FIELDS, SpherePoint, AXIS_PHI, AXIS_THETA, grid_trajectory, spiral_trajectory,
+    estimate_trajectory_time, plan_sphere_scan, move_heads, sphere_grid)
+
+def test_grid_trajectory():
+    points = grid_trajectory(90, 120, slow_axis=AXIS_THETA)
+    assert points[:6] == [(0, 0), (0, 120), (0, 240), (90, 240), (90, 120), (90, 0)]
+    assert len(points) == 9 and points[-1] == (180, 240)
+    by_phi = grid_trajectory(90, 120, slow_axis=AXIS_PHI)
+    assert by_phi[:4] == [(0, 0), (90, 0), (180, 0), (180, 120)]
+    assert sorted(points) == sorted(by_phi)
+
+def test_spiral_trajectory():
+    points = spiral_trajectory(10, 10)
+    thetas = np.array([point.theta for point in points])
+    assert thetas[0] == 0 and thetas[-1] == 180 and np.all(np.diff(thetas) >= 0)
+    # Poles are sampled much less densely than a 10deg grid
+    assert len(points) < 0.7 * len(grid_trajectory(10, 10))
+    assert all(0 <= point.phi < 360 for point in points)
+
+def test_plan_steps_slow_axis_rarely():
+    assert estimate_trajectory_time([SpherePoint(0, 90)], 10, 1) == pytest.approx(2*move_time(90, 10))
+    plan = plan_sphere_scan(30, 30, phi_rpm=10, theta_rpm=1)
+    assert plan.slow_axis == AXIS_THETA
+    assert plan_sphere_scan(30, 30, phi_rpm=1, theta_rpm=10).slow_axis == AXIS_PHI
+    with pytest.raises(ValueError):
+        plan_sphere_scan(30, 30, 1, 1, trajectory="random")
+
+def test_move_heads_in_parallel():
+    with RotaryTableSimulator([1, 2], acceleration=600) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        try:
+            scheduler = BusScheduler(rt, (1, 2), poll_rate=200, use_broadcast=False)
+            start = time.monotonic()
+            statuses = move_heads(scheduler, {1: (0, 90), 2: (0, 60)}, {1: 10, 2: 10})
+            elapsed = time.monotonic() - start
+            assert statuses[1].current_angle == pytest.approx(90, abs=0.1)
+            assert statuses[2].current_angle == pytest.approx(60, abs=0.1)
+            assert elapsed < move_time(90, 10, 600) + move_time(60, 10, 600)
+            # Long move back keeps the direction instead of crossing 0
+            move_heads(scheduler, {1: (90, 300), 2: (60, 60)}, {1: 30, 2: 30})
+            assert sim.head(1).angle == pytest.approx(300, abs=0.1)
+        finally:
+            rt.close()
+
+def test_sphere_grid(tmp_path):
+    path = str(tmp_path / "sphere.pst")
+    freq = np.array([1E9, 2E9])
+    points = grid_trajectory(90, 180, theta_max=90)
+    with PatternStoreWriter(path, freq, {"scan": "sphere"}, SPHERE_FIELDS) as writer:
+        for i, point in enumerate(points[:-1]):
+            s = np.full((2, 2, 2), i, dtype=complex)
+            writer.append(point.phi, s, theta=point.theta, phi=point.phi)
+    thetas, phis, cube = sphere_grid(PatternStore(path))
+    np.testing.assert_array_equal(thetas, [0, 90])
+    np.testing.assert_array_equal(phis, [0, 180])
+    assert cube.shape == (2, 2, 2)
+    assert cube[0, 1, 0] == 1 and np.isnan(cube[1, 0, 0])
+
+def test_sphere_store_commands(tmp_path):
+    path = str(tmp_path / "sphere.pst")
+    freq = np.linspace(1E9, 2E9, 11)
+    points = grid_trajectory(90, 180, theta_max=90)
+    with PatternStoreWriter(path, freq, {"scan": "sphere", "theta_step": 90, "phi_step": 180}, SPHERE_FIELDS) as writer:
+        for point in points:
+            writer.append(point.phi, np.ones((len(freq), 2, 2)), theta=point.theta, phi=point.phi)
+    runner = CliRunner()
+    os.mkdir(tmp_path / "s2p")
+    result = runner.invoke(cli, ["export-s2p", path, "--s2p-name", "ant", "--s2p-dir", str(tmp_path / "s2p")])
+    assert result.exit_code == 0
+    assert len(os.listdir(tmp_path / "s2p")) == len(points)
+    assert os.path.exists(tmp_path / "s2p" / "ant_theta_90deg_phi_180deg.s2p")
+    gated_path = str(tmp_path / "gated.pst")
+    result = runner.invoke(cli, ["gate", path, gated_path, "--center", "0", "--span", "2"])
+    assert result.exit_code == 0
+    np.testing.assert_array_equal(sphere_grid(PatternStore(gated_path))[0], [0, 90])
+    result = runner.invoke(cli, ["analyze", path])
+    assert result.exit_code != 0 and "sphere scan" in result.output
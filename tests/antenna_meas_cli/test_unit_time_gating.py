@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from antenna_meas_cli import time_gating
+
+def two_path_response(freq: np.ndarray, amplitudes: np.ndarray) -> np.ndarray:
+    direct = np.exp(-2j*np.pi*freq*10E-9)
+    reflected = 0.5*np.exp(-2j*np.pi*freq*40E-9)
+    return amplitudes[:, None]*(direct + reflected)[None, :], amplitudes[:, None]*direct[None, :]
+
+def test_windows():
+    assert time_gating.make_window("rect", 3).tolist() == [1, 1, 1]
+    assert np.allclose(time_gating.make_window("kaiser", 11), np.kaiser(11, 6))
+    assert np.allclose(time_gating.make_window("kaiser2.5", 11), np.kaiser(11, 2.5))
+    with pytest.raises(ValueError):
+        time_gating.make_window("unknown", 3)
+
+def test_time_domain_peak():
+    freq = np.linspace(1E9, 3E9, 401)
+    s, _ = two_path_response(freq, np.array([1.0]))
+    td = np.abs(time_gating.time_domain(s, freq))
+    t = time_gating.time_axis(freq)
+    assert t[td[0].argmax()] == pytest.approx(10E-9, abs=1E-9)
+    with pytest.raises(ValueError):
+        time_gating.time_domain(s, np.geomspace(1E9, 3E9, 401))
+
+def test_time_gate_all_angles():
+    freq = np.linspace(1E9, 3E9, 401)
+    amplitudes = np.array([1.0, 0.5, 0.1])
+    s, expected = two_path_response(freq, amplitudes)
+    gated = time_gating.time_gate(s, freq, center=10E-9, span=20E-9)
+    middle = slice(100, 300)
+    assert gated.shape == s.shape
+    assert np.abs(gated[:, middle] - expected[:, middle]).max() < 0.01
+    assert np.abs(s[:, middle] - expected[:, middle]).max() > 0.04
+
+    removed = time_gating.time_gate(s, freq, center=40E-9, span=20E-9, mode=time_gating.GateMode.BANDSTOP)
+    assert np.abs(removed[:, middle] - expected[:, middle]).max() < 0.01
+
+    cube = np.stack([s, s], axis=-1)
+    assert np.allclose(time_gating.time_gate(cube, freq, 10E-9, 20E-9)[..., 1], gated)
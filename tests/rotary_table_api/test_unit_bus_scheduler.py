@@ -0,0 +1,80 @@
+import time
+import pytest
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.bus_scheduler import BusScheduler
+from rotary_table_api.rotary_table_api import BROADCAST_ADDRESS, RotaryTable
+from rotary_table_api.simulator import RotaryTableSimulator
+
+def motor_status(address: int, current_angle: float, is_rotating: bool):
+    status = rt_msg.IS_ROTATING_MASK if is_rotating else 0
+    data = rt_msg.PREAMBLE + bytes([address << rt_msg.ADDRESS_LENGTH | 0xF, status])
+    data += rt_msg.angle_to_bytes(current_angle) + rt_msg.angle_to_bytes(current_angle) + rt_msg.rpm_to_bytes(0)
+    return rt_msg.parse_response(data + b"\0")
+
+class FakeRotaryTable:
+    def __init__(self, rotating_polls=0):
+        self.requests = []
+        self.rotating_polls = rotating_polls
+    def send_request(self, request):
+        self.requests.append(request)
+        if isinstance(request, rt_msg.RequestGetStatus):
+            if request.address == 3:
+                raise IOError("no response")
+            is_rotating = self.rotating_polls > 0
+            self.rotating_polls -= 1
+            return motor_status(request.address, 10, is_rotating)
+
+def test_broadcast_commands():
+    rt = FakeRotaryTable()
+    scheduler = BusScheduler(rt, [1, 2], poll_rate=1000)
+    scheduler.rotate_all(90, 5)
+    scheduler.halt_all()
+    assert [(type(req), req.address) for req in rt.requests] == [(rt_msg.RequestRotate, BROADCAST_ADDRESS), (rt_msg.RequestHalt, BROADCAST_ADDRESS)]
+    rt.requests.clear()
+    scheduler.rotate({1: 90, 2: 45}, 5)
+    assert [req.address for req in rt.requests] == [1, 2]
+    rt.requests.clear()
+    scheduler.use_broadcast = False
+    scheduler.halt_all()
+    assert [req.address for req in rt.requests] == [1, 2]
+    with pytest.raises(ValueError):
+        BusScheduler(rt, [1, BROADCAST_ADDRESS])
+
+def test_status_table():
+    rt = FakeRotaryTable(rotating_polls=3)
+    scheduler = BusScheduler(rt, [1, 2, 3], poll_rate=1000)
+    assert scheduler.poll_next() == 1
+    table = scheduler.refresh()
+    assert table[1].current_angle == 10
+    assert table[3] is None
+    assert scheduler.errors[3] == 1
+    assert "addr" in scheduler.format_status_table()
+
+def test_wait_until_all_stopped():
+    rt = FakeRotaryTable(rotating_polls=4)
+    scheduler = BusScheduler(rt, [1, 2], poll_rate=1000)
+    table = scheduler.wait_until_all_stopped(timeout=1)
+    assert not any(status.is_rotating for status in table.values())
+
+def test_wait_fails_on_missing_head():
+    rt = FakeRotaryTable()
+    scheduler = BusScheduler(rt, [1, 3], poll_rate=1000)
+    start = time.monotonic()
+    with pytest.raises(IOError, match="address 3"):
+        scheduler.wait_until_all_stopped(timeout=10)
+    assert time.monotonic() - start < 1
+    assert scheduler.missed_polls[3] == scheduler.max_missed_polls
+
+def test_broadcast_doesnt_wait_for_response():
+    with RotaryTableSimulator([1, 2]) as sim:
+        rt = RotaryTable(sim.port_name)
+        try:
+            scheduler = BusScheduler(rt, [1, 2], poll_rate=1000)
+            start = time.monotonic()
+            scheduler.halt_all()
+            assert time.monotonic() - start < 0.2
+            scheduler.rotate_all(20, 10)
+            statuses = scheduler.wait_until_all_stopped(10)
+            assert all(status.current_angle == pytest.approx(20, abs=0.1) for status in statuses.values())
+        finally:
+            rt.close()
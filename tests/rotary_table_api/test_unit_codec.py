@@ -0,0 +1,55 @@
+import numpy as np
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api import rotary_table_codec as rt_codec
+
+def frame(payload: bytes) -> bytes:
+    data = rt_msg.PREAMBLE + payload
+    return data + bytes([rt_msg.calc_crc8(data)])
+
+def test_crc8():
+    assert rt_msg.calc_crc8(b"") == 0
+    assert rt_msg.calc_crc8(b"\x5D\x20\0\0\0") == 0xC0
+    assert rt_msg.RequestGetStatus(0x2).get_CRC() == b"\xC0"
+
+def test_cached_frames():
+    first = rt_msg.RequestGetStatus(0x4).to_bytes()
+    assert rt_msg.RequestGetStatus(0x4).to_bytes() is first
+    assert rt_msg.RequestGetStatus(0x4).encode() == first
+    assert rt_msg.RequestHalt(0x4).to_bytes() != first
+    # Requests with parameters aren't cached unless they opt in
+    class RequestCustom(rt_msg.Request):
+        __slots__ = ("body",)
+        def __init__(self, address: int, body: bytes):
+            super().__init__(address)
+            self.body = body
+        def get_command(self) -> int:
+            return 7
+        def get_body(self) -> bytes:
+            return self.body
+    assert RequestCustom(0x4, b"\1\2\3").to_bytes() != RequestCustom(0x4, b"\4\5\6").to_bytes()
+    assert not hasattr(rt_msg.RequestGetStatus(0x4), "__dict__")
+    assert not hasattr(rt_msg.parse_response(frame(bytes(7))), "__dict__")
+
+def test_parse_responses():
+    motor = frame(b"\xAF\xF5\x91\xD0\x29\xA0\xD1")
+    converter = frame(b"\xCE\x01\x72\xDE\xAD\xBE\xEF")
+    stream = b"\x00\x5D" + motor + motor[:4] + converter + b"\x5D\x5D" + motor
+    result = rt_codec.parse_responses(stream)
+    assert result["offset"].tolist() == [2, 15, 26]
+    assert result["address"].tolist() == [0xA, 0xC, 0xA]
+    assert result["response_header"].tolist() == [0xF, 0xE, 0xF]
+    expected = rt_msg.parse_response(motor)
+    motor_rows = result[result["response_header"] == 0xF]
+    assert np.all(motor_rows["current_angle"] == expected.current_angle)
+    assert np.all(motor_rows["target_angle"] == expected.target_angle)
+    assert np.all(motor_rows["rpm"] == expected.rpm)
+    assert np.all(motor_rows["is_enabled"] == expected.is_enabled)
+    assert np.all(motor_rows["is_rotating"] == expected.is_rotating)
+    assert len(rt_codec.parse_responses(b"")) == 0
+    assert len(rt_codec.parse_responses(motor[:-1] + b"\x00")) == 0
+
+def test_overlapping_frames():
+    inner = frame(b"\x10\x00\x00\x00\x00\x00\x00")
+    outer = frame(b"\x20" + inner[:6])
+    offsets = rt_codec.find_frames(outer + inner[6:])
+    assert offsets.tolist() == [0]
@@ -0,0 +1,47 @@
+import pytest
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+
+def motor_status(current_angle: float, target_angle: float, rpm: float, is_rotating: bool = True, address: int = 1):
+    status = rt_msg.IS_MOTOR_OK_MASK | rt_msg.IS_ENABLED_MASK
+    if is_rotating:
+        status |= rt_msg.IS_ROTATING_MASK
+    data = rt_msg.PREAMBLE + bytes([address << rt_msg.ADDRESS_LENGTH | 0xF, status])
+    data += rt_msg.angle_to_bytes(current_angle) + rt_msg.angle_to_bytes(target_angle) + rt_msg.rpm_to_bytes(rpm)
+    return rt_msg.parse_response(data + b"\0")
+
+class FakeRotaryTable(rt_api.RotaryTable):
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = 0
+    def send_request(self, request):
+        self.requests += 1
+        if len(self.statuses) > 1:
+            return self.statuses.pop(0)
+        return self.statuses[0]
+    def close(self):
+        pass
+
+def test_predict_rotation_time():
+    assert rt_api.predict_rotation_time(motor_status(0, 90, 5, is_rotating=False)) == 0
+    assert rt_api.predict_rotation_time(motor_status(0, 30, 5)) == pytest.approx(1)
+    assert rt_api.predict_rotation_time(motor_status(350, 20, 5)) == pytest.approx(1)
+    assert rt_api.predict_rotation_time(motor_status(20, 350, -5)) == pytest.approx(1)
+    assert rt_api.predict_rotation_time(motor_status(0, 30, 1), rpm=5) == pytest.approx(1)
+    assert rt_api.predict_rotation_time(motor_status(0, 30, 0)) == 0
+
+def test_wait_until_stopped():
+    rt = FakeRotaryTable([motor_status(0, 1, 10), motor_status(0.5, 1, 10), motor_status(1, 1, 0, is_rotating=False)])
+    status = rt.wait_until_stopped(1, poll_interval=0.001)
+    assert not status.is_rotating
+    assert rt.requests == 3
+
+def test_wait_until_stopped_stall():
+    rt = FakeRotaryTable([motor_status(10, 20, 10)])
+    with pytest.raises(IOError):
+        rt.wait_until_stopped(1, stall_timeout=0.05, poll_interval=0.001)
+
+def test_wait_until_stopped_timeout():
+    rt = FakeRotaryTable([motor_status(10, 20, 10), motor_status(11, 20, 10), motor_status(12, 20, 10), motor_status(13, 20, 10)])
+    with pytest.raises(TimeoutError):
+        rt.wait_until_stopped(1, timeout=0, guard_time=10, poll_interval=0.001)
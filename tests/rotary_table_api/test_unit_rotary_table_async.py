@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from rotary_table_api import rotary_table_async as rt_async
+from rotary_table_api import rotary_table_messages as rt_msg
+
+def response_frame(address: int, header: int = 0xF) -> bytes:
+    data = rt_msg.PREAMBLE + bytes([address << rt_msg.ADDRESS_LENGTH | header]) + bytes(6)
+    return data + bytes([rt_msg.calc_crc8(data)])
+
+class FakeSerial:
+    """Answers requests in reversed order with garbage in between"""
+    def __init__(self, *args, **kwargs):
+        self.rx = bytearray()
+        self.requests = []
+        self.rts = False
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+    def read(self, size):
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+    def write(self, data):
+        address = data[1] >> rt_msg.ADDRESS_LENGTH
+        if address == 0x7:
+            return
+        self.requests.append(address)
+        if len(self.requests) == 2:
+            self.rx += b"\x00\x5D\x12" + response_frame(self.requests[1])[:5]
+            self.rx += response_frame(self.requests[1]) + response_frame(self.requests[0])
+    def close(self):
+        pass
+
+def test_frame_parser():
+    parser = rt_async.FrameParser()
+    frame = response_frame(3)
+    assert parser.feed(b"\x01\x02" + frame[:4]) == []
+    responses = parser.feed(frame[4:] + b"\x5D\x5D" + response_frame(4) + frame[:1])
+    assert [resp.address for resp in responses] == [3, 4]
+    assert parser.dropped_bytes == 4
+    assert parser.buffer == frame[:1]
+
+def test_requests_in_flight(monkeypatch):
+    monkeypatch.setattr(rt_async.serial, "serial_for_url", FakeSerial)
+    async def run():
+        async with rt_async.AsyncRotaryTable("fake") as rt:
+            first, second = await asyncio.gather(
+                rt.send_request(rt_msg.RequestGetStatus(1)),
+                rt.send_request(rt_msg.RequestGetStatus(2)))
+            assert first.address == 1
+            assert second.address == 2
+            assert isinstance(first, rt_msg.ResponseMotorStatus)
+            assert rt.inst.rts
+            with pytest.raises(IOError):
+                await rt.send_request(rt_msg.RequestGetStatus(0x7), timeout=0.01)
+            assert await rt.send_request(rt_msg.RequestHalt(rt_async.BROADCAST_ADDRESS)) is None
+    asyncio.run(run())
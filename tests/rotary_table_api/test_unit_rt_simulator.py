@@ -0,0 +1,49 @@
+import pytest
+from rotary_table_api import rotary_table_api as rt_api
+from rotary_table_api import rotary_table_messages as rt_msg
+from rotary_table_api.simulator import RotaryTableSimulator, SimulatedHead
+
+def test_head_motion_profile():
+    head = SimulatedHead(0, acceleration=60)
+    head.rotate(90, 10)
+    assert head.is_rotating
+    head.advance(0.1)
+    assert head.rpm == pytest.approx(6, abs=0.1)
+    head.advance(10)
+    assert head.angle == pytest.approx(90)
+    assert not head.is_rotating
+    head.rotate(350, 10)
+    head.advance(0.5)
+    assert 0 < head.angle < 90
+    head.advance(10)
+    assert head.angle == pytest.approx(350)
+
+def test_head_disable_and_home():
+    head = SimulatedHead(0)
+    head.rotate(180, 10)
+    head.advance(0.5)
+    head.disable()
+    angle = head.angle
+    head.advance(1)
+    assert head.angle == angle and not head.is_enabled and not head.is_rotating
+    head.set_home()
+    assert head.angle == 0
+
+def test_rotary_table_on_simulator():
+    with RotaryTableSimulator([0, 1], acceleration=600) as sim:
+        rt = rt_api.RotaryTable(sim.port_name)
+        try:
+            status = rt.send_request(rt_msg.RequestGetStatus(0))
+            assert status.is_valid and status.is_motor_OK and status.is_crc_valid
+            assert status.address == 0 and status.current_angle == 0
+            converter = rt.send_request(rt_msg.RequestGetConverterStatus(rt_api.CONTROLLER_ADDRESS))
+            assert converter.is_voltage_OK and converter.voltage == pytest.approx(12)
+            status = rt.send_request(rt_msg.RequestRotate(1, 30, 20))
+            assert status.address == 1 and status.target_angle == 30
+            status = rt.wait_until_stopped(1, 20, timeout=5)
+            assert status.current_angle == pytest.approx(30)
+            assert rt.send_request(rt_msg.RequestGetStatus(0)).current_angle == 0
+            with pytest.raises(IOError):
+                rt.send_request(rt_msg.RequestGetStatus(5))
+        finally:
+            rt.close()
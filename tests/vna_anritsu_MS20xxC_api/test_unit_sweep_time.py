@@ -0,0 +1,24 @@
+import pytest
+from vna_anritsu_MS20xxC_api import sweep_time
+from vna_anritsu_MS20xxC_api.vna_types import SweepSettings
+
+def test_estimate_sweep_time():
+    settings = SweepSettings(1000, 1000, 1)
+    assert sweep_time.estimate_sweep_time(settings, 0, 0) == pytest.approx(1)
+    assert sweep_time.estimate_sweep_time(SweepSettings(1000, 1000, 4), 0, 0) == pytest.approx(4)
+    assert sweep_time.estimate_sweep_time(SweepSettings(1000, 1000, 0), 0, 0) == pytest.approx(1)
+    assert sweep_time.estimate_sweep_time(settings, 1E-3, 0.5) == pytest.approx(2.5)
+
+def test_estimator_history():
+    estimator = sweep_time.SweepTimeEstimator(history_weight=0.5)
+    settings = SweepSettings(1000, 1000, 1)
+    other = SweepSettings(2000, 1000, 1)
+    model = sweep_time.estimate_sweep_time(settings)
+    assert not estimator.has_history(settings)
+    assert estimator.estimate(settings) == pytest.approx(model)
+    estimator.record(settings, 2*model)
+    assert estimator.has_history(settings)
+    assert estimator.estimate(settings) == pytest.approx(2*model)
+    estimator.record(settings, 4*model)
+    assert estimator.estimate(settings) == pytest.approx(3*model)
+    assert estimator.estimate(other) == pytest.approx(3*sweep_time.estimate_sweep_time(other))
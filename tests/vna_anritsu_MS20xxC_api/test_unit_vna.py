@@ -1,5 +1,8 @@
+import numpy as np
+import pytest
+import time
 from vna_anritsu_MS20xxC_api import vna_api
-from vna_anritsu_MS20xxC_api.vna_types import DataFormat
+from vna_anritsu_MS20xxC_api.vna_types import DataFormat, FreqCacheValidation, FrequencySettings, SweepSettings
 
 def test_checking_device_indentification():
     assert vna_api.is_instrument_supported("\"Anritsu,MS2028C/10/2,62011032,1.23\"") == True
@@ -19,12 +22,163 @@ def test_converting_trace_data():
     assert vna_api.convert_from_trace_data("#242test,", DataFormat.ASCII) == ["test"]
     assert vna_api.convert_from_trace_data("#242test,test", DataFormat.ASCII) == ["test","test"]
 
+    block = binary_block([1, 2, 3], "<f4")
+    assert vna_api.convert_from_trace_data(block, DataFormat.REAL32).tolist() == [1, 2, 3]
+    assert vna_api.convert_from_trace_data(block.decode("latin-1"), DataFormat.REAL32).tolist() == [1, 2, 3]
+    assert vna_api.convert_from_trace_data(binary_block([1.5, -2], "<f8"), DataFormat.REAL64).tolist() == [1.5, -2]
+    assert vna_api.convert_from_trace_data(binary_block([7, -8], "<i4"), DataFormat.INT).tolist() == [7, -8]
+    assert vna_api.convert_from_trace_data(b"#1", DataFormat.REAL32) == None
+
     assert (vna_api.convert_data_to_complex([]) == []).all()
     assert (vna_api.convert_data_to_complex([1]) == [1+0j]).all()
     assert (vna_api.convert_data_to_complex([1,1]) == [1+1j]).all()
     assert (vna_api.convert_data_to_complex([1,1,2,3]) == [1+1j, 2+3j]).all()
 
+    for values in ([], [1], [1, 1], [1, 1, 2, 3]):
+        for dtype in ("<f4", "<f8", "<i4"):
+            block = vna_api.parse_binary_blocks(binary_block(values, dtype) if values else b"#10")[0]
+            converted = vna_api.convert_block_to_complex(block, np.dtype(dtype))
+            assert converted.dtype == np.complex128
+            assert (converted == vna_api.convert_data_to_complex(values)).all()
+
     assert vna_api.convert_header_to_dict([""]) == {}
     assert vna_api.convert_header_to_dict(["test"]) == {"test": None}
     assert vna_api.convert_header_to_dict(["test=321"]) == {"test": "321"}
     assert vna_api.convert_header_to_dict(["test=321","test2=2"]) == {"test": "321", "test2": "2"}
+
+def binary_block(values, dtype="<f4") -> bytes:
+    payload = np.asarray(values, dtype=dtype).tobytes()
+    length = str(len(payload))
+    return f"#{len(length):d}{length}".encode() + payload
+
+class FakeResourceManager:
+    def __init__(self, inst):
+        self.inst = inst
+    def open_resource(self, name):
+        return self.inst
+
+class FakeBatchInstrument:
+    def __init__(self, freq, traces):
+        self.timeout = 2000
+        self.freq = freq
+        self.traces = traces
+        self.writes = []
+        self.buffer = b""
+    def write(self, query):
+        self.writes.append(query)
+        blocks = [binary_block(self.traces[int(q.split()[-1])-1]) for q in query.split(";") if q.startswith(":TRAC:DATA?")]
+        blocks += [binary_block(self.freq) for q in query.split(";") if q.endswith(":FREQ:DATA?")]
+        if len(blocks) > 0:
+            self.buffer += b";".join(blocks) + b"\n"
+    def query(self, query):
+        self.writes.append(query)
+        if query == ":SENS:SWE:POIN?":
+            return f"{len(self.freq):d}\n"
+        return f"{self.freq[0]:e}\n" if query == ":FREQ:STAR?" else f"{self.freq[-1]:e}\n"
+    def read_bytes(self, count):
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+def test_parsing_binary_blocks():
+    data = binary_block([1, 2]) + b";" + binary_block([3, 4, 5, 6]) + b"\n"
+    blocks = vna_api.parse_binary_blocks(data)
+    assert len(blocks) == 2
+    assert np.frombuffer(blocks[1], dtype="<f4").tolist() == [3, 4, 5, 6]
+    assert vna_api.parse_binary_blocks(b"") == []
+    with pytest.raises(IOError):
+        vna_api.parse_binary_blocks(binary_block([1, 2])[:-1])
+    with pytest.raises(IOError):
+        vna_api.parse_binary_blocks(b"1,2")
+
+def test_batched_readout():
+    freq = [1E9, 2E9, 3E9]
+    traces = [[i, -i, 2*i, 3*i, 4*i, 5*i] for i in range(1, 5)]
+    inst = FakeBatchInstrument(freq, traces)
+    vna = vna_api.VNA(FakeResourceManager(inst), "fake")
+    s2p, f = vna.get_traces_data_batched(check_traces_freq=True)
+    assert len(inst.writes) == 1
+    assert inst.timeout == 2000
+    assert f.tolist() == freq
+    assert s2p.shape == (3, 2, 2)
+    assert s2p[0, 0, 0] == 1-1j
+    assert s2p[2, 1, 0] == 12+15j
+    assert s2p[1, 0, 1] == 4+6j
+    network = vna.get_traces_data_as_s2p()
+    assert (network.s == s2p).all()
+    assert (network.f == f).all()
+    assert inst.buffer == b""
+    inst.write(":TRAC:DATA? 1")
+    inst.buffer = inst.buffer[:-5]
+    with pytest.raises(IOError):
+        vna.read_binary_blocks(1)
+    with pytest.raises(IOError):
+        vna_api.convert_blocks_to_s2p([np.zeros(4, dtype="<f4").tobytes()]*4, 3, np.dtype("<f4"))
+
+def test_freq_cache():
+    freq = [1E9, 2E9, 3E9]
+    traces = [[i, -i, 2*i, 3*i, 4*i, 5*i] for i in range(1, 5)]
+    inst = FakeBatchInstrument(freq, traces)
+    vna = vna_api.VNA(FakeResourceManager(inst), "fake")
+    vna.get_traces_data_batched()
+    assert "FREQ:DATA?" in inst.writes[-1]
+    assert vna.freq_cache[0] == FrequencySettings(1E9, 3E9, 3)
+    vna.get_traces_data_batched()
+    assert inst.writes[-2] == ":SENS:SWE:POIN?"
+    assert "FREQ:DATA?" not in inst.writes[-1]
+
+    inst.freq = [1E9, 1.5E9, 2E9]
+    inst.traces = [trace[:6] for trace in traces]
+    vna.freq_cache_validation = FreqCacheValidation.SETTINGS
+    s2p, f = vna.get_traces_data_batched()
+    assert "FREQ:DATA?" in inst.writes[-1]
+    assert f.tolist() == inst.freq
+
+    vna.freq_cache_validation = FreqCacheValidation.NONE
+    vna.get_traces_data_batched()
+    assert "FREQ:DATA?" not in inst.writes[-1]
+    vna.set_freq_settings(1E9, 2E9, 3)
+    vna.get_traces_data_batched()
+    assert "FREQ:DATA?" in inst.writes[-1]
+
+class FakeSweepInstrument:
+    def __init__(self, sweep_time):
+        self.timeout = 2000
+        self.sweep_time = sweep_time
+        self.sweep_start = None
+        self.status_queries = 0
+    def write(self, command):
+        if command == ":INIT:IMM":
+            self.sweep_start = time.monotonic()
+    def query(self, query):
+        responses = {":SENS:SWE:POIN?": "101", ":SENS:SWE:IFBW?": "1.000000E+04", ":SENS:AVER:COUN?": "1"}
+        if query in responses:
+            return responses[query]
+        if query == ":INIT:IMM;*OPC?":
+            time.sleep(self.sweep_time)
+            return "1"
+        self.status_queries += 1
+        return "256" if time.monotonic() - self.sweep_start >= self.sweep_time else "0"
+
+def test_sweep_await():
+    inst = FakeSweepInstrument(0.05)
+    vna = vna_api.VNA(FakeResourceManager(inst), "fake")
+    assert vna.get_sweep_settings() == SweepSettings(101, 1E4, 1)
+    vna.start_single_sweep_await()
+    assert vna.sweep_time_estimator.estimate(vna.get_sweep_settings()) >= 0.05
+    inst.status_queries = 0
+    vna.start_single_sweep_await()
+    assert inst.status_queries < 10
+    vna.set_ifbw(1000)
+    assert vna.sweep_settings is None
+
+    inst = FakeSweepInstrument(1)
+    vna = vna_api.VNA(FakeResourceManager(inst), "fake")
+    with pytest.raises(IOError):
+        vna.start_single_sweep_await(timeout=0.05)
+
+    inst = FakeSweepInstrument(0.01)
+    vna = vna_api.VNA(FakeResourceManager(inst), "fake")
+    vna.use_opc = True
+    vna.start_single_sweep_await()
+    assert inst.status_queries == 0
+    assert inst.timeout == 2000
@@ -0,0 +1,84 @@
+import time
+import numpy as np
+import pytest
+from vna_anritsu_MS20xxC_api import vna_api
+from vna_anritsu_MS20xxC_api.vna_types import DataFormat
+from vna_anritsu_MS20xxC_api.simulator import SimulatedInstrument, SimulatedResourceManager, SimulatedVNA, SIMULATED_RESOURCE_NAME, default_s_model
+
+def make_vna(**kwargs):
+    device = SimulatedVNA(latency=0, transfer_rate=1E9, **kwargs)
+    return device, vna_api.VNA(SimulatedResourceManager(device), SIMULATED_RESOURCE_NAME)
+
+def test_discovery():
+    rm = SimulatedResourceManager()
+    assert vna_api.find_vna_instrument_by_idn(rm) == SIMULATED_RESOURCE_NAME
+
+def test_settings():
+    device, vna = make_vna()
+    vna.set_freq_settings(2E9, 4E9, 11)
+    settings = vna.get_freq_settings()
+    assert settings.start == 2E9 and settings.stop == 4E9 and settings.points_num == 11
+    vna.set_ifbw(1000)
+    assert vna.get_ifbw() == 1000
+    vna.set_is_sweep_continuous(False)
+    assert not vna.get_is_sweep_continuous()
+    assert vna.get_trace_spar(3) == "s21"
+
+@pytest.mark.parametrize("data_format", [DataFormat.REAL32, DataFormat.REAL64, DataFormat.ASCII])
+def test_traces_readout(data_format):
+    device, vna = make_vna(points_num=21, angle_source=lambda: 45.0)
+    vna.data_format = data_format
+    vna.set_traces_as_s2p()
+    vna.set_is_sweep_continuous(False)
+    vna.batch_readout = data_format != DataFormat.ASCII
+    vna.start_sweep()
+    s2p = vna.get_traces_data_as_s2p()
+    expected = default_s_model(device.freq, 45.0)
+    assert np.allclose(s2p.f, device.freq)
+    assert np.allclose(s2p.s, expected, rtol=1E-5, atol=1E-6)
+
+def test_binary_data_with_termination_character():
+    # Every byte of the values is line feed, so read_raw() would cut the response at the first one
+    value = float(np.frombuffer(b"\n"*4, dtype="<f4")[0])
+    device, vna = make_vna(points_num=5, s_model=lambda freq, angle: np.full((len(freq), 2, 2), value*(1+1j)))
+    vna.set_traces_as_s2p()
+    vna.set_is_sweep_continuous(False)
+    vna.start_sweep()
+    for batch_readout in (True, False):
+        vna.batch_readout = batch_readout
+        assert np.allclose(vna.get_traces_data_as_s2p().s, value*(1+1j), rtol=1E-6, atol=0)
+
+@pytest.mark.parametrize("use_opc", [False, True])
+def test_sweep_timing(use_opc):
+    device, vna = make_vna(sweep_time=0.1)
+    vna.use_opc = use_opc
+    start = time.monotonic()
+    vna.start_single_sweep_await()
+    assert 0.1 <= time.monotonic() - start < 0.5
+    assert device.sweeps_count == 1 and device.is_sweep_completed()
+
+def test_sweep_time_doesnt_learn_poll_overshoot():
+    device = SimulatedVNA(points_num=11, sweep_time=0.2, latency=0.01)
+    vna = vna_api.VNA(SimulatedResourceManager(device), SIMULATED_RESOURCE_NAME)
+    vna.set_is_sweep_continuous(False)
+    vna.sweep_poll_interval = 0.05
+    for _ in range(12):
+        vna.start_single_sweep_await()
+    assert 0.19 < vna.sweep_time_estimator.estimate(vna.get_sweep_settings()) < 0.225
+
+def test_discovery_probes_concurrently():
+    class DeadVNA(SimulatedVNA):
+        def handle(self, message):
+            return None
+    class ResourcesManager(SimulatedResourceManager):
+        def list_resources(self):
+            return ("DEAD1::INSTR", "DEAD2::INSTR", SIMULATED_RESOURCE_NAME)
+        def open_resource(self, name):
+            if name.startswith("DEAD"):
+                return SimulatedInstrument(DeadVNA(latency=0))
+            return super().open_resource(name)
+    start = time.monotonic()
+    idns = vna_api.probe_visa_instruments(ResourcesManager(), timeout=0.3)
+    assert time.monotonic() - start < 0.5
+    assert idns["DEAD1::INSTR"] is None and idns["DEAD2::INSTR"] is None
+    assert vna_api.is_instrument_supported(idns[SIMULATED_RESOURCE_NAME])